@@ -0,0 +1,65 @@
+# benchmarks/balancing.py
+"""
+Compara el tiempo de balanceo + entrenamiento y el ROC AUC de validación de cada
+estrategia de balance_data.
+
+Uso:
+    python -m benchmarks.balancing --rows 200000 --strategies smotetomek downsample
+"""
+import argparse
+import time
+
+import pandas as pd
+from sklearn.datasets import make_classification
+from sklearn.metrics import roc_auc_score
+
+from src.model import train_xgb_model
+from src.preprocessing import BALANCING_STRATEGIES, balance_data, split_data
+
+
+def make_dataset(n_rows: int, n_features: int = 40, fraud_rate: float = 0.035, seed: int = 42) -> pd.DataFrame:
+    X, y = make_classification(
+        n_samples=n_rows, n_features=n_features, n_informative=n_features // 2,
+        weights=[1 - fraud_rate], flip_y=0.01, random_state=seed,
+    )
+    df = pd.DataFrame(X, columns=[f"V{i}" for i in range(1, n_features + 1)]).astype("float32")
+    df["isFraud"] = y
+    return df
+
+
+def run(n_rows: int, strategies: list, n_estimators: int = 100) -> pd.DataFrame:
+    X_train, X_val, y_train, y_val = split_data(make_dataset(n_rows))
+    params = {"n_estimators": n_estimators, "max_depth": 6}
+    results = []
+    for strategy in strategies:
+        start = time.perf_counter()
+        X_res, y_res, sample_weight = balance_data(X_train, y_train, strategy=strategy, return_weights=True)
+        balance_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        model = train_xgb_model(X_res, y_res, params=params, sample_weight=sample_weight)
+        train_time = time.perf_counter() - start
+
+        auc = roc_auc_score(y_val, model.predict_proba(X_val)[:, 1])
+        results.append({
+            "strategy": strategy,
+            "train_rows": len(X_res),
+            "balance_s": round(balance_time, 3),
+            "train_s": round(train_time, 3),
+            "val_auc": round(auc, 4),
+        })
+        print(results[-1])
+    return pd.DataFrame(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--n-estimators", type=int, default=100)
+    parser.add_argument("--strategies", nargs="+", default=list(BALANCING_STRATEGIES))
+    args = parser.parse_args()
+    print(run(args.rows, args.strategies, args.n_estimators).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# benchmarks/inference.py
+"""
+Latencia de predicción por batch (1, 32 y 1024 filas): predict_proba sobre un
+DataFrame contra CompiledPredictor (árboles aplanados) e inplace_predict.
+
+Uso:
+    python -m benchmarks.inference --n-estimators 400 --max-depth 10
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.balancing import make_dataset
+from src.inference import CompiledPredictor
+from src.model import train_xgb_model
+from src.preprocessing import split_data
+
+BATCH_SIZES = (1, 32, 1024)
+
+
+def _median_us(fn, repeat: int) -> float:
+    fn()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times) * 1e6)
+
+
+def run(n_estimators: int = 400, max_depth: int = 10, repeat: int = 50) -> pd.DataFrame:
+    X_train, X_val, y_train, _ = split_data(make_dataset(50_000))
+    model = train_xgb_model(X_train, y_train, params={"n_estimators": n_estimators, "max_depth": max_depth})
+    compiled = CompiledPredictor(model)
+    inplace = CompiledPredictor(model, method="inplace")
+    X_np = X_val.to_numpy(dtype=np.float32)
+
+    max_diff = np.abs(compiled.predict_proba(X_np) - model.predict_proba(X_val)[:, 1]).max()
+    print(f"Máxima diferencia compiled vs predict_proba: {max_diff:.2e}")
+
+    results = []
+    for batch_size in BATCH_SIZES:
+        frame, array = X_val.iloc[:batch_size], X_np[:batch_size]
+        results.append({
+            "batch_size": batch_size,
+            "predict_proba_us": _median_us(lambda: model.predict_proba(frame), repeat),
+            "compiled_us": _median_us(lambda: compiled.predict_proba(array), repeat),
+            "inplace_us": _median_us(lambda: inplace.predict_proba(array), repeat),
+        })
+    return pd.DataFrame(results).round(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n-estimators", type=int, default=400)
+    parser.add_argument("--max-depth", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    print(run(args.n_estimators, args.max_depth, args.repeat).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
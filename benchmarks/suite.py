@@ -0,0 +1,159 @@
+# benchmarks/suite.py
+"""
+Mide tiempo y pico de RSS de cada etapa del camino de train.py sobre datos sintéticos
+con la forma del dataset IEEE (ver benchmarks.synthetic) y guarda los resultados en JSON.
+Además de load_clean_data (la carga out-of-core que usa train.py) se miden por separado
+load_and_merge_data y clean_data, el camino en memoria al que reemplaza.
+
+Uso:
+    python -m benchmarks.suite --rows 100000 --output bench.json
+    python -m benchmarks.suite --compare base.json bench.json --tolerance 0.2
+"""
+import argparse
+import ctypes
+import datetime
+import gc
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+from benchmarks.synthetic import write_ieee_csvs
+from src.data import (
+    MODEL_CATEGORICAL_COLUMNS, clean_data, create_user_id, load_and_merge_data, load_clean_data,
+)
+from src.features import add_velocity_features
+from src.model import predict, train_xgb_model
+from src.preprocessing import balance_data, encode_and_scale, split_data
+from src.profiling import Tracer
+from src.simulator import CostIndex
+
+def _release_memory():
+    # Devuelve al sistema la memoria libre del heap (glibc) para que el RSS de cada
+    # etapa no dependa de lo que liberaron las anteriores.
+    gc.collect()
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+def measure(results: dict, name: str, fn, *args, **kwargs):
+    """
+    Ejecuta fn como etapa de un Tracer y guarda en results[name] los segundos y el pico
+    de RSS de la etapa por encima del RSS con el que empezó. El RSS incluye la memoria
+    nativa (XGBoost, Arrow), que tracemalloc no ve, y no frena la etapa.
+    """
+    _release_memory()
+    with Tracer().enable().stage(name) as record:
+        output = fn(*args, **kwargs)
+    seconds = record["wall_s"]
+    peak = record["peak_rss_mb"] - (record["rss_mb"] - record["rss_delta_mb"])
+    results[name] = {"seconds": round(seconds, 4), "peak_mb": round(peak, 2)}
+    print(f"{name:<22} {seconds:>9.3f} s {peak:>10.1f} MB")
+    return output
+
+
+def _app_cost(scores, amounts, n_moves=100):
+    # Un índice por carga y n_moves movimientos de sliders, como en streamlit_app.py.
+    index = CostIndex(scores, amounts)
+    for low in np.linspace(0.05, 0.3, n_moves):
+        index.band_totals([low, 0.6, 0.9])
+    return index
+
+
+def run(n_rows: int, n_v: int = 339, balance_strategy: str = "smotetomek", n_estimators: int = 100,
+        seed: int = 42) -> dict:
+    results = {}
+    with tempfile.TemporaryDirectory() as data_dir:
+        identity_path, transaction_path = write_ieee_csvs(data_dir, n_rows, n_v=n_v, seed=seed)
+        merged = measure(results, "load_and_merge_data", load_and_merge_data, identity_path, transaction_path,
+                         verbose=False)
+        measure(results, "clean_data", clean_data, merged)
+        del merged
+        # Mismas etapas que train.py (load_preprocess_data sin caché, features de velocidad, ...).
+        df = measure(results, "load_clean_data", load_clean_data, identity_path, transaction_path,
+                     verbose=False)
+        measure(results, "create_user_id[string]", create_user_id, df.copy(), mode="string")
+        df = measure(results, "create_user_id[hash]", create_user_id, df, mode="hash")
+        df = measure(results, "add_velocity_features", add_velocity_features, df)
+        df = measure(results, "encode_and_scale", encode_and_scale, df, MODEL_CATEGORICAL_COLUMNS)
+        X_train, X_val, y_train, y_val = split_data(df)
+        X_res, y_res, weights = measure(results, "balance_data", balance_data, X_train, y_train,
+                                        strategy=balance_strategy, return_weights=True)
+        model = measure(results, "train_xgb_model", train_xgb_model, X_res, y_res, X_val, y_val,
+                        params={"n_estimators": n_estimators}, sample_weight=weights)
+        _, y_proba = measure(results, "predict", predict, model, X_val)
+        amounts = np.random.default_rng(seed).lognormal(4, 1, len(y_proba))
+        measure(results, "app_cost", _app_cost, y_proba, amounts)
+    return results
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(base_path: str, new_path: str, tolerance: float = 0.2) -> list:
+    """
+    Devuelve las etapas cuyo tiempo o memoria pico crecieron más que tolerance (relativo).
+    """
+    with open(base_path) as f:
+        base = json.load(f)["results"]
+    with open(new_path) as f:
+        new = json.load(f)["results"]
+    regressions = []
+    for stage, values in new.items():
+        if stage not in base:
+            continue
+        for metric in ("seconds", "peak_mb"):
+            old, current = base[stage][metric], values[metric]
+            change = (current - old) / old if old else 0.0
+            flag = "⚠️" if change > tolerance else "  "
+            print(f"{flag} {stage:<22} {metric:<8} {old:>10.3f} -> {current:>10.3f} ({change:+.1%})")
+            if change > tolerance:
+                regressions.append((stage, metric, change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--n-v", type=int, default=339)
+    parser.add_argument("--balance-strategy", default="smotetomek")
+    parser.add_argument("--n-estimators", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="bench.json")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"))
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, tolerance=args.tolerance) else 0)
+
+    results = run(args.rows, args.n_v, args.balance_strategy, args.n_estimators, args.seed)
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "rows": args.rows,
+            "n_v": args.n_v,
+            "balance_strategy": args.balance_strategy,
+            "n_estimators": args.n_estimators,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Resultados guardados en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# benchmarks/synthetic.py
+"""
+Generador reproducible de archivos con la forma del dataset IEEE-CIS:
+train_transaction.csv (TransactionID, isFraud, TransactionDT, TransactionAmt,
+ProductCD, card1-6, addr1-2, dist1-2, emaildomains, C*, D*, M*, V*) y
+train_identity.csv (TransactionID, id_01-id_38, DeviceType, DeviceInfo).
+
+Uso:
+    python -m benchmarks.synthetic --rows 100000 --out /tmp/ieee
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+EMAIL_DOMAINS = ["gmail.com", "yahoo.com", "hotmail.com", "anonymous.com", "aol.com", "outlook.com"]
+DEVICE_INFO = ["Windows", "iOS Device", "MacOS", "Trident/7.0", "SM-J700M Build/MMB29K"]
+ID_STRINGS = {
+    "id_12": ["Found", "NotFound"], "id_15": ["Found", "New", "Unknown"], "id_16": ["Found", "NotFound"],
+    "id_23": ["IP_PROXY:TRANSPARENT", "IP_PROXY:ANONYMOUS"], "id_27": ["Found", "NotFound"],
+    "id_28": ["Found", "New"], "id_29": ["Found", "NotFound"], "id_30": ["Windows 10", "iOS 11.2.1", "Mac OS X 10_12_6"],
+    "id_31": ["chrome 63.0", "mobile safari 11.0", "edge 16.0"], "id_33": ["1920x1080", "2208x1242"],
+    "id_34": ["match_status:2", "match_status:1"], "id_35": ["T", "F"], "id_36": ["T", "F"],
+    "id_37": ["T", "F"], "id_38": ["T", "F"],
+}
+# Columnas con muchos nulos (como en el dataset real), que clean_data descarta.
+SPARSE_NULL_RATE = 0.8
+
+
+def _with_nulls(rng, values, null_rate):
+    values = pd.Series(values)
+    if null_rate:
+        values = values.mask(rng.random(len(values)) < null_rate)
+    return values
+
+
+def generate_transactions(n_rows: int, n_v: int = 339, fraud_rate: float = 0.035, seed: int = 42) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    is_fraud = (rng.random(n_rows) < fraud_rate).astype(np.int8)
+    columns = {
+        "TransactionID": np.arange(2_987_000, 2_987_000 + n_rows),
+        "isFraud": is_fraud,
+        "TransactionDT": 86_400 + np.sort(rng.integers(0, 180 * 86_400, n_rows)),
+        "TransactionAmt": np.round(rng.lognormal(4, 1, n_rows) * (1 + is_fraud), 3),
+        "ProductCD": rng.choice(list("WHCSR"), n_rows),
+        "card1": rng.integers(1_000, 18_400, n_rows),
+        "card2": _with_nulls(rng, rng.integers(100, 600, n_rows).astype(float), 0.002),
+        "card3": _with_nulls(rng, rng.choice([150.0, 185.0, 106.0], n_rows), 0.001),
+        "card4": _with_nulls(rng, rng.choice(["visa", "mastercard", "american express", "discover"], n_rows), 0.001),
+        "card5": _with_nulls(rng, rng.choice([226.0, 224.0, 166.0, 102.0], n_rows), 0.001),
+        "card6": _with_nulls(rng, rng.choice(["debit", "credit"], n_rows), 0.001),
+        "addr1": _with_nulls(rng, rng.integers(100, 540, n_rows).astype(float), 0.002),
+        "addr2": _with_nulls(rng, rng.choice([87.0, 60.0, 96.0], n_rows), 0.002),
+        "dist1": _with_nulls(rng, rng.integers(0, 100, n_rows).astype(float), 0.002),
+        "dist2": _with_nulls(rng, rng.integers(0, 100, n_rows).astype(float), SPARSE_NULL_RATE),
+        "P_emaildomain": _with_nulls(rng, rng.choice(EMAIL_DOMAINS, n_rows), 0.002),
+        "R_emaildomain": _with_nulls(rng, rng.choice(EMAIL_DOMAINS, n_rows), 0.002),
+    }
+    for i in range(1, 15):
+        columns[f"C{i}"] = rng.poisson(1 + 2 * is_fraud, n_rows).astype(float)
+    for i in range(1, 16):
+        null_rate = 0.001 if i == 1 else SPARSE_NULL_RATE
+        columns[f"D{i}"] = _with_nulls(rng, rng.integers(0, 640, n_rows).astype(float), null_rate)
+    for i in range(1, 10):
+        columns[f"M{i}"] = _with_nulls(rng, rng.choice(["T", "F"], n_rows), 0.001 if i <= 3 else SPARSE_NULL_RATE)
+    for i in range(1, n_v + 1):
+        null_rate = 0.001 if i % 3 == 0 else SPARSE_NULL_RATE
+        columns[f"V{i}"] = _with_nulls(rng, np.round(rng.random(n_rows) * (1 + is_fraud), 4), null_rate)
+    return pd.DataFrame(columns)
+
+
+def generate_identity(transaction_ids: np.ndarray, identity_fraction: float = 0.25, seed: int = 43) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    n_rows = int(len(transaction_ids) * identity_fraction)
+    ids = np.sort(rng.choice(transaction_ids, n_rows, replace=False))
+    columns = {"TransactionID": ids}
+    for i in range(1, 39):
+        name = f"id_{i:02d}"
+        null_rate = 0.001 if i in (1, 2, 5, 6, 11, 12, 15, 30, 31, 35, 36, 37, 38) else SPARSE_NULL_RATE
+        if name in ID_STRINGS:
+            values = rng.choice(ID_STRINGS[name], n_rows)
+        else:
+            values = rng.integers(-100, 1_000, n_rows).astype(float)
+        columns[name] = _with_nulls(rng, values, null_rate)
+    columns["DeviceType"] = _with_nulls(rng, rng.choice(["desktop", "mobile"], n_rows), 0.001)
+    columns["DeviceInfo"] = _with_nulls(rng, rng.choice(DEVICE_INFO, n_rows), 0.001)
+    return pd.DataFrame(columns)
+
+
+def write_ieee_csvs(out_dir: str, n_rows: int, n_v: int = 339, identity_fraction: float = 0.25,
+                    seed: int = 42) -> tuple:
+    """
+    Escribe train_identity.csv y train_transaction.csv en out_dir y devuelve sus rutas.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    transactions = generate_transactions(n_rows, n_v=n_v, seed=seed)
+    identity = generate_identity(transactions["TransactionID"].to_numpy(), identity_fraction, seed=seed + 1)
+    identity_path = os.path.join(out_dir, "train_identity.csv")
+    transaction_path = os.path.join(out_dir, "train_transaction.csv")
+    identity.to_csv(identity_path, index=False)
+    transactions.to_csv(transaction_path, index=False)
+    return identity_path, transaction_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--n-v", type=int, default=339)
+    parser.add_argument("--identity-fraction", type=float, default=0.25)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", required=True)
+    args = parser.parse_args()
+    print(write_ieee_csvs(args.out, args.rows, args.n_v, args.identity_fraction, args.seed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+# score.py
+
+import argparse
+import os
+
+from src.data import DEFAULT_CHUNKSIZE
+from src.scoring import score_files
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Puntúa archivos IEEE por chunks y escribe Parquet particionado.")
+    parser.add_argument("identity_path")
+    parser.add_argument("transaction_path")
+    parser.add_argument("out_dir")
+    parser.add_argument("--model", default=os.getenv("MODEL_PATH", "gs://fraud-detection-lewagon/models/xgb_model.joblib"))
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--jobs", type=int, default=None, help="procesos (por defecto, uno por core)")
+    parser.add_argument("--threshold", type=float, default=0.5)
+    parser.add_argument("--max-users", type=int, default=None,
+                        help="usuarios en memoria para los features de velocidad (el resto va a un SQLite temporal)")
+    args = parser.parse_args()
+
+    score_files(
+        args.identity_path, args.transaction_path, args.out_dir, args.model,
+        chunksize=args.chunksize, n_jobs=args.jobs, threshold=args.threshold,
+        max_users=args.max_users,
+    )
+
+
+if __name__ == "__main__":
+    main()
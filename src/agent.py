@@ -0,0 +1,332 @@
+# src/agent.py
+"""
+Agente CFO del chat de la app.
+
+Las preguntas sobre los datos se responden, en este orden:
+1. desde el cubo de agregados por risk_group/paquete_servicio (build_cube), sin LLM;
+2. desde la caché de preguntas (QueryCache), por pregunta normalizada y versión de datos;
+3. pidiendo código al LLM y ejecutándolo (en src.sandbox) sobre el frame con las
+   columnas de la app.
+"""
+import hashlib
+import json
+import re
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+CHAT_MODEL = "gpt-3.5-turbo"
+
+DATA_KEYWORDS = [
+    "cuánto", "promedio", "suma", "total", "monto", "riesgo", "usuarios", "transacciones", "costo",
+    "fraude", "número", "porcentaje", "distribución", "fraudulentos",
+]
+
+CODE_PROMPT = """
+Eres un asistente experto en análisis de datos. Dada la siguiente pregunta del usuario y un DataFrame de pandas llamado `df`, genera el código Python para responder a la pregunta.
+Asegúrate de que el código sea completo y ejecutable. Si la pregunta es sobre "usuarios" o "transacciones", asume que se refiere a filas en el DataFrame.
+
+El DataFrame `df` tiene las siguientes columnas clave:
+- 'risk_group': Contiene las categorías {groups}.
+- 'paquete_servicio': Contiene las categorías {packages}.
+- 'TransactionAmt': Contiene el monto de la transacción.
+- 'fraud_score': Es el score de fraude del modelo.
+- 'estimated_cost_ponderado': Es el costo estimado por transacción.
+
+Pregunta del usuario: "{question}"
+
+Si la pregunta se refiere a "fraude", "fraudulentos" o "transacciones fraudulentas", debes filtrar la columna `risk_group` para que sea igual a '{fraud_group}'.
+Por favor, genera solo el código Python. No incluyas explicaciones ni texto adicional. Guarda la respuesta en una variable `result` o imprímela.
+Ejemplo:
+# Código para "cuántas filas hay?"
+print(len(df))
+"""
+
+CHAT_PROMPT = (
+    "You are a helpful CFO assistant for a fraud detection app. You respond in Spanish and your tone is "
+    "professional. You can't access any data directly. If the user asks for data analysis, tell them you "
+    "can only answer general questions and suggest they ask a specific data-related question."
+)
+
+# Preguntas que el cubo no puede responder: filtros numéricos, negaciones, varias
+# categorías unidas con "o"/"y", rankings, usuarios únicos, preguntas sobre el modelo o
+# columnas que no agrega.
+_UNSUPPORTED = re.compile(
+    r"\d|\bno\b|\bo\b|\by\b|\bni\b|excepto|salvo|mayor|menor|mas de|menos de|top|entre|por dia|"
+    r"por hora|fecha|email|correo|dispositivo|tarjeta|card|producto|device|\bid\b|cuales|lista|"
+    r"mediana|percentil|desvio|ahorro|modelo|unic|distint|diferente|riesgo promedio|"
+    r"promedio de riesgo|nivel de riesgo|compar|versus|\bvs\b"
+)
+
+# Métricas que sabe responder el cubo. La pregunta tiene que nombrar exactamente una.
+_METRICS = {
+    "distribution": re.compile(r"distribucion"),
+    "share": re.compile(r"porcentaje|proporcion|%"),
+    "score": re.compile(r"score|puntaje|probabilidad"),
+    "cost": re.compile(r"costo"),
+    "amount": re.compile(r"monto|importe|dinero|volumen"),
+    "count": re.compile(r"\bcuant[oa]s\b|numero|cantidad"),
+}
+_ROWS = re.compile(r"\b(transacciones|usuarios|casos|filas)\b")
+_MEAN = re.compile(r"promedio|\bmedia\b")
+_EXTREMES = re.compile(r"maxim|minim")
+
+
+def normalize_question(question: str) -> str:
+    """
+    Minúsculas, sin tildes, sin puntuación y con espacios simples: dos preguntas que
+    solo difieren en eso comparten entrada de caché.
+    """
+    text = unicodedata.normalize("NFKD", question.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = re.sub(r"[^\w%]+", " ", text)
+    return " ".join(text.split())
+
+
+def is_data_question(question: str) -> bool:
+    return any(keyword in question.lower() for keyword in DATA_KEYWORDS)
+
+
+def frame_fingerprint(df: pd.DataFrame, columns=("TransactionID", "TransactionAmt", "fraud_score")) -> str:
+    """
+    Huella del contenido de df en las columnas que usa el agente (hash vectorizado por fila).
+    """
+    columns = [col for col in columns if col in df.columns]
+    row_hashes = pd.util.hash_pandas_object(df[columns], index=False).to_numpy()
+    digest = hashlib.sha256(row_hashes.tobytes())
+    digest.update(json.dumps(columns).encode())
+    return digest.hexdigest()
+
+
+def cube_version(fingerprint: str, bands, package_costs: dict) -> str:
+    """
+    Versión del cubo: cambia con los datos, los umbrales o los costos por paquete.
+    """
+    payload = {"data": fingerprint, "edges": bands.edges.tolist(), "costs": package_costs}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+def build_cube(cost_index, bands, package_costs: dict) -> pd.DataFrame:
+    """
+    Cubo de agregados por banda (risk_group/paquete_servicio): cantidad, monto,
+    pérdida esperada, costo ponderado (pérdida esperada * costo del paquete) y
+    estadísticos del score. Sale de las sumas prefijas del CostIndex en O(k log n).
+    """
+    cube = cost_index.band_stats(bands.edges)
+    cube.insert(0, "risk_group", bands.group_labels)
+    cube.insert(1, "paquete_servicio", bands.package_labels)
+    cube["estimated_cost_ponderado"] = cube["expected_loss"] * cube["paquete_servicio"].map(package_costs)
+    return cube
+
+
+def display_frame(df: pd.DataFrame, bands, package_costs: dict) -> pd.DataFrame:
+    """
+    df con risk_group, paquete_servicio y estimated_cost_ponderado por fila, que es
+    sobre lo que corre el código generado por el LLM.
+    """
+    codes = bands.codes(df["fraud_score"])
+    packages = bands.packages(codes=codes)
+    costs = np.asarray(pd.Series(packages).map(package_costs), dtype=np.float64)
+    return df.assign(
+        risk_group=bands.groups(codes=codes),
+        paquete_servicio=packages,
+        estimated_cost_ponderado=df["fraud_score"].to_numpy() * df["TransactionAmt"].to_numpy() * costs,
+    )
+
+
+def _label_filter(question: str, cube: pd.DataFrame):
+    # Grupos y paquetes nombrados en la pregunta, por columna; "fraude"/"fraudulento"
+    # se refiere al grupo cuyo nombre empieza con "fraud", como en el prompt del LLM.
+    matches = {}
+    for column in ("risk_group", "paquete_servicio"):
+        for label in dict.fromkeys(cube[column]):
+            key = normalize_question(label)
+            # "riesgo alto" y "alto riesgo" nombran el mismo grupo.
+            keys = {key, " ".join(reversed(key.split()))}
+            if any(re.search(rf"\b{k}\b", question) for k in keys) or \
+               (key.startswith("fraud") and "fraud" in question):
+                matches.setdefault(column, []).append(label)
+    return matches
+
+
+def _money(value: float) -> str:
+    return f"${value:,.2f}"
+
+
+def answer_from_cube(question: str, cube: pd.DataFrame):
+    """
+    Responde con el cubo las preguntas de conteos, montos, costos, porcentajes y
+    promedios de un grupo de riesgo o paquete (o del total). Es conservador: solo
+    responde si reconoce exactamente una métrica y a lo sumo una categoría; si no,
+    devuelve None y la pregunta va al LLM.
+    """
+    q = normalize_question(question)
+    if _UNSUPPORTED.search(q):
+        return None
+    metrics = [name for name, pattern in _METRICS.items() if pattern.search(q)]
+    if not metrics and _ROWS.search(q):
+        metrics = ["count"]
+    if len(metrics) != 1:
+        return None
+    metric = metrics[0]
+    mean, extreme = bool(_MEAN.search(q)), _EXTREMES.search(q)
+    if extreme and metric != "score":
+        return None
+    if mean and metric not in ("score", "cost", "amount"):
+        return None
+
+    matches = _label_filter(q, cube)
+    if len(matches) > 1 or any(len(labels) > 1 for labels in matches.values()):
+        return None
+    if metric == "distribution" and matches:
+        return None
+    if matches:
+        (column, (label,)), = matches.items()
+        selected = cube[cube[column] == label]
+        scope = label
+    else:
+        selected, scope = cube, "total"
+    count = int(selected["count"].sum())
+    total_count = int(cube["count"].sum())
+
+    if metric == "distribution":
+        shares = cube["count"] / total_count if total_count else cube["count"] * 0.0
+        lines = [
+            f"- {group}: {n:,} ({share:.2%})"
+            for group, n, share in zip(cube["risk_group"], cube["count"], shares)
+        ]
+        return "Distribución de transacciones por grupo de riesgo:\n" + "\n".join(lines)
+    if metric == "share":
+        share = count / total_count if total_count else 0.0
+        return f"El {share:.2%} de las transacciones ({count:,} de {total_count:,}) corresponde a {scope}."
+    if metric == "score":
+        if extreme and mean:
+            return None
+        if extreme and extreme.group() == "maxim":
+            return f"El score máximo ({scope}) es {selected['score_max'].max():.4f}."
+        if extreme:
+            return f"El score mínimo ({scope}) es {selected['score_min'].min():.4f}."
+        if mean:
+            valid = selected["score_mean"].notna()
+            weights = selected.loc[valid, "count"]
+            value = np.average(selected.loc[valid, "score_mean"], weights=weights) if weights.sum() else np.nan
+            return f"El score promedio ({scope}) es {value:.4f}."
+        return None
+    if metric == "cost":
+        if mean:
+            value = selected["estimated_cost_ponderado"].sum() / count if count else 0.0
+            return f"El costo estimado promedio por transacción ({scope}) es {_money(value)}."
+        return f"El costo estimado ponderado ({scope}) es {_money(selected['estimated_cost_ponderado'].sum())}."
+    if metric == "amount":
+        if mean:
+            value = selected["amount"].sum() / count if count else 0.0
+            return f"El monto promedio por transacción ({scope}) es {_money(value)}."
+        return f"El monto total de transacciones ({scope}) es {_money(selected['amount'].sum())}."
+    return f"Hay {count:,} transacciones ({scope})."
+
+
+class QueryCache:
+    """
+    Caché LRU en memoria de respuestas del LLM (código generado y resultado).
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        if key not in self._entries:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return self._entries[key]
+
+    def put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+def _strip_code_fences(code: str) -> str:
+    match = re.search(r"```(?:python)?\n(.*?)```", code, re.DOTALL)
+    return match.group(1) if match else code
+
+
+@dataclass
+class AgentAnswer:
+    text: str
+    source: str  # "cube", "cache", "llm", "chat" o "error"
+    code: str = None
+
+
+class CFOAgent:
+    """
+    Responde preguntas del chat usando primero el cubo y la caché y, solo si hace
+    falta, el LLM (client con la interfaz chat.completions.create de openai).
+    """
+
+    def __init__(self, client, model: str = CHAT_MODEL, cache_size: int = 256):
+        self.client = client
+        self.model = model
+        self.cache = QueryCache(cache_size)
+
+    def _complete(self, messages) -> str:
+        completion = self.client.chat.completions.create(model=self.model, messages=messages)
+        return completion.choices[0].message.content
+
+    def answer(self, question: str, cube: pd.DataFrame, version: str, execute) -> AgentAnswer:
+        """
+        execute(code) ejecuta el código generado sobre el frame de display_frame y
+        devuelve el resultado como texto (en la app, SandboxPool.run); solo se llama
+        si la pregunta llega al LLM. version identifica datos + umbrales (cube_version).
+        """
+        if not is_data_question(question):
+            key = ("chat", normalize_question(question))
+            cached = self.cache.get(key)
+            if cached is not None:
+                return AgentAnswer(cached.text, "cache")
+            text = self._complete([
+                {"role": "system", "content": CHAT_PROMPT},
+                {"role": "user", "content": question},
+            ])
+            self.cache.put(key, AgentAnswer(text, "chat"))
+            return AgentAnswer(text, "chat")
+
+        text = answer_from_cube(question, cube)
+        if text is not None:
+            return AgentAnswer(text, "cube")
+
+        key = ("data", normalize_question(question), version)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return AgentAnswer(cached.text, "cache", cached.code)
+
+        prompt = CODE_PROMPT.format(
+            question=question,
+            groups=", ".join(f"'{g}'" for g in cube["risk_group"]),
+            packages=", ".join(f"'{p}'" for p in dict.fromkeys(cube["paquete_servicio"])),
+            fraud_group=cube["risk_group"].iloc[-1],
+        )
+        code = _strip_code_fences(self._complete([{"role": "system", "content": prompt}]))
+        try:
+            text = execute(code)
+        except Exception as e:
+            # Los errores no se cachean: la próxima vez se vuelve a pedir código.
+            return AgentAnswer(
+                f"Error al ejecutar el código Python generado: {e}. Intenta reformular tu pregunta.", "error", code
+            )
+        if not text:
+            return AgentAnswer("No pude obtener una respuesta específica de los datos con ese código.", "error", code)
+        answer = AgentAnswer(text, "llm", code)
+        self.cache.put(key, answer)
+        return answer
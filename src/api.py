@@ -0,0 +1,258 @@
+# src/api.py
+"""
+Servicio de scoring local.
+
+Uso:
+    MODEL_PATH=model/xgb_model.joblib uvicorn src.api:app --port 8080
+
+Las requests concurrentes se agrupan en micro-batches (MAX_BATCH_SIZE filas o
+MAX_WAIT_MS milisegundos, lo que ocurra primero) para llamar a predict_proba una
+sola vez por batch.
+
+Si el modelo usa features de velocidad por usuario, cada transacción puntuada se
+registra en un UserFeatureStore (FEATURE_STORE_PATH agrega la capa SQLite).
+"""
+import asyncio
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Union
+
+import numpy as np
+import pandas as pd
+from fastapi import Body, FastAPI, HTTPException, Request
+
+from src.client import deserialize_chunk
+from src.feature_store import UserFeatureStore
+from src.features import velocity_feature_names
+from src.model import assign_groups_and_services_from_proba, load_model, load_pipeline, model_version, predict
+
+MODEL_PATH = os.getenv("MODEL_PATH", "model/xgb_model.pkl")
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "256"))
+MAX_WAIT_MS = float(os.getenv("MAX_WAIT_MS", "5"))
+FEATURE_STORE_PATH = os.getenv("FEATURE_STORE_PATH")
+FEATURE_STORE_MAX_USERS = int(os.getenv("FEATURE_STORE_MAX_USERS", "100000"))
+
+
+class LatencyTracker:
+    """
+    Guarda las últimas `window` latencias (en ms) y calcula percentiles.
+    """
+
+    def __init__(self, window: int = 10_000):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+
+    def record(self, seconds: float):
+        self.samples.append(seconds * 1000)
+        self.count += 1
+
+    def summary(self) -> dict:
+        if not self.samples:
+            return {"count": self.count, "p50_ms": None, "p99_ms": None}
+        values = np.fromiter(self.samples, dtype=np.float64)
+        return {
+            "count": self.count,
+            "p50_ms": float(np.percentile(values, 50)),
+            "p99_ms": float(np.percentile(values, 99)),
+        }
+
+
+class MicroBatcher:
+    """
+    Junta las filas de varias requests en una cola asyncio y las puntúa juntas.
+    score_fn recibe un DataFrame y devuelve un array de probabilidades.
+    """
+
+    def __init__(self, score_fn, max_batch_size: int = MAX_BATCH_SIZE, max_wait_ms: float = MAX_WAIT_MS):
+        self.score_fn = score_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue = asyncio.Queue()
+        self.batch_sizes = deque(maxlen=10_000)
+        self.n_batches = 0
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def submit(self, records: List[dict]) -> np.ndarray:
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((records, future))
+        return await future
+
+    async def _collect(self):
+        items = [await self.queue.get()]
+        n_rows = len(items[0][0])
+        deadline = time.perf_counter() + self.max_wait
+        while n_rows < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self.queue.get(), timeout=remaining)
+            except asyncio.TimeoutError:
+                break
+            items.append(item)
+            n_rows += len(item[0])
+        return items
+
+    async def _run(self):
+        while True:
+            items = await self._collect()
+            records = [record for batch, _ in items for record in batch]
+            try:
+                scores = await asyncio.to_thread(self.score_fn, pd.DataFrame.from_records(records))
+            except Exception as e:
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.batch_sizes.append(len(records))
+            self.n_batches += 1
+            start = 0
+            for batch, future in items:
+                if not future.done():
+                    future.set_result(scores[start:start + len(batch)])
+                start += len(batch)
+
+
+def uses_velocity_features(pipeline) -> bool:
+    return pipeline is not None and any(
+        col in pipeline.feature_names_ for col in velocity_feature_names()
+    )
+
+
+def make_score_fn(model, pipeline=None, feature_store=None, register: bool = True):
+    """
+    Devuelve una función DataFrame crudo -> probabilidades que aplica el
+    FeaturePipeline persistido (si hay) y ordena las columnas como el modelo.
+    Con feature_store, las filas se completan con sus features de velocidad antes
+    de codificarlas; solo se registran en él si register es True.
+    """
+    feature_names = model.get_booster().feature_names
+
+    def score(df: pd.DataFrame) -> np.ndarray:
+        if feature_store is not None:
+            df = feature_store.observe_frame(df, register=register)
+        if pipeline is not None:
+            df = pipeline.transform(df.reindex(columns=pipeline.feature_names_))
+        X = df.reindex(columns=feature_names).astype(np.float32)
+        _, y_proba = predict(model, X)
+        return y_proba
+
+    return score
+
+
+def create_app(model=None, pipeline=None, model_path: str = MODEL_PATH,
+               max_batch_size: int = MAX_BATCH_SIZE, max_wait_ms: float = MAX_WAIT_MS,
+               feature_store=None) -> FastAPI:
+    """
+    Crea la app. Si no se pasa model, se carga una sola vez al arrancar con load_model
+    (y el pipeline guardado al lado, si existe). Si el pipeline usa features de
+    velocidad y no se pasa feature_store, se crea uno con FEATURE_STORE_PATH.
+    """
+    # Un tracker por endpoint: un chunk de /predict/batch tarda órdenes de magnitud más que un /predict.
+    state = {"latency": {"predict": LatencyTracker(), "predict_batch": LatencyTracker()}}
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        loaded_model, loaded_pipeline = model, pipeline
+        if loaded_model is None:
+            loaded_model = load_model(model_path)
+            try:
+                loaded_pipeline = load_pipeline(model_path)
+            except FileNotFoundError:
+                loaded_pipeline = None
+        store = feature_store
+        if store is None and uses_velocity_features(loaded_pipeline):
+            store = UserFeatureStore(max_users=FEATURE_STORE_MAX_USERS, db_path=FEATURE_STORE_PATH)
+        state["feature_store"] = store
+        state["model_version"] = model_version(loaded_model)
+        state["score_fn"] = make_score_fn(loaded_model, loaded_pipeline, store)
+        # Los chunks de /predict/batch suelen ser archivos históricos (y se re-suben):
+        # leen el feature store pero no lo alimentan.
+        state["batch_score_fn"] = make_score_fn(loaded_model, loaded_pipeline, store, register=False)
+        state["batcher"] = MicroBatcher(state["score_fn"], max_batch_size, max_wait_ms)
+        state["batcher"].start()
+        yield
+        await state["batcher"].stop()
+        if store is not None and feature_store is None:
+            store.close()
+
+    app = FastAPI(title="Fraud scoring API", lifespan=lifespan)
+
+    @app.post("/predict")
+    async def predict_endpoint(payload: Union[Dict[str, Any], List[Dict[str, Any]]] = Body(...)):
+        start = time.perf_counter()
+        records = [payload] if isinstance(payload, dict) else payload
+        if not records:
+            return []
+        y_proba = await state["batcher"].submit(records)
+        grupos = assign_groups_and_services_from_proba(y_proba)
+        response = [
+            {
+                "prediction": float(score),
+                "grupo_fraude": grupo,
+                "paquete_servicio": paquete,
+            }
+            for score, grupo, paquete in zip(y_proba, grupos["grupo_fraude"], grupos["paquete_servicio"])
+        ]
+        for record, item in zip(records, response):
+            if "TransactionID" in record:
+                item["TransactionID"] = record["TransactionID"]
+        state["latency"]["predict"].record(time.perf_counter() - start)
+        return response
+
+    @app.post("/predict/batch")
+    async def predict_batch_endpoint(request: Request):
+        """
+        Recibe un chunk binario (Arrow IPC o Parquet, ver src.client) y devuelve las
+        columnas prediction, grupo_fraude y paquete_servicio en el orden de las filas.
+        Los chunks ya son batches grandes, así que no pasan por el MicroBatcher, y no
+        se registran en el feature store (solo /predict lo alimenta).
+        """
+        start = time.perf_counter()
+        body = await request.body()
+        try:
+            df = deserialize_chunk(body, request.headers.get("content-type", ""))
+        except ValueError as e:
+            raise HTTPException(status_code=415, detail=str(e))
+        y_proba = await asyncio.to_thread(state["batch_score_fn"], df)
+        grupos = assign_groups_and_services_from_proba(y_proba)
+        state["latency"]["predict_batch"].record(time.perf_counter() - start)
+        return {
+            "prediction": grupos["prob_fraude"].astype(float).tolist(),
+            "grupo_fraude": grupos["grupo_fraude"].tolist(),
+            "paquete_servicio": grupos["paquete_servicio"].tolist(),
+        }
+
+    @app.get("/metrics")
+    async def metrics():
+        batcher = state["batcher"]
+        batch_sizes = list(batcher.batch_sizes)
+        store = state.get("feature_store")
+        return {
+            "latency": {endpoint: tracker.summary() for endpoint, tracker in state["latency"].items()},
+            "batches": batcher.n_batches,
+            "mean_batch_size": float(np.mean(batch_sizes)) if batch_sizes else None,
+            "feature_store_users": len(store) if store is not None else None,
+        }
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok", "model_version": state.get("model_version")}
+
+    return app
+
+
+app = create_app()
@@ -0,0 +1,79 @@
+# src/banding.py
+import numpy as np
+import pandas as pd
+
+
+class RiskBands:
+    """
+    Bandas de riesgo configurables: edges crecientes y una etiqueta de grupo y de
+    paquete por banda (len(edges) + 1). La banda i contiene los scores en
+    [edges[i-1], edges[i]); los scores nulos caen en la última banda.
+    """
+
+    def __init__(self, edges, group_labels, package_labels):
+        edges = np.asarray(edges, dtype=np.float64)
+        if np.any(np.diff(edges) < 0):
+            raise ValueError(f"edges debe ser creciente: {edges.tolist()}")
+        if not len(group_labels) == len(package_labels) == len(edges) + 1:
+            raise ValueError("Se necesita una etiqueta de grupo y de paquete por banda (len(edges) + 1)")
+        self.edges = edges
+        self.group_labels = list(group_labels)
+        self.package_labels = list(package_labels)
+
+    def codes(self, scores) -> np.ndarray:
+        """
+        Índice de banda de cada score. Con pocos cortes se suman comparaciones
+        vectorizadas (una pasada por corte), que es más rápido que np.searchsorted.
+        """
+        scores = np.asarray(scores, dtype=np.float64)
+        if len(self.edges) > 8:
+            return np.searchsorted(self.edges, scores, side="right").astype(np.int32)
+        codes = np.zeros(scores.shape, dtype=np.int8)
+        for edge in self.edges:
+            np.add(codes, scores >= edge, out=codes, casting="unsafe")
+        codes[np.isnan(scores)] = len(self.edges)
+        return codes
+
+    def groups(self, scores=None, codes=None) -> pd.Categorical:
+        codes = self.codes(scores) if codes is None else codes
+        return pd.Categorical.from_codes(codes, categories=self.group_labels)
+
+    def packages(self, scores=None, codes=None) -> pd.Categorical:
+        # Las etiquetas de paquete pueden repetirse entre bandas, así que se mapean por código.
+        codes = self.codes(scores) if codes is None else codes
+        categories = list(dict.fromkeys(self.package_labels))
+        mapping = np.array([categories.index(label) for label in self.package_labels])
+        return pd.Categorical.from_codes(mapping[codes], categories=categories)
+
+    def summarize(self, codes, amounts=None) -> pd.DataFrame:
+        """
+        Cantidad y monto total por banda a partir de los códigos ya calculados.
+        """
+        n_bands = len(self.group_labels)
+        summary = pd.DataFrame({
+            "grupo": self.group_labels,
+            "paquete": self.package_labels,
+            "count": np.bincount(codes, minlength=n_bands),
+        })
+        if amounts is not None:
+            amounts = np.nan_to_num(np.asarray(amounts, dtype=np.float64))
+            summary["amount"] = np.bincount(codes, weights=amounts, minlength=n_bands)
+        return summary
+
+
+MODEL_BANDS = RiskBands(
+    edges=[0.3, 0.6, 0.9],
+    group_labels=["Grupo 3", "Grupo 2", "Grupo 1", "Fraudulento"],
+    package_labels=["Paquete Pro", "Paquete Intermedio", "Paquete Simple", "Sin Paquete"],
+)
+
+
+def app_bands(low: float, medium: float, high: float) -> RiskBands:
+    """
+    Bandas del simulador de streamlit_app.py para los umbrales de los sliders.
+    """
+    return RiskBands(
+        edges=[low, medium, high],
+        group_labels=["Bajo riesgo", "Riesgo medio", "Riesgo alto", "Fraude"],
+        package_labels=["Paquete Completo", "Paquete Medio", "Paquete Básico", "Sin Paquete"],
+    )
@@ -0,0 +1,176 @@
+# src/cache.py
+import hashlib
+import json
+import os
+import tempfile
+
+import fsspec
+import pandas as pd
+import pyarrow.parquet as pq
+
+CACHE_DIR = "cache"
+# Se incrementa cuando cambia la lógica de carga/limpieza para invalidar las entradas viejas.
+CACHE_VERSION = 1
+
+MODEL_CACHE_DIR = os.path.join(CACHE_DIR, "models")
+MODEL_CACHE_MAX_BYTES = 2 * 1024 ** 3
+
+SCORE_CACHE_MAX_BYTES = 1024 ** 3
+
+_FINGERPRINT_KEYS = ("size", "etag", "ETag", "generation", "md5Hash", "mtime", "updated", "LastModified")
+
+
+def source_fingerprint(path: str) -> dict:
+    """
+    Devuelve los metadatos que identifican una versión de un archivo local o remoto
+    (tamaño, etag/generation y fecha de modificación) sin descargar su contenido.
+    """
+    fs, fs_path = fsspec.core.url_to_fs(path)
+    info = fs.info(fs_path)
+    fingerprint = {"path": path}
+    for key in _FINGERPRINT_KEYS:
+        if info.get(key) is not None:
+            fingerprint[key] = str(info[key])
+    return fingerprint
+
+
+def cache_key(paths, **params) -> str:
+    """
+    Calcula una clave sha256 a partir de las huellas de los archivos fuente y los parámetros.
+    """
+    payload = {
+        "version": CACHE_VERSION,
+        "sources": [source_fingerprint(p) for p in paths],
+        "params": params,
+    }
+    blob = json.dumps(payload, sort_keys=True, default=str).encode()
+    return hashlib.sha256(blob).hexdigest()
+
+
+def content_hash(files, block_size: int = 8 * 1024 * 1024) -> str:
+    """
+    sha256 del contenido de uno o más archivos abiertos en modo binario, leídos por
+    bloques de block_size. Cada archivo se lee desde el principio y queda rebobinado.
+    """
+    digest = hashlib.sha256()
+    for f in files:
+        f.seek(0)
+        size = 0
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            digest.update(block)
+            size += len(block)
+        # El tamaño separa los archivos: (ab, c) y (a, bc) no colisionan.
+        digest.update(size.to_bytes(8, "little"))
+        f.seek(0)
+    return digest.hexdigest()
+
+
+def content_key(files, **params) -> str:
+    """
+    Como cache_key, pero a partir del contenido de archivos abiertos (por ejemplo los
+    subidos a la app) en lugar de sus metadatos.
+    """
+    payload = {"version": CACHE_VERSION, "content": content_hash(files), "params": params}
+    blob = json.dumps(payload, sort_keys=True, default=str).encode()
+    return hashlib.sha256(blob).hexdigest()
+
+
+def _atomic_write(path: str, write):
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def evict_lru(directory: str, max_bytes: int, keep=()):
+    """
+    Borra los archivos menos usados recientemente (por mtime) de directory hasta que el
+    total ocupe max_bytes o menos. Los archivos de keep nunca se borran.
+    """
+    if not os.path.isdir(directory):
+        return
+    entries = []
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if name.endswith(".tmp") or not os.path.isfile(path):
+            continue
+        stat = os.stat(path)
+        entries.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    keep = {os.path.abspath(p) for p in keep}
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if os.path.abspath(path) in keep:
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def fetch_artifact(path: str, cache_dir: str, max_bytes: int) -> str:
+    """
+    Devuelve una copia local de path. La copia se nombra por la huella del objeto
+    (generation/etag/tamaño/mtime), así que una versión nueva del archivo remoto se
+    descarga de nuevo y varios procesos del mismo host comparten la misma copia.
+    La descarga es atómica y el directorio se mantiene bajo max_bytes con LRU.
+    """
+    _, ext = os.path.splitext(path)
+    local_path = os.path.join(cache_dir, cache_key([path]) + ext)
+    if os.path.exists(local_path):
+        os.utime(local_path)
+        return local_path
+
+    def download(tmp_path):
+        with fsspec.open(path, "rb") as src, open(tmp_path, "wb") as dst:
+            while True:
+                block = src.read(8 * 1024 * 1024)
+                if not block:
+                    break
+                dst.write(block)
+
+    _atomic_write(local_path, download)
+    evict_lru(cache_dir, max_bytes, keep=[local_path])
+    return local_path
+
+
+def frame_path(key: str, namespace: str, cache_dir: str = CACHE_DIR) -> str:
+    return os.path.join(cache_dir, namespace, f"{key}.parquet")
+
+
+def load_cached_frame(key: str, namespace: str, cache_dir: str = CACHE_DIR):
+    """
+    Lee un DataFrame cacheado con memory-map. Devuelve None si la clave no existe.
+    La lectura actualiza el mtime, que es lo que usa evict_lru.
+    """
+    path = frame_path(key, namespace, cache_dir)
+    if not os.path.exists(path):
+        return None
+    os.utime(path)
+    table = pq.read_table(path, memory_map=True)
+    return table.to_pandas()
+
+
+def save_cached_frame(df: pd.DataFrame, key: str, namespace: str, cache_dir: str = CACHE_DIR,
+                      max_bytes: int = None) -> str:
+    """
+    Guarda un DataFrame como Parquet de forma atómica y devuelve la ruta. Con max_bytes
+    el namespace se mantiene bajo ese tamaño borrando las entradas menos usadas.
+    """
+    path = frame_path(key, namespace, cache_dir)
+    _atomic_write(path, lambda tmp: df.to_parquet(tmp, engine="pyarrow"))
+    if max_bytes is not None:
+        evict_lru(os.path.dirname(path), max_bytes, keep=[path])
+    return path
@@ -0,0 +1,119 @@
+# src/client.py
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import requests
+from requests.adapters import HTTPAdapter
+
+ARROW_CONTENT_TYPE = "application/vnd.apache.arrow.stream"
+PARQUET_CONTENT_TYPE = "application/x-parquet"
+
+
+def serialize_chunk(df: pd.DataFrame, fmt: str = "arrow", compression: str = "zstd") -> bytes:
+    """
+    Serializa un chunk de filas como Arrow IPC stream o Parquet comprimido.
+    """
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = io.BytesIO()
+    if fmt == "arrow":
+        options = pa.ipc.IpcWriteOptions(compression=compression)
+        with pa.ipc.new_stream(sink, table.schema, options=options) as writer:
+            writer.write_table(table)
+    elif fmt == "parquet":
+        pq.write_table(table, sink, compression=compression)
+    else:
+        raise ValueError(f"fmt debe ser 'arrow' o 'parquet', no {fmt!r}")
+    return sink.getvalue()
+
+
+def deserialize_chunk(body: bytes, content_type: str) -> pd.DataFrame:
+    """
+    Inverso de serialize_chunk, según el Content-Type de la request.
+    """
+    if content_type.startswith(ARROW_CONTENT_TYPE):
+        return pa.ipc.open_stream(pa.BufferReader(body)).read_all().to_pandas()
+    if content_type.startswith(PARQUET_CONTENT_TYPE):
+        return pq.read_table(pa.BufferReader(body)).to_pandas()
+    raise ValueError(f"Content-Type no soportado: {content_type!r}")
+
+
+def _post_chunk(session, url, df, fmt, retries, backoff, timeout):
+    body = serialize_chunk(df, fmt)
+    content_type = ARROW_CONTENT_TYPE if fmt == "arrow" else PARQUET_CONTENT_TYPE
+    for attempt in range(retries + 1):
+        try:
+            response = session.post(url, data=body, headers={"Content-Type": content_type}, timeout=timeout)
+            if response.status_code < 500:
+                response.raise_for_status()
+                return response.json()
+            error = requests.HTTPError(f"Código de estado {response.status_code}", response=response)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            error = e
+        if attempt < retries:
+            time.sleep(backoff * 2 ** attempt)
+    raise error
+
+
+def score_frame(df: pd.DataFrame, url: str, chunk_rows: int = 50_000, max_workers: int = 4,
+                fmt: str = "arrow", retries: int = 3, backoff: float = 0.5, timeout: float = 300,
+                progress=None) -> pd.DataFrame:
+    """
+    Envía df al endpoint /predict/batch en chunks de chunk_rows filas, con hasta
+    max_workers requests en vuelo sobre una sesión con pool de conexiones. Cada chunk
+    se serializa recién al enviarse y se reintenta (con backoff exponencial) ante
+    errores de conexión o 5xx. progress(hechos, total) se llama desde el hilo que
+    invoca a esta función. Devuelve las columnas de la respuesta en el orden de df.
+    """
+    starts = range(0, len(df), chunk_rows)
+    results = [None] * len(starts)
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    with session, ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            pool.submit(_post_chunk, session, url, df.iloc[start:start + chunk_rows], fmt, retries, backoff, timeout): i
+            for i, start in enumerate(starts)
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            results[futures[future]] = pd.DataFrame(future.result())
+            if progress is not None:
+                progress(done, len(results))
+
+    if not results:
+        return pd.DataFrame({"prediction": np.empty(0)})
+    return pd.concat(results, ignore_index=True)
+
+
+def score_frame_json(df: pd.DataFrame, url: str, timeout: float = 300) -> pd.DataFrame:
+    """
+    Envía df completo como una lista JSON de registros en un solo POST, el protocolo
+    de las APIs desplegadas antes de /predict/batch. Devuelve la respuesta en el orden de df.
+    """
+    response = requests.post(
+        url, data=df.to_json(orient="records"), headers={"Content-Type": "application/json"}, timeout=timeout
+    )
+    response.raise_for_status()
+    return pd.DataFrame(response.json())
+
+
+def score_frame_with_fallback(df: pd.DataFrame, api_url: str, on_fallback=None, **kwargs) -> pd.DataFrame:
+    """
+    score_frame contra {api_url}/predict/batch. Si la API desplegada no tiene ese
+    endpoint (404), llama a on_fallback() (si se da) y envía todo con score_frame_json
+    a api_url. kwargs se pasan a score_frame.
+    """
+    try:
+        return score_frame(df, f"{api_url}/predict/batch", **kwargs)
+    except requests.HTTPError as e:
+        if e.response is None or e.response.status_code != 404:
+            raise
+    if on_fallback is not None:
+        on_fallback()
+    return score_frame_json(df, api_url)
@@ -1,13 +1,238 @@
 # src/data.py
+import re
 import pandas as pd
+import numpy as np
 import os
+from pandas.api.types import union_categoricals
 
-def load_and_merge_data(identity_path: str, transaction_path: str) -> pd.DataFrame:
-    df_identity = pd.read_csv(identity_path)
-    df_transaction = pd.read_csv(transaction_path)
-    df_merged = pd.merge(df_identity, df_transaction, on="TransactionID", how="left")
+from src.cache import CACHE_DIR, cache_key, load_cached_frame, save_cached_frame
+from src.profiling import traced
+
+ID_COLUMNS = ["TransactionID", "TransactionDT"]
+TARGET_COLUMN = "isFraud"
+CATEGORICAL_COLUMNS = [
+    "ProductCD", "card1", "card2", "card3", "card4", "card5", "card6",
+    "P_emaildomain", "R_emaildomain", "DeviceType", "DeviceInfo",
+    "M1", "M2", "M3", "M4", "M5", "M6", "M7", "M8", "M9",
+]
+_CATEGORICAL_ID_PATTERN = re.compile(r"^id_(1[2-9]|2\d|3[0-8])$")
+# Columnas que encode_and_scale codifica al entrenar (train.py); incluye addr1/addr2, que
+# en el CSV se leen como float32.
+MODEL_CATEGORICAL_COLUMNS = [
+    "DeviceType", "DeviceInfo", "ProductCD", "card1", "card2", "card3", "card4", "card5", "card6",
+    "addr1", "addr2", "P_emaildomain", "R_emaildomain",
+    "id_12", "id_13", "id_14", "id_15", "id_16", "id_17", "id_18", "id_19", "id_20",
+    "id_21", "id_22", "id_23", "id_24", "id_25", "id_26", "id_27", "id_28", "id_29", "id_30",
+    "id_31", "id_32", "id_33", "id_34", "id_35", "id_36", "id_37", "id_38",
+    "M1", "M2", "M3", "M4", "M5", "M6", "M7", "M8", "M9",
+]
+
+DEFAULT_CHUNKSIZE = 100_000
+
+def build_schema(columns) -> dict:
+    """
+    Devuelve el mapeo columna -> dtype para las columnas del dataset IEEE:
+    category para card*/emails/M*/id_12..id_38, int32 para IDs y float32 para el resto.
+    """
+    schema = {}
+    for col in columns:
+        if col in ID_COLUMNS:
+            schema[col] = "int32"
+        elif col == TARGET_COLUMN:
+            schema[col] = "int8"
+        elif col in CATEGORICAL_COLUMNS or _CATEGORICAL_ID_PATTERN.match(col):
+            schema[col] = "category"
+        else:
+            schema[col] = "float32"
+    return schema
+
+def _read_header(path: str) -> list:
+    return list(pd.read_csv(path, nrows=0).columns)
+
+def _default_row_nbytes(path: str, columns: list, nrows: int = 10_000) -> float:
+    # Bytes por fila que ocuparían columns con los dtypes por defecto de pd.read_csv,
+    # medidos sobre una muestra leída sin schema.
+    sample = pd.read_csv(path, usecols=columns, nrows=nrows)
+    if sample.empty:
+        return 8.0 * len(columns)
+    return sample.memory_usage(deep=True, index=False).sum() / len(sample)
+
+def _concat_chunks(chunks: list) -> pd.DataFrame:
+    # pd.concat convierte a object las categóricas con categorías distintas,
+    # así que se unifican las categorías antes de concatenar.
+    if len(chunks) == 1:
+        return chunks[0]
+    for col in chunks[0].columns:
+        if isinstance(chunks[0][col].dtype, pd.CategoricalDtype):
+            categories = union_categoricals([chunk[col] for chunk in chunks]).categories
+            for chunk in chunks:
+                chunk[col] = chunk[col].cat.set_categories(categories)
+    return pd.concat(chunks, ignore_index=True)
+
+@traced
+def load_and_merge_data(identity_path: str, transaction_path: str,
+                        chunksize: int = DEFAULT_CHUNKSIZE, verbose: bool = True,
+                        usecols=None, dropna: bool = False) -> pd.DataFrame:
+    """
+    Carga identity y transaction con dtypes explícitos y hace el merge por TransactionID.
+    La tabla de identidad se indexa en memoria y el archivo de transacciones se lee por
+    chunks, uniendo cada chunk contra el índice (hash join). El resultado es el mismo
+    que pd.merge(identity, transaction, on="TransactionID", how="left").
+    usecols limita las columnas leídas de ambos archivos y dropna descarta las filas
+    incompletas chunk a chunk en lugar de hacerlo sobre el frame completo.
+    """
+    identity_columns = _read_header(identity_path)
+    transaction_columns = _read_header(transaction_path)
+    if usecols is not None:
+        usecols = set(usecols) | {"TransactionID"}
+        identity_columns = [c for c in identity_columns if c in usecols]
+        transaction_columns = [c for c in transaction_columns if c in usecols]
+
+    df_identity = pd.read_csv(identity_path, usecols=identity_columns, dtype=build_schema(identity_columns))
+    identity_index = pd.Index(df_identity["TransactionID"])
+    identity_complete = df_identity.notna().all(axis=1).to_numpy() if dropna else None
+
+    transaction_columns = [c for c in transaction_columns if c != "TransactionID"]
+    transaction_schema = build_schema(transaction_columns + ["TransactionID"])
+
+    parts = []
+    positions = []
+    reader = pd.read_csv(
+        transaction_path, usecols=transaction_columns + ["TransactionID"],
+        dtype=transaction_schema, chunksize=chunksize,
+    )
+    for chunk in reader:
+        pos = identity_index.get_indexer(chunk["TransactionID"])
+        mask = pos >= 0
+        if dropna:
+            mask &= identity_complete[pos] & chunk[transaction_columns].notna().all(axis=1).to_numpy()
+        if not mask.any():
+            continue
+        part = chunk.loc[mask, transaction_columns].reset_index(drop=True)
+        parts.append(part)
+        positions.append(pos[mask])
+
+    positions = np.concatenate(positions) if positions else np.empty(0, dtype=np.intp)
+    if parts:
+        df_transaction = _concat_chunks(parts)
+    else:
+        df_transaction = pd.DataFrame(
+            {c: pd.Series(dtype=d) for c, d in build_schema(transaction_columns).items()}
+        )
+
+    if dropna:
+        # Solo quedan filas con transacción; se respeta el orden de la tabla de identidad.
+        order = np.argsort(positions, kind="stable")
+        if not np.array_equal(order, np.arange(len(order))):
+            df_transaction = df_transaction.take(order).reset_index(drop=True)
+        df_identity = df_identity.take(positions[order]).reset_index(drop=True)
+    else:
+        # Las filas de identidad sin transacción quedan con NaN, igual que en un left join.
+        matched = np.full(len(df_identity), -1, dtype=np.intp)
+        matched[positions] = np.arange(len(positions))
+        if not np.array_equal(matched, np.arange(len(matched))):
+            df_transaction = df_transaction.reindex(matched).reset_index(drop=True)
+
+    df_merged = pd.concat([df_identity, df_transaction], axis=1)
+
+    if verbose:
+        default_nbytes = len(df_merged) * (
+            _default_row_nbytes(identity_path, identity_columns)
+            + _default_row_nbytes(transaction_path, transaction_columns)
+        )
+        used_nbytes = int(df_merged.memory_usage(deep=True, index=False).sum())
+        saved = 1 - used_nbytes / default_nbytes if default_nbytes else 0.0
+        print(
+            f"💾 Memoria del merge: {used_nbytes / 1e6:,.1f} MB "
+            f"(vs {default_nbytes / 1e6:,.1f} MB con dtypes por defecto, ahorro {saved:.1%})"
+        )
     return df_merged
 
+def iter_merged_chunks(identity_path: str, transaction_path: str,
+                       chunksize: int = DEFAULT_CHUNKSIZE, usecols=None):
+    """
+    Versión en streaming del merge para scoring: indexa la tabla de identidad en memoria
+    y devuelve, chunk a chunk y en el orden del archivo de transacciones, las filas de
+    transacciones que tienen identidad, con las mismas columnas y dtypes que
+    load_and_merge_data. Las filas de identidad sin transacción no se devuelven.
+    """
+    identity_columns = _read_header(identity_path)
+    transaction_columns = _read_header(transaction_path)
+    if usecols is not None:
+        usecols = set(usecols) | {"TransactionID"}
+        identity_columns = [c for c in identity_columns if c in usecols]
+        transaction_columns = [c for c in transaction_columns if c in usecols]
+
+    df_identity = pd.read_csv(identity_path, usecols=identity_columns, dtype=build_schema(identity_columns))
+    identity_index = pd.Index(df_identity["TransactionID"])
+    transaction_columns = [c for c in transaction_columns if c != "TransactionID"]
+
+    reader = pd.read_csv(
+        transaction_path, usecols=transaction_columns + ["TransactionID"],
+        dtype=build_schema(transaction_columns + ["TransactionID"]), chunksize=chunksize,
+    )
+    for chunk in reader:
+        pos = identity_index.get_indexer(chunk["TransactionID"])
+        mask = pos >= 0
+        if not mask.any():
+            continue
+        yield pd.concat([
+            df_identity.take(pos[mask]).reset_index(drop=True),
+            chunk.loc[mask, transaction_columns].reset_index(drop=True),
+        ], axis=1)
+
+@traced
+def profile_nulls(identity_path: str, transaction_path: str,
+                  chunksize: int = DEFAULT_CHUNKSIZE) -> pd.Series:
+    """
+    Calcula la proporción de nulos por columna del merge identity/transaction en una sola
+    pasada por chunks, sin materializar ningún archivo completo. Equivale a
+    load_and_merge_data(...).isnull().mean().
+    """
+    identity_columns = _read_header(identity_path)
+    transaction_columns = _read_header(transaction_path)
+
+    null_counts = pd.Series(0, index=identity_columns, dtype="int64")
+    identity_ids = []
+    n_rows = 0
+    for chunk in pd.read_csv(identity_path, dtype=build_schema(identity_columns), chunksize=chunksize):
+        null_counts += chunk.isnull().sum()
+        identity_ids.append(chunk["TransactionID"].to_numpy())
+        n_rows += len(chunk)
+    identity_index = pd.Index(np.concatenate(identity_ids) if identity_ids else [])
+
+    transaction_columns = [c for c in transaction_columns if c != "TransactionID"]
+    transaction_nulls = pd.Series(0, index=transaction_columns, dtype="int64")
+    n_matched = 0
+    reader = pd.read_csv(
+        transaction_path, dtype=build_schema(transaction_columns + ["TransactionID"]), chunksize=chunksize
+    )
+    for chunk in reader:
+        mask = identity_index.get_indexer(chunk["TransactionID"]) >= 0
+        transaction_nulls += chunk.loc[mask, transaction_columns].isnull().sum()
+        n_matched += int(mask.sum())
+
+    # Las filas de identidad sin transacción cuentan como nulas en las columnas de transacción.
+    null_counts = pd.concat([null_counts, transaction_nulls + (n_rows - n_matched)])
+    return null_counts / n_rows if n_rows else null_counts.astype(float)
+
+@traced
+def load_clean_data(identity_path: str, transaction_path: str, null_threshold: float = 0.4,
+                    chunksize: int = DEFAULT_CHUNKSIZE, verbose: bool = True) -> pd.DataFrame:
+    """
+    Equivalente out-of-core de clean_data(load_and_merge_data(...)): perfila los nulos,
+    lee solo las columnas que superan el umbral y descarta filas incompletas por chunk.
+    """
+    null_ratio = profile_nulls(identity_path, transaction_path, chunksize)
+    keep = null_ratio[null_ratio <= null_threshold].index
+    if verbose:
+        print(f"🧹 Columnas descartadas por nulos: {len(null_ratio) - len(keep)} de {len(null_ratio)}")
+    return load_and_merge_data(
+        identity_path, transaction_path, chunksize=chunksize, verbose=verbose,
+        usecols=keep, dropna=True,
+    )
+
+@traced
 def clean_data(df: pd.DataFrame, null_threshold: float = 0.4) -> pd.DataFrame:
     df = df.copy()
     null_ratio = df.isnull().mean()
@@ -16,31 +241,78 @@ def clean_data(df: pd.DataFrame, null_threshold: float = 0.4) -> pd.DataFrame:
     df.dropna(inplace=True)
     return df
 
-def create_user_id(df: pd.DataFrame) -> pd.DataFrame:
-    df["user_id"] = (
-        df["card1"].astype(str) + "_" +
-        df["card2"].astype(str) + "_" +
-        df["card3"].astype(str) + "_" +
-        df["card5"].astype(str) + "_" +
-        df["card4"].astype(str) + "_" +
-        df["card6"].astype(str) + "_" +
-        #df["addr1"].astype(str) + "_" +
-        df["dist1"].astype(str) + "_" +
-        df["P_emaildomain"].astype(str) + "_" +
-        df["R_emaildomain"].astype(str) + "_" +
-        df["id_02"].astype(str) + "_" +
-        df["id_05"].astype(str) + "_" +
-        df["id_06"].astype(str) + "_" +
-        df["id_15"].astype(str) + "_" +
-        df["id_30"].astype(str) + "_" +
-        df["id_31"].astype(str) + "_" +
-        df["DeviceInfo"].astype(str)
-    )
-    df.set_index('user_id', inplace=True)
+USER_ID_COLUMNS = [
+    "card1", "card2", "card3", "card5", "card4", "card6",
+    #"addr1",
+    "dist1", "P_emaildomain", "R_emaildomain",
+    "id_02", "id_05", "id_06", "id_15", "id_30", "id_31", "DeviceInfo",
+]
+
+def _user_id_strings(df: pd.DataFrame) -> pd.Series:
+    user_id = df[USER_ID_COLUMNS[0]].astype(str)
+    for col in USER_ID_COLUMNS[1:]:
+        user_id = user_id + "_" + df[col].astype(str)
+    return user_id
+
+def hash_user_id(df: pd.DataFrame) -> np.ndarray:
+    """
+    Calcula una clave uint64 estable por fila hasheando vectorialmente las columnas de USER_ID_COLUMNS.
+    La clave es estable entre corridas mientras los dtypes sean los de build_schema.
+    """
+    return pd.util.hash_pandas_object(df[USER_ID_COLUMNS], index=False).to_numpy(dtype=np.uint64)
+
+@traced
+def create_user_id(df: pd.DataFrame, mode: str = "string", return_lookup: bool = False):
+    """
+    Crea el índice user_id a partir de USER_ID_COLUMNS.
+    mode="string" concatena los valores como texto; mode="hash" usa una clave uint64
+    (ver hash_user_id). Con return_lookup=True devuelve además una tabla user_id -> texto
+    legible, construida solo sobre los usuarios únicos (None en modo string).
+    """
+    if mode == "string":
+        df["user_id"] = _user_id_strings(df)
+        df.set_index('user_id', inplace=True)
+        # El índice ya es legible, no hace falta tabla auxiliar.
+        lookup = None
+    elif mode == "hash":
+        keys = hash_user_id(df)
+        lookup = None
+        if return_lookup:
+            _, first = np.unique(keys, return_index=True)
+            unique_rows = df.iloc[first]
+            lookup = pd.DataFrame(
+                {"user_key": _user_id_strings(unique_rows).to_numpy()},
+                index=pd.Index(keys[first], name="user_id"),
+            )
+        df.index = pd.Index(keys, name="user_id")
+    else:
+        raise ValueError(f"mode debe ser 'string' o 'hash', no {mode!r}")
+
+    if return_lookup:
+        return df, lookup
     return df
 
-def load_preprocess_data(identity_path: str, transaction_path: str, null_threshold: float = 0.4) -> pd.DataFrame:
-    df = load_and_merge_data(identity_path, transaction_path)
-    df = clean_data(df, null_threshold)
-    df = create_user_id(df)
+@traced
+def load_preprocess_data(identity_path: str, transaction_path: str, null_threshold: float = 0.4,
+                         cache_dir: str = CACHE_DIR, user_id_mode: str = "string") -> pd.DataFrame:
+    """
+    Carga, limpia y crea el user_id. Si cache_dir no es None, el resultado se guarda en
+    Parquet bajo cache_dir/merged, con clave derivada de las huellas de los archivos fuente
+    y de null_threshold/user_id_mode, y las siguientes corridas lo leen con memory-map.
+    """
+    key = None
+    if cache_dir is not None:
+        key = cache_key(
+            [identity_path, transaction_path], null_threshold=null_threshold, user_id_mode=user_id_mode
+        )
+        cached = load_cached_frame(key, "merged", cache_dir)
+        if cached is not None:
+            print(f"📦 Datos preprocesados leídos desde la caché: {key[:12]}")
+            return cached
+
+    df = load_clean_data(identity_path, transaction_path, null_threshold)
+    df = create_user_id(df, mode=user_id_mode)
+
+    if key is not None:
+        save_cached_frame(df, key, "merged", cache_dir)
     return df
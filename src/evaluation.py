@@ -0,0 +1,126 @@
+# src/evaluation.py
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed, effective_n_jobs
+
+METRICS = ("accuracy", "f1", "recall", "precision", "roc_auc", "pr_auc")
+
+
+@dataclass
+class EvaluationResult:
+    """
+    Métricas de evaluación, matriz de confusión ([[tn, fp], [fn, tp]], como sklearn)
+    e intervalos de confianza bootstrap por métrica (vacíos si n_bootstrap=0).
+    """
+    metrics: dict
+    confusion_matrix: np.ndarray
+    confidence_intervals: dict = field(default_factory=dict)
+    n_bootstrap: int = 0
+
+    def to_frame(self) -> pd.DataFrame:
+        df = pd.DataFrame({"value": self.metrics})
+        if self.confidence_intervals:
+            df["ci_low"] = [self.confidence_intervals[m][0] for m in df.index]
+            df["ci_high"] = [self.confidence_intervals[m][1] for m in df.index]
+        return df
+
+    def summary(self) -> str:
+        lines = []
+        for name, value in self.metrics.items():
+            line = f"{name:<13}: {value:.4f}"
+            if name in self.confidence_intervals:
+                low, high = self.confidence_intervals[name]
+                line += f"  [{low:.4f}, {high:.4f}]"
+            lines.append(line)
+        lines.append(str(self.confusion_matrix))
+        return "\n".join(lines)
+
+
+class _SortedScores:
+    """
+    Scores ordenados una sola vez (de mayor a menor). Todas las métricas, con o sin
+    pesos bootstrap, salen de sumas acumuladas sobre este orden.
+    """
+
+    def __init__(self, y_true, y_proba, y_pred):
+        y_proba = np.asarray(y_proba, dtype=np.float64)
+        order = np.argsort(-y_proba, kind="mergesort")
+        scores = y_proba[order]
+        self.y = np.asarray(y_true)[order].astype(np.float64)
+        self.pred = np.asarray(y_pred)[order].astype(np.float64)
+        # Último índice de cada grupo de scores empatados.
+        self.last = np.r_[np.flatnonzero(np.diff(scores)), len(scores) - 1]
+
+    def metrics(self, weights=None) -> np.ndarray:
+        y, pred = self.y, self.pred
+        w = np.ones_like(y) if weights is None else weights
+        wy = w * y
+        w_neg = w - wy
+
+        tp_curve = np.r_[0.0, np.cumsum(wy)[self.last]]
+        fp_curve = np.r_[0.0, np.cumsum(w_neg)[self.last]]
+        positives, negatives = tp_curve[-1], fp_curve[-1]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            tpr = tp_curve / positives
+            fpr = fp_curve / negatives
+            roc_auc = np.trapezoid(tpr, fpr)
+            predicted = tp_curve[1:] + fp_curve[1:]
+            precision_curve = np.where(predicted > 0, tp_curve[1:] / predicted, 0.0)
+            # Sin positivos average_precision_score devuelve 0; ROC AUC queda NaN (sklearn falla).
+            pr_auc = np.sum(np.diff(tpr) * precision_curve) if positives > 0 else 0.0
+
+            tp = np.dot(wy, pred)
+            fp = np.dot(w_neg, pred)
+            fn = positives - tp
+            tn = negatives - fp
+            precision = tp / (tp + fp) if tp + fp > 0 else 0.0
+            recall = tp / positives if positives > 0 else 0.0
+            f1 = 2 * tp / (2 * tp + fp + fn) if tp + fp + fn > 0 else 0.0
+            accuracy = (tp + tn) / (positives + negatives)
+        return np.array([accuracy, f1, recall, precision, roc_auc, pr_auc, tn, fp, fn, tp])
+
+
+def _bootstrap_chunk(sorted_scores, n_replicates, seed) -> np.ndarray:
+    # Remuestrear con reposición equivale a pesar cada fila por cuántas veces salió,
+    # así que no hace falta volver a ordenar en cada réplica.
+    rng = np.random.default_rng(seed)
+    n = len(sorted_scores.y)
+    out = np.empty((n_replicates, len(METRICS)))
+    for i in range(n_replicates):
+        weights = np.bincount(rng.integers(0, n, n), minlength=n).astype(np.float64)
+        out[i] = sorted_scores.metrics(weights)[:len(METRICS)]
+    return out
+
+
+def evaluate(y_true, y_proba, threshold=0.5, y_pred=None, n_bootstrap=0, confidence=0.95,
+             n_jobs=-1, random_state=42) -> EvaluationResult:
+    """
+    Evalúa un clasificador binario ordenando los scores una sola vez.
+
+    Calcula accuracy, F1, recall y precision para y_pred (o y_proba >= threshold), la
+    matriz de confusión, ROC AUC y PR AUC (average precision). Con n_bootstrap > 0 agrega
+    intervalos de confianza bootstrap, repartiendo las réplicas entre n_jobs procesos.
+    """
+    if y_pred is None:
+        y_pred = np.asarray(y_proba) >= threshold
+    sorted_scores = _SortedScores(y_true, y_proba, y_pred)
+    values = sorted_scores.metrics()
+    metrics = {name: float(value) for name, value in zip(METRICS, values)}
+    confusion = values[len(METRICS):].astype(np.int64).reshape(2, 2)
+
+    intervals = {}
+    if n_bootstrap > 0:
+        n_chunks = min(n_bootstrap, effective_n_jobs(n_jobs))
+        sizes = [len(c) for c in np.array_split(np.arange(n_bootstrap), n_chunks)]
+        seeds = np.random.SeedSequence(random_state).spawn(n_chunks)
+        replicates = np.vstack(Parallel(n_jobs=n_jobs)(
+            delayed(_bootstrap_chunk)(sorted_scores, size, seed) for size, seed in zip(sizes, seeds)
+        ))
+        alpha = (1 - confidence) / 2
+        low, high = np.nanquantile(replicates, [alpha, 1 - alpha], axis=0)
+        intervals = {name: (float(l), float(h)) for name, l, h in zip(METRICS, low, high)}
+
+    return EvaluationResult(metrics, confusion, intervals, n_bootstrap)
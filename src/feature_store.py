@@ -0,0 +1,296 @@
+# src/feature_store.py
+"""
+Feature store por usuario para scoring en tiempo real.
+
+Mantiene, por clave de usuario (la de create_user_id), los montos de las últimas
+transacciones dentro de cada ventana de VELOCITY_WINDOWS con sumas corrientes, así
+cada transacción nueva actualiza los contadores en O(1) amortizado y los features de
+velocidad se leen sin recorrer la historia. Son los mismos features que
+add_velocity_features calcula offline para el entrenamiento.
+
+La capa en memoria está acotada por LRU (max_users, None = sin límite); con db_path los usuarios
+desalojados se guardan en SQLite y se recuperan al volver a aparecer. Los usuarios
+sin transacciones en ttl segundos (en tiempo de TransactionDT) se descartan; para
+ellos user_secs_since_prev vuelve a ser FIRST_TRANSACTION_GAP.
+
+Solo se registran transacciones nuevas: una con TransactionID ya visto o con tiempo
+anterior a la última del usuario (reenvíos, archivos históricos) no cambia el estado
+y sus features se calculan sobre la historia retenida.
+"""
+import json
+import sqlite3
+import threading
+from collections import OrderedDict, deque
+
+import numpy as np
+import pandas as pd
+
+from src.data import USER_ID_COLUMNS, build_schema, hash_user_id
+from src.features import FIRST_TRANSACTION_GAP, VELOCITY_WINDOWS, velocity_feature_names
+
+DEFAULT_TTL = 30 * 86_400
+
+
+class _UserState:
+    __slots__ = ("events", "counts", "sums", "squares", "last_time", "ids")
+
+    def __init__(self, n_windows: int):
+        self.events = [deque() for _ in range(n_windows)]  # (tiempo, monto, TransactionID)
+        self.counts = [0] * n_windows
+        self.sums = [0.0] * n_windows
+        self.squares = [0.0] * n_windows
+        self.last_time = None
+        self.ids = set()  # TransactionID dentro de la ventana más larga
+
+
+class UserFeatureStore:
+    """
+    Contadores móviles por usuario con TTL y LRU, en memoria y opcionalmente en SQLite.
+    Es thread-safe: lecturas y escrituras se serializan con un lock.
+    """
+
+    def __init__(self, windows=VELOCITY_WINDOWS, ttl: float = DEFAULT_TTL, max_users: int = 100_000,
+                 db_path: str = None):
+        self.labels = list(windows)
+        self.seconds = [windows[label] for label in self.labels]
+        self._longest = int(np.argmax(self.seconds))
+        self.ttl = max(ttl, max(self.seconds))
+        self.max_users = max_users
+        self.feature_names = velocity_feature_names(windows)
+        self._users = OrderedDict()
+        self._now = -np.inf
+        self._lock = threading.Lock()
+        self._db = None
+        if db_path is not None:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS users (user_id TEXT PRIMARY KEY, last_time REAL, events TEXT)"
+            )
+
+    def __len__(self):
+        return len(self._users)
+
+    def __contains__(self, user_id):
+        return user_id in self._users
+
+    # --- estado por usuario -------------------------------------------------
+
+    def _add(self, state: _UserState, time: float, amount: float, transaction_id=None):
+        for i in range(len(self.seconds)):
+            state.events[i].append((time, amount, transaction_id))
+            state.counts[i] += 1
+            state.sums[i] += amount
+            state.squares[i] += amount * amount
+        if transaction_id is not None:
+            state.ids.add(transaction_id)
+        state.last_time = time
+
+    def _expire(self, state: _UserState, time: float):
+        # Saca de cada ventana las transacciones con tiempo <= time - ventana.
+        for i, seconds in enumerate(self.seconds):
+            events = state.events[i]
+            while events and events[0][0] <= time - seconds:
+                _, amount, transaction_id = events.popleft()
+                if i == self._longest:
+                    state.ids.discard(transaction_id)
+                state.counts[i] -= 1
+                state.sums[i] -= amount
+                state.squares[i] -= amount * amount
+            if not events:
+                state.sums[i] = state.squares[i] = 0.0
+
+    def _features(self, state: _UserState, time: float, amount: float = None) -> dict:
+        features = {}
+        for i, label in enumerate(self.labels):
+            count, total, squares = state.counts[i], state.sums[i], state.squares[i]
+            if amount is not None:
+                count, total, squares = count + 1, total + amount, squares + amount * amount
+            mean = total / count if count else 0.0
+            variance = squares / count - mean * mean if count > 1 else 0.0
+            features[f"user_txn_count_{label}"] = count
+            features[f"user_amt_sum_{label}"] = total
+            features[f"user_amt_mean_{label}"] = mean
+            features[f"user_amt_std_{label}"] = np.sqrt(max(variance, 0.0))
+        last_time = state.last_time
+        features["user_secs_since_prev"] = FIRST_TRANSACTION_GAP if last_time is None else time - last_time
+        return features
+
+    def _scan_features(self, state: _UserState, time: float, amount: float = None, replayed: bool = False) -> dict:
+        # Features recorriendo la historia retenida (la ventana más larga) hasta time,
+        # inclusive, sin tocar el estado. Sirve para tiempos anteriores a last_time, en
+        # los que no valen las sumas corrientes, y para peek.
+        past = [(t, a) for t, a, _ in state.events[self._longest] if t <= time]
+        features = {}
+        for label, seconds in zip(self.labels, self.seconds):
+            amounts = [a for t, a in past if t > time - seconds]
+            if amount is not None:
+                amounts.append(amount)
+            count, total = len(amounts), float(sum(amounts))
+            mean = total / count if count else 0.0
+            variance = sum(a * a for a in amounts) / count - mean * mean if count > 1 else 0.0
+            features[f"user_txn_count_{label}"] = count
+            features[f"user_amt_sum_{label}"] = total
+            features[f"user_amt_mean_{label}"] = mean
+            features[f"user_amt_std_{label}"] = np.sqrt(max(variance, 0.0))
+        previous = [t for t, _ in past]
+        if replayed:
+            # La transacción ya está en la historia: la anterior es la penúltima.
+            previous = previous[:-1]
+        features["user_secs_since_prev"] = time - previous[-1] if previous else FIRST_TRANSACTION_GAP
+        return features
+
+    def _expired(self, state: _UserState) -> bool:
+        return state.last_time is not None and state.last_time <= self._now - self.ttl
+
+    # --- capas en memoria y en disco ----------------------------------------
+
+    def _get(self, user_id, create: bool):
+        state = self._users.get(user_id)
+        if state is None and self._db is not None:
+            state = self._load(user_id)
+        if state is not None and self._expired(state):
+            self._drop(user_id)
+            state = None
+        if state is None:
+            if not create:
+                return None
+            state = _UserState(len(self.seconds))
+        self._users[user_id] = state
+        self._users.move_to_end(user_id)
+        return state
+
+    def _drop(self, user_id):
+        self._users.pop(user_id, None)
+        if self._db is not None:
+            self._db.execute("DELETE FROM users WHERE user_id = ?", (str(user_id),))
+
+    def _evict(self):
+        # Los menos usados están al principio: se descartan si vencieron y, si sigue
+        # habiendo más de max_users, se bajan a SQLite (o se pierden sin db_path).
+        while self._users:
+            user_id, state = next(iter(self._users.items()))
+            if self._expired(state):
+                self._drop(user_id)
+            elif self.max_users is not None and len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+                if self._db is not None:
+                    self._save(user_id, state)
+            else:
+                break
+
+    def _save(self, user_id, state: _UserState):
+        # La ventana más larga contiene a las demás; al cargar se vuelven a partir.
+        events = [(t, a, _json_id(i)) for t, a, i in state.events[self._longest]]
+        self._db.execute(
+            "INSERT OR REPLACE INTO users VALUES (?, ?, ?)",
+            (str(user_id), state.last_time, json.dumps(events)),
+        )
+
+    def _load(self, user_id):
+        row = self._db.execute(
+            "SELECT last_time, events FROM users WHERE user_id = ?", (str(user_id),)
+        ).fetchone()
+        if row is None:
+            return None
+        last_time, events = row
+        state = _UserState(len(self.seconds))
+        for time, amount, *transaction_id in json.loads(events):
+            self._add(state, time, amount, transaction_id[0] if transaction_id else None)
+        state.last_time = last_time
+        if last_time is not None:
+            self._expire(state, last_time)
+        return state
+
+    # --- API pública --------------------------------------------------------
+
+    def observe(self, user_id, time: float, amount: float, transaction_id=None) -> dict:
+        """
+        Registra una transacción y devuelve sus features de velocidad (la ventana
+        incluye a la propia transacción, igual que add_velocity_features). Si
+        transaction_id ya se registró o time es anterior a la última transacción del
+        usuario, no se registra y se devuelven los features sobre la historia retenida.
+        """
+        with self._lock:
+            state = self._get(user_id, create=True)
+            if transaction_id is not None and transaction_id in state.ids:
+                return self._scan_features(state, time, replayed=True)
+            if state.last_time is not None and time < state.last_time:
+                return self._scan_features(state, time, amount)
+            self._now = max(self._now, time)
+            self._expire(state, time)
+            features = self._features(state, time, amount)
+            self._add(state, time, amount, transaction_id)
+            self._evict()
+            return features
+
+    def peek(self, user_id, time: float, amount: float = None) -> dict:
+        """
+        Features que tendría una transacción de user_id en time (con amount, si se da)
+        sin registrarla. Es de solo lectura: no vence eventos ni cambia el orden LRU.
+        """
+        with self._lock:
+            state = self._users.get(user_id)
+            if state is None and self._db is not None:
+                state = self._load(user_id)
+            if state is None or self._expired(state):
+                state = _UserState(len(self.seconds))
+            return self._scan_features(state, time, amount)
+
+    def observe_frame(self, df: pd.DataFrame, time_column: str = "TransactionDT",
+                      amount_column: str = "TransactionAmt", register: bool = True) -> pd.DataFrame:
+        """
+        Registra las filas de df en orden (transacciones crudas, como las recibe la API)
+        y devuelve df con las columnas de velocidad agregadas en float32. Con
+        register=False solo se leen los features (peek), sin tocar el estado.
+        """
+        keys = record_user_keys(df)
+        times = df[time_column].to_numpy(dtype=np.float64)
+        amounts = df[amount_column].to_numpy(dtype=np.float64, na_value=0.0)
+        if not register:
+            rows = [self.peek(key, time, amount) for key, time, amount in zip(keys, times, amounts)]
+        else:
+            ids = df["TransactionID"].tolist() if "TransactionID" in df.columns else [None] * len(df)
+            rows = [
+                self.observe(key, time, amount, transaction_id)
+                for key, time, amount, transaction_id in zip(keys, times, amounts, ids)
+            ]
+        features = pd.DataFrame.from_records(rows, columns=self.feature_names, index=df.index)
+        return df.assign(**features.astype(np.float32))
+
+    def flush(self):
+        """
+        Guarda en SQLite todos los usuarios en memoria y borra los vencidos.
+        """
+        if self._db is None:
+            return
+        with self._lock:
+            for user_id, state in self._users.items():
+                self._save(user_id, state)
+            self._db.execute("DELETE FROM users WHERE last_time <= ?", (self._now - self.ttl,))
+            self._db.commit()
+
+    def close(self):
+        self.flush()
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+def _json_id(transaction_id):
+    # Los TransactionID llegan como enteros de numpy desde los DataFrames.
+    return transaction_id.item() if isinstance(transaction_id, np.generic) else transaction_id
+
+
+def record_user_keys(df: pd.DataFrame) -> np.ndarray:
+    """
+    Claves de usuario (hash_user_id) para transacciones crudas. Se aplican los dtypes
+    de build_schema, con las categóricas como texto como al leerlas del CSV, para que
+    la clave coincida con la del entrenamiento.
+    """
+    users = df.reindex(columns=USER_ID_COLUMNS)
+    for col, dtype in build_schema(USER_ID_COLUMNS).items():
+        if dtype == "category":
+            users[col] = users[col].map(lambda v: v if pd.isna(v) else str(v)).astype("category")
+        else:
+            users[col] = users[col].astype(dtype)
+    return hash_user_id(users)
@@ -0,0 +1,105 @@
+# src/inference.py
+import json
+
+import numpy as np
+
+
+class CompiledPredictor:
+    """
+    Predictor de baja latencia para un XGBClassifier binario ya entrenado.
+
+    Los árboles del booster se aplanan en arrays NumPy contiguos (hijos, feature,
+    umbral float32, dirección por defecto para nulos y valor de hoja) y se recorren
+    todos a la vez, nivel por nivel, sobre una matriz float32. Así una transacción se
+    puntúa sin armar un DataFrame ni pasar por la validación de predict_proba.
+    method="inplace" usa booster.inplace_predict sobre el mismo array.
+    """
+
+    def __init__(self, model, pipeline=None, method="compiled"):
+        if method not in ("compiled", "inplace"):
+            raise ValueError(f"method debe ser 'compiled' o 'inplace', no {method!r}")
+        self.method = method
+        self.pipeline = pipeline
+        self.booster = model.get_booster()
+        self.feature_names = self.booster.feature_names
+        best_iteration = getattr(model, "best_iteration", None)
+        self.iteration_range = (0, best_iteration + 1) if best_iteration is not None else (0, 0)
+        self._flatten()
+        # Buffer preasignado para puntuar una transacción por vez.
+        self._row = np.empty((1, len(self.feature_names)), dtype=np.float32)
+
+    def _flatten(self):
+        config = json.loads(self.booster.save_raw("json"))["learner"]
+        trees_model = config["gradient_booster"]["model"]
+        n_trees = len(trees_model["trees"])
+        if self.iteration_range[1]:
+            n_trees = trees_model["iteration_indptr"][self.iteration_range[1]]
+
+        left, right, feature, threshold, default_left, value, roots = [], [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for tree in trees_model["trees"][:n_trees]:
+            tree_left = np.asarray(tree["left_children"], dtype=np.int64)
+            tree_right = np.asarray(tree["right_children"], dtype=np.int64)
+            n_nodes = len(tree_left)
+            nodes = np.arange(n_nodes)
+            is_leaf = tree_left == -1
+            # Las hojas apuntan a sí mismas para poder iterar max_depth veces sin chequeos.
+            left.append(np.where(is_leaf, nodes, tree_left) + offset)
+            right.append(np.where(is_leaf, nodes, tree_right) + offset)
+            feature.append(np.where(is_leaf, 0, tree["split_indices"]))
+            conditions = np.asarray(tree["split_conditions"], dtype=np.float32)
+            threshold.append(conditions)
+            value.append(np.where(is_leaf, conditions, 0).astype(np.float32))
+            default_left.append(np.asarray(tree["default_left"], dtype=bool))
+            roots.append(offset)
+            offset += n_nodes
+            max_depth = max(max_depth, _tree_depth(tree_left, tree_right))
+
+        self.left = np.concatenate(left)
+        self.right = np.concatenate(right)
+        self.feature = np.concatenate(feature).astype(np.int64)
+        self.threshold = np.concatenate(threshold)
+        self.default_left = np.concatenate(default_left)
+        self.value = np.concatenate(value)
+        self.roots = np.asarray(roots, dtype=np.int64)
+        self.max_depth = max_depth
+
+        base_score = float(config["learner_model_param"]["base_score"].strip("[]"))
+        self.base_margin = np.float32(np.log(base_score / (1 - base_score)))
+
+    def margin(self, X: np.ndarray) -> np.ndarray:
+        node = np.broadcast_to(self.roots, (X.shape[0], len(self.roots))).copy()
+        rows = np.arange(X.shape[0])[:, None]
+        for _ in range(self.max_depth):
+            fvalue = X[rows, self.feature[node]]
+            go_left = np.where(np.isnan(fvalue), self.default_left[node], fvalue < self.threshold[node])
+            node = np.where(go_left, self.left[node], self.right[node])
+        return self.value[node].sum(axis=1, dtype=np.float32) + self.base_margin
+
+    def predict_proba(self, X) -> np.ndarray:
+        """
+        Probabilidad de fraude para una matriz (n_filas, n_features) en el orden de feature_names.
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[None, :]
+        if self.method == "inplace":
+            return self.booster.inplace_predict(X, iteration_range=self.iteration_range, validate_features=False)
+        return 1 / (1 + np.exp(-self.margin(X)))
+
+    def predict_record(self, record: dict) -> float:
+        """
+        Puntúa una transacción cruda (dict) usando el FeaturePipeline y el buffer preasignado.
+        """
+        self._row[0] = self.pipeline.transform_record(record, self.feature_names)
+        return float(self.predict_proba(self._row)[0])
+
+
+def _tree_depth(left: np.ndarray, right: np.ndarray) -> int:
+    depth = np.zeros(len(left), dtype=np.int64)
+    for node in range(len(left)):
+        if left[node] != -1:
+            depth[left[node]] = depth[node] + 1
+            depth[right[node]] = depth[node] + 1
+    return int(depth.max())
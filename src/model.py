@@ -1,40 +1,179 @@
+import xgboost as xgb
 from xgboost import XGBClassifier
-from sklearn.metrics import (
-    accuracy_score, precision_score, recall_score, f1_score, roc_auc_score,
-    classification_report, confusion_matrix
-)
+import hashlib
 import joblib
 import numpy as np
 import os
+import tempfile
 import fsspec
+from fsspec.implementations.local import LocalFileSystem
 
+from src.banding import MODEL_BANDS
+from src.cache import MODEL_CACHE_DIR, MODEL_CACHE_MAX_BYTES, fetch_artifact
+from src.evaluation import evaluate
+from src.profiling import traced
 
 
-def train_xgb_model(X_train, y_train, params=None):
+
+DEFAULT_PARAMS = {
+    "n_estimators": 400,
+    "max_depth": 10,
+    "learning_rate": 0.2,
+    "subsample": 0.8,
+    "colsample_bytree": 1.0,
+    "gamma": 0,
+    "eval_metric": "logloss",
+    "random_state": 42,
+    "n_jobs": -1,
+    "tree_method": "hist",
+    "max_bin": 256,
+}
+
+
+class ChunkIterator(xgb.DataIter):
     """
-    Entrena un modelo XGBoost con los parámetros especificados o por defecto.
+    Iterador para construir matrices de XGBoost por partes (external memory).
+    Recibe una lista de funciones sin argumentos que devuelven (X, y, sample_weight);
+    cada chunk se carga recién cuando XGBoost lo pide.
+    """
+
+    def __init__(self, chunk_loaders, cache_prefix=None):
+        self._loaders = list(chunk_loaders)
+        self._it = 0
+        super().__init__(cache_prefix=cache_prefix)
+
+    def next(self, input_data):
+        if self._it == len(self._loaders):
+            return False
+        X, y, sample_weight = self._loaders[self._it]()
+        input_data(
+            data=np.ascontiguousarray(X, dtype=np.float32),
+            label=None if y is None else np.asarray(y),
+            weight=sample_weight,
+            feature_names=list(X.columns) if hasattr(X, "columns") else None,
+        )
+        self._it += 1
+        return True
+
+    def reset(self):
+        self._it = 0
+
+
+def frame_chunks(X, y=None, sample_weight=None, chunk_rows=500_000):
+    """
+    Parte un DataFrame en loaders de chunk_rows filas para ChunkIterator.
+    """
+    def loader(start):
+        stop = start + chunk_rows
+        return (
+            X.iloc[start:stop],
+            None if y is None else np.asarray(y)[start:stop],
+            None if sample_weight is None else np.asarray(sample_weight)[start:stop],
+        )
+    return [lambda start=start: loader(start) for start in range(0, len(X), chunk_rows)]
+
+
+def build_dmatrix(X, y=None, sample_weight=None, ref=None, max_bin=256,
+                  external_memory=False, chunk_rows=500_000, cache_prefix=None):
+    """
+    Construye una QuantileDMatrix (histogramas hist) en float32 a partir de un DataFrame
+    o de un ChunkIterator. Con external_memory=True los datos se cuantizan chunk a chunk
+    y las páginas se guardan en disco (cache_prefix) en vez de en RAM.
+    """
+    if isinstance(X, ChunkIterator):
+        data_iter = X
+    elif external_memory:
+        data_iter = ChunkIterator(frame_chunks(X, y, sample_weight, chunk_rows), cache_prefix=cache_prefix)
+    else:
+        data_iter = None
+
+    if data_iter is not None:
+        if external_memory:
+            if data_iter.cache_prefix is None:
+                data_iter.cache_prefix = os.path.join(tempfile.gettempdir(), "xgb_cache")
+            return xgb.ExtMemQuantileDMatrix(data_iter, max_bin=max_bin, ref=ref)
+        return xgb.QuantileDMatrix(data_iter, max_bin=max_bin, ref=ref)
+
+    return xgb.QuantileDMatrix(
+        np.ascontiguousarray(X, dtype=np.float32),
+        label=None if y is None else np.asarray(y),
+        weight=sample_weight,
+        feature_names=list(X.columns) if hasattr(X, "columns") else None,
+        max_bin=max_bin,
+        ref=ref,
+    )
+
+
+def _native_params(params: dict):
+    # Traduce los nombres del wrapper de sklearn a los de xgb.train.
+    params = dict(params)
+    num_boost_round = params.pop("n_estimators")
+    params.pop("use_label_encoder", None)
+    params.pop("max_bin", None)
+    params["seed"] = params.pop("random_state", 0)
+    n_jobs = params.pop("n_jobs", None)
+    if n_jobs is not None and n_jobs > 0:
+        params["nthread"] = n_jobs
+    params.setdefault("objective", "binary:logistic")
+    return params, num_boost_round
+
+
+def _base_booster(model):
+    # Booster del que continuar el boosting, recortado a la mejor iteración si la hay.
+    booster = model.get_booster() if isinstance(model, XGBClassifier) else model
+    best_iteration = booster.attr("best_iteration")
+    if best_iteration is not None and int(best_iteration) + 1 < booster.num_boosted_rounds():
+        booster = booster[: int(best_iteration) + 1]
+    return booster
+
+
+@traced
+def train_xgb_model(X_train, y_train=None, X_val=None, y_val=None, params=None, sample_weight=None,
+                    early_stopping_rounds=50, external_memory=False, chunk_rows=500_000, dtrain=None,
+                    xgb_model=None):
     """
-    default_params = {
-        "n_estimators": 400,
-        "max_depth": 10,
-        "learning_rate": 0.2,
-        "subsample": 0.8,
-        "colsample_bytree": 1.0,
-        "gamma": 0,
-        "use_label_encoder": False,
-        "eval_metric": "logloss",
-        "random_state": 42,
-        "n_jobs": -1
-    }
+    Entrena un modelo XGBoost con los parámetros especificados o por defecto.
+    sample_weight permite usar los pesos devueltos por balance_data.
 
+    Los datos se cuantizan una sola vez en una QuantileDMatrix float32 (o se pasan ya
+    construidos en dtrain). Si se dan X_val/y_val se usan para early stopping: la mejor
+    iteración queda en model.best_iteration y predict_proba la usa automáticamente.
+    Con external_memory=True el entrenamiento se hace por chunks de chunk_rows filas.
+    Si se pasa xgb_model (modelo o booster ya entrenado) se continúa el boosting desde
+    su mejor iteración y n_estimators indica cuántos árboles nuevos agregar.
+    """
+    all_params = dict(DEFAULT_PARAMS)
     if params:
-        default_params.update(params)
+        all_params.update(params)
+    native_params, num_boost_round = _native_params(all_params)
+
+    if dtrain is None:
+        dtrain = build_dmatrix(
+            X_train, y_train, sample_weight, max_bin=all_params["max_bin"],
+            external_memory=external_memory, chunk_rows=chunk_rows,
+        )
+    evals = []
+    if X_val is not None and y_val is not None:
+        dval = build_dmatrix(X_val, y_val, ref=dtrain, max_bin=all_params["max_bin"])
+        evals = [(dval, "val")]
 
-    model = XGBClassifier(**default_params)
-    model.fit(X_train, y_train)
+    if xgb_model is not None:
+        xgb_model = _base_booster(xgb_model)
+
+    booster = xgb.train(
+        native_params, dtrain, num_boost_round=num_boost_round, evals=evals,
+        early_stopping_rounds=early_stopping_rounds if evals else None, verbose_eval=False,
+        xgb_model=xgb_model,
+    )
+    if evals:
+        print(f"🌲 Mejor iteración: {booster.best_iteration} de {booster.num_boosted_rounds()}")
+
+    model = XGBClassifier(**{k: v for k, v in all_params.items() if k != "max_bin"})
+    model.load_model(bytearray(booster.save_raw("ubj")))
     return model
 
 
+@traced
 def predict(model, X, threshold=0.5):
     """
     Realiza predicciones con un modelo entrenado y un threshold dado.
@@ -45,99 +184,202 @@ def predict(model, X, threshold=0.5):
 
 import pandas as pd
 
-def assign_groups_and_services_from_proba(y_proba, user_ids=None):
+def threshold_curve(y_true, y_proba, amounts=None, fn_cost=1.0, fp_cost=1.0) -> "pd.DataFrame":
+    """
+    Evalúa todos los cortes posibles (cada valor distinto de y_proba, más np.inf, que
+    no marca nada como fraude) en una sola pasada: ordena y_proba una vez y usa sumas
+    acumuladas. Una transacción se marca como fraude si y_proba >= threshold.
+
+    El costo es fn_cost * (fraudes no detectados) + fp_cost * (legítimas bloqueadas),
+    ponderado por amounts (por ejemplo TransactionAmt, como en streamlit_app.py) si se pasa.
+    """
+    y_true = np.asarray(y_true).astype(bool)
+    y_proba = np.asarray(y_proba, dtype=np.float64)
+    weights = np.ones(len(y_proba)) if amounts is None else np.asarray(amounts, dtype=np.float64)
+
+    order = np.argsort(-y_proba, kind="mergesort")
+    scores = y_proba[order]
+    y_sorted = y_true[order]
+    w_sorted = weights[order]
+
+    # Último índice de cada grupo de scores iguales: ahí se evalúa el corte.
+    last = np.r_[np.flatnonzero(np.diff(scores)), len(scores) - 1] if len(scores) else np.empty(0, dtype=int)
+    tp = np.r_[0, np.cumsum(y_sorted)[last]]
+    fp = np.r_[0, np.cumsum(~y_sorted)[last]]
+    tp_w = np.r_[0.0, np.cumsum(w_sorted * y_sorted)[last]]
+    fp_w = np.r_[0.0, np.cumsum(w_sorted * ~y_sorted)[last]]
+    # inf y no nextafter(scores[0]): en float64 puede redondear al score máximo en
+    # float32 (predict_proba) y marcaría esas filas.
+    thresholds = np.r_[np.inf, scores[last]]
+
+    positives = tp[-1]
+    predicted = tp + fp
+    with np.errstate(divide="ignore", invalid="ignore"):
+        precision = np.where(predicted > 0, tp / predicted, 1.0)
+        recall = tp / positives if positives else np.zeros(len(tp))
+        f1 = np.where(predicted + positives > 0, 2 * tp / (predicted + positives), 0.0)
+    cost = fn_cost * (tp_w[-1] - tp_w) + fp_cost * fp_w
+
+    return pd.DataFrame({
+        "threshold": thresholds,
+        "tp": tp,
+        "fp": fp,
+        "precision": precision,
+        "recall": recall,
+        "f1": f1,
+        "cost": cost,
+    })
+
+
+@traced
+def find_best_threshold(y_true, y_proba, objective="f1", amounts=None, fn_cost=1.0, fp_cost=1.0,
+                        min_precision=0.9, return_curve=False):
+    """
+    Busca el threshold óptimo sobre la curva completa de precision/recall.
+
+    Args:
+        objective (str): "f1" (máximo F1), "cost" (mínimo costo, ver threshold_curve)
+            o "recall_at_precision" (máximo recall con precision >= min_precision).
+        amounts (array-like or None): montos por transacción para ponderar el costo.
+        return_curve (bool): si es True devuelve además la curva de threshold_curve.
+
+    Returns:
+        float: threshold óptimo (y la curva si return_curve=True).
+    """
+    curve = threshold_curve(y_true, y_proba, amounts=amounts, fn_cost=fn_cost, fp_cost=fp_cost)
+    if objective == "f1":
+        best = int(np.argmax(curve["f1"].to_numpy()))
+    elif objective == "cost":
+        best = int(np.argmin(curve["cost"].to_numpy()))
+    elif objective == "recall_at_precision":
+        recall = np.where(curve["precision"].to_numpy() >= min_precision, curve["recall"].to_numpy(), -1.0)
+        best = int(np.argmax(recall))
+    else:
+        raise ValueError(f"objective debe ser 'f1', 'cost' o 'recall_at_precision', no {objective!r}")
+
+    threshold = float(curve["threshold"].iloc[best])
+    if return_curve:
+        return threshold, curve
+    return threshold
+
+
+@traced
+def assign_groups_and_services_from_proba(y_proba, user_ids=None, bands=MODEL_BANDS, amounts=None,
+                                          return_summary=False):
     """
     Asigna grupos de fraude y paquetes de servicios financieros a partir de la probabilidad de fraude.
 
     Args:
         y_proba (array-like): Probabilidad de fraude por usuario.
         user_ids (array-like or None): Índices o IDs de usuario. Si None, se usan índices por defecto.
+        bands (RiskBands): cortes y etiquetas de grupo/paquete (por defecto MODEL_BANDS).
+        amounts (array-like or None): montos por fila para el resumen por banda.
+        return_summary (bool): si es True devuelve además cantidad (y monto) por banda.
 
     Returns:
-        pd.DataFrame: DataFrame con columnas user_id, grupo_fraude, paquete_servicio
-    """
-
-    def asignar_grupo_fraude(prob):
-        if prob < 0.3:
-            return "Grupo 3"
-        elif prob < 0.6:
-            return "Grupo 2"
-        elif prob < 0.9:
-            return "Grupo 1"
-        else:
-            return "Fraudulento"
-
-    def asignar_paquete(grupo):
-        if grupo == "Grupo 1":
-            return "Paquete Simple"
-        elif grupo == "Grupo 2":
-            return "Paquete Intermedio"
-        elif grupo == "Grupo 3":
-            return "Paquete Pro"
-        else:
-            return "Sin Paquete"
-
+        pd.DataFrame: DataFrame con columnas user_id, prob_fraude, grupo_fraude, paquete_servicio
+            (las dos últimas categóricas)
+    """
+    codes = bands.codes(y_proba)
     df = pd.DataFrame({
-        "user_id": user_ids if user_ids is not None else range(len(y_proba)),
-        "prob_fraude": y_proba
+        "user_id": user_ids if user_ids is not None else range(len(codes)),
+        "prob_fraude": y_proba,
+        "grupo_fraude": bands.groups(codes=codes),
+        "paquete_servicio": bands.packages(codes=codes),
     })
 
-    df["grupo_fraude"] = df["prob_fraude"].apply(asignar_grupo_fraude)
-    df["paquete_servicio"] = df["grupo_fraude"].apply(asignar_paquete)
-
+    if return_summary:
+        return df, bands.summarize(codes, amounts)
     return df
 
 
-def evaluate_model(y_true, y_pred, y_proba):
+@traced
+def evaluate_model(y_true, y_pred, y_proba, n_bootstrap=0):
     """
-    Calcula y muestra métricas de evaluación del modelo.
+    Calcula y muestra métricas de evaluación del modelo (ver src.evaluation.evaluate).
+    Con n_bootstrap > 0 también muestra intervalos de confianza al 95%.
     """
-    acc = accuracy_score(y_true, y_pred)
-    f1 = f1_score(y_true, y_pred)
-    rec = recall_score(y_true, y_pred)
-    prec = precision_score(y_true, y_pred)
-    roc = roc_auc_score(y_true, y_proba)
+    result = evaluate(y_true, y_proba, y_pred=y_pred, n_bootstrap=n_bootstrap)
 
     print("\n--- Evaluación del modelo ---")
-    print(f"Accuracy     : {acc:.4f}")
-    print(f"F1-score     : {f1:.4f}")
-    print(f"Recall       : {rec:.4f}")
-    print(f"Precision    : {prec:.4f}")
-    print(f"ROC AUC      : {roc:.4f}")
-    print("\n" + classification_report(y_true, y_pred, digits=4))
-    print(confusion_matrix(y_true, y_pred))
-
-    return {
-        "accuracy": acc,
-        "f1": f1,
-        "recall": rec,
-        "precision": prec,
-        "roc_auc": roc
-    }
+    print(result.summary())
+
+    return result.metrics
 
 
-def save_model(model, model_path: str):
+def pipeline_path(model_path: str) -> str:
     """
-    Guarda el modelo en local o GCS.
+    Ruta donde se guarda el FeaturePipeline asociado a un modelo.
+    Ejemplo: "models/xgb_model.joblib" -> "models/xgb_model.pipeline.joblib"
+    """
+    root, _ = os.path.splitext(model_path)
+    return f"{root}.pipeline.joblib"
+
+
+@traced
+def save_model(model, model_path: str, pipeline=None):
+    """
+    Guarda el modelo en local o GCS. Si se pasa el FeaturePipeline usado en el
+    entrenamiento, se guarda al lado del modelo (ver pipeline_path).
     Ejemplo path:
         - Local: "models/xgb_model.joblib"
         - GCS:   "gs://fraud-detection-lewagon/models/xgb_model.joblib"
     """
     with fsspec.open(model_path, "wb") as f:
         joblib.dump(model, f)
+    if pipeline is not None:
+        with fsspec.open(pipeline_path(model_path), "wb") as f:
+            joblib.dump(pipeline, f)
+
+
+def model_version(model) -> str:
+    """
+    Huella corta del modelo (sha256 de los árboles serializados): cambia con cada
+    reentrenamiento o actualización y sirve para invalidar resultados cacheados.
+    """
+    return hashlib.sha256(model.get_booster().save_raw("ubj")).hexdigest()[:16]
+
+
+def _is_local(path: str) -> bool:
+    fs, _ = fsspec.core.url_to_fs(path)
+    return isinstance(fs, LocalFileSystem)
+
+
+def _load_artifact(path: str, cache_dir=MODEL_CACHE_DIR, mmap_mode="r"):
+    # Los archivos remotos se leen desde la caché local (ver src.cache.fetch_artifact).
+    if not _is_local(path):
+        if cache_dir is None:
+            with fsspec.open(path, "rb") as f:
+                return joblib.load(f)
+        path = fetch_artifact(path, cache_dir, MODEL_CACHE_MAX_BYTES)
+    return joblib.load(path, mmap_mode=mmap_mode)
+
+
+def load_pipeline(model_path: str, cache_dir=MODEL_CACHE_DIR, mmap_mode="r"):
+    """
+    Carga el FeaturePipeline guardado junto al modelo de model_path.
+    """
+    path = pipeline_path(model_path)
+    try:
+        return _load_artifact(path, cache_dir, mmap_mode)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"❌ No se encontró el pipeline de features en: {path}")
 
 
-def load_model(path="model/xgb_model.pkl"):
+@traced
+def load_model(path="model/xgb_model.pkl", cache_dir=MODEL_CACHE_DIR, mmap_mode="r"):
     """
     Carga un modelo desde local o desde GCS usando fsspec.
+    Los modelos remotos se guardan en una caché local (cache_dir) indexada por
+    generation/etag, así los arranques siguientes leen desde disco. Los arrays del
+    artefacto se abren con memory-map (mmap_mode). cache_dir=None desactiva la caché.
     Ejemplo path:
         - Local: "model/xgb_model.pkl"
         - GCS:   "gs://fraud-detection-lewagon/models/xgb_model.pkl"
     """
     try:
-        with fsspec.open(path, "rb") as f:
-            model = joblib.load(f)
-            print(f"📦 Modelo cargado desde: {path}")
-            return model
+        model = _load_artifact(path, cache_dir, mmap_mode)
+        print(f"📦 Modelo cargado desde: {path}")
+        return model
     except FileNotFoundError:
         raise FileNotFoundError(f"❌ No se encontró el modelo en: {path}")
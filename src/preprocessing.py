@@ -1,29 +1,161 @@
+import fsspec
+import joblib
+import numpy as np
 import pandas as pd
+from joblib import Parallel, delayed
 from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import LabelEncoder, StandardScaler
+from sklearn.neighbors import NearestNeighbors
 from imblearn.combine import SMOTETomek
 
+from src.profiling import traced
 
-def encode_and_scale(df: pd.DataFrame, categorical_columns: list, target_column: str = "isFraud"):
+
+UNSEEN_CODE = -1
+
+
+class FeaturePipeline:
     """
-    Encode categorical columns and scale numeric columns.
+    Fitted categorical encoding and float32 standard scaling that can be persisted
+    next to the model and reused at scoring time without refitting.
+
+    Category codes follow LabelEncoder on ``astype(str)`` values (sorted categories),
+    and values not seen during ``fit`` are mapped to ``UNSEEN_CODE``.
     """
-    df_encoded = df.copy()
 
-    # Label Encoding
-    le = LabelEncoder()
-    for col in categorical_columns:
-        if col in df_encoded.columns:
-            df_encoded[col] = le.fit_transform(df_encoded[col].astype(str))
+    def __init__(self, categorical_columns: list, target_column: str = "isFraud", n_jobs: int = -1):
+        self.categorical_columns = list(categorical_columns)
+        self.target_column = target_column
+        self.n_jobs = n_jobs
+
+    def _encoded_columns(self, df: pd.DataFrame) -> list:
+        return [col for col in self.categorical_columns if col in df.columns]
+
+    def fit(self, df: pd.DataFrame):
+        """
+        Learn the category maps and the scaling parameters from ``df``.
+        """
+        self.categorical_columns_ = self._encoded_columns(df)
+        # Threads only overlap the parts of pandas that release the GIL; most of the gain
+        # over the old encoder comes from fitting each column once and reusing the maps.
+        categories = Parallel(n_jobs=self.n_jobs, prefer="threads")(
+            delayed(_fit_categories)(df[col]) for col in self.categorical_columns_
+        )
+        self.categories_ = dict(zip(self.categorical_columns_, categories))
+        self._code_maps = None
+
+        excluded = set(self.categorical_columns) | {self.target_column}
+        self.numeric_columns_ = [col for col in df.columns if col not in excluded]
+        numeric = df[self.numeric_columns_].astype("float64")
+        mean = numeric.mean().to_numpy()
+        scale = numeric.std(ddof=0).to_numpy(copy=True)
+        scale[(scale == 0) | np.isnan(scale)] = 1.0
+        self.mean_ = mean.astype(np.float32)
+        self.scale_ = scale.astype(np.float32)
+        self.feature_names_ = [col for col in df.columns if col != self.target_column]
+        return self
+
+    def transform(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Encode and scale ``df`` with the fitted parameters. Columns keep their order;
+        codes are int32 and scaled columns float32.
+        """
+        df_encoded = df.copy()
+        codes = Parallel(n_jobs=self.n_jobs, prefer="threads")(
+            delayed(_encode_column)(df[col], self.categories_[col]) for col in self.categorical_columns_
+        )
+        for col, col_codes in zip(self.categorical_columns_, codes):
+            df_encoded[col] = col_codes
+
+        if self.numeric_columns_:
+            numeric = df[self.numeric_columns_].to_numpy(dtype=np.float32, na_value=np.nan)
+            scaled = (numeric - self.mean_) / self.scale_
+            df_encoded[self.numeric_columns_] = pd.DataFrame(
+                scaled, index=df.index, columns=self.numeric_columns_
+            )
+        return df_encoded
+
+    def fit_transform(self, df: pd.DataFrame) -> pd.DataFrame:
+        return self.fit(df).transform(df)
+
+    def transform_record(self, record: dict, columns: list = None) -> np.ndarray:
+        """
+        Encode a single transaction given as a dict into a float32 vector ordered like
+        ``columns`` (``feature_names_`` by default), using dict lookups instead of
+        building a DataFrame.
+        """
+        if self._code_maps is None:
+            self._code_maps = {
+                col: {value: code for code, value in enumerate(categories)}
+                for col, categories in self.categories_.items()
+            }
+            self._numeric_index = {col: i for i, col in enumerate(self.numeric_columns_)}
+        columns = self.feature_names_ if columns is None else columns
+        vector = np.empty(len(columns), dtype=np.float32)
+        for i, col in enumerate(columns):
+            value = record.get(col)
+            code_map = self._code_maps.get(col)
+            if code_map is not None:
+                vector[i] = code_map.get(_to_str(value), UNSEEN_CODE)
+            else:
+                j = self._numeric_index[col]
+                value = np.nan if value is None else value
+                vector[i] = (value - self.mean_[j]) / self.scale_[j]
+        return vector
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_code_maps"] = None
+        state.pop("_numeric_index", None)
+        return state
 
-    # Scale numeric columns
-    numeric_columns = [col for col in df_encoded.columns if col not in categorical_columns + [target_column]]
-    scaler = StandardScaler()
-    df_encoded[numeric_columns] = scaler.fit_transform(df_encoded[numeric_columns])
+    def save(self, path: str):
+        with fsspec.open(path, "wb") as f:
+            joblib.dump(self, f)
 
+    @staticmethod
+    def load(path: str) -> "FeaturePipeline":
+        with fsspec.open(path, "rb") as f:
+            return joblib.load(f)
+
+
+def _to_str(value) -> str:
+    # Same text Series.astype(str) produces for nulls and floats.
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return "nan"
+    return str(value)
+
+
+def _as_str(series: pd.Series) -> pd.Series:
+    # astype(str) keeps NaN as a missing value with the pandas string dtype; LabelEncoder
+    # (and _to_str) see it as the text "nan".
+    return series.astype(str).fillna("nan")
+
+
+def _fit_categories(series: pd.Series) -> np.ndarray:
+    return np.sort(_as_str(series).unique().astype(object))
+
+
+def _encode_column(series: pd.Series, categories: np.ndarray) -> np.ndarray:
+    # get_indexer returns -1 (UNSEEN_CODE) for values missing from categories.
+    codes = pd.Index(categories).get_indexer(_as_str(series))
+    return codes.astype(np.int32)
+
+
+@traced
+def encode_and_scale(df: pd.DataFrame, categorical_columns: list, target_column: str = "isFraud",
+                     return_pipeline: bool = False):
+    """
+    Encode categorical columns and scale numeric columns.
+    With ``return_pipeline=True`` the fitted FeaturePipeline is returned as well.
+    """
+    pipeline = FeaturePipeline(categorical_columns, target_column=target_column)
+    df_encoded = pipeline.fit_transform(df)
+    if return_pipeline:
+        return df_encoded, pipeline
     return df_encoded
 
 
+@traced
 def split_data(df: pd.DataFrame, target_column: str = "isFraud"):
     """
     Split dataset into train and validation sets.
@@ -41,10 +173,103 @@ def split_data(df: pd.DataFrame, target_column: str = "isFraud"):
     return X_train, X_val, y_train, y_val
 
 
-def balance_data(X_train: pd.DataFrame, y_train: pd.Series):
+def _smotetomek(X_train, y_train, random_state=42):
+    smt = SMOTETomek(random_state=random_state)
+    X_train_sm, y_train_sm = smt.fit_resample(X_train, y_train)
+    return X_train_sm, y_train_sm, None
+
+
+def _negative_downsample(X_train, y_train, rate=0.1, random_state=42):
     """
-    Balance the training data using SMOTETomek.
+    Keep every positive and a ``rate`` fraction of negatives; kept negatives get
+    weight ``1 / rate`` so the weighted class balance matches the original data.
     """
-    smt = SMOTETomek(random_state=42)
-    X_train_sm, y_train_sm = smt.fit_resample(X_train, y_train)
-    return X_train_sm, y_train_sm
+    rng = np.random.default_rng(random_state)
+    y = np.asarray(y_train)
+    keep = (y == 1) | (rng.random(len(y)) < rate)
+    sample_weight = np.where(y[keep] == 1, 1.0, 1.0 / rate).astype(np.float32)
+    return X_train[keep], y_train[keep], sample_weight
+
+
+def _scale_pos_weight(X_train, y_train, random_state=42):
+    """
+    No resampling: positives are weighted by n_negative / n_positive, which is what
+    XGBoost's ``scale_pos_weight`` does.
+    """
+    y = np.asarray(y_train)
+    n_pos = int((y == 1).sum())
+    ratio = (len(y) - n_pos) / n_pos if n_pos else 1.0
+    sample_weight = np.where(y == 1, ratio, 1.0).astype(np.float32)
+    return X_train, y_train, sample_weight
+
+
+def _block_neighbors(X_block, k):
+    n_neighbors = min(k + 1, len(X_block))
+    nn = NearestNeighbors(n_neighbors=n_neighbors, n_jobs=1).fit(X_block)
+    return nn.kneighbors(X_block, return_distance=False)[:, 1:]
+
+
+def _approx_smote(X_train, y_train, k=5, block_size=2048, n_jobs=-1, random_state=42):
+    """
+    SMOTE with approximate nearest neighbours: minority rows are ordered along a random
+    projection and split into blocks, and exact kNN runs inside each block in parallel.
+    Synthetic rows are added until both classes have the same size.
+    """
+    rng = np.random.default_rng(random_state)
+    y = np.asarray(y_train)
+    X = np.asarray(X_train, dtype=np.float32)
+    X_min = X[y == 1]
+    n_new = int((y == 0).sum()) - len(X_min)
+    if n_new <= 0 or len(X_min) < 2:
+        return X_train, y_train, None
+
+    X_filled = np.nan_to_num(X_min)
+    order = np.argsort(X_filled @ rng.standard_normal(X.shape[1]))
+    blocks = [order[i:i + block_size] for i in range(0, len(order), block_size)]
+    if len(blocks) > 1 and len(blocks[-1]) <= k:
+        blocks[-2] = np.concatenate([blocks[-2], blocks.pop()])
+    neighbors = Parallel(n_jobs=n_jobs)(delayed(_block_neighbors)(X_filled[b], k) for b in blocks)
+    neighbor_idx = np.empty((len(X_min), neighbors[0].shape[1]), dtype=np.int64)
+    for block, block_neighbors in zip(blocks, neighbors):
+        neighbor_idx[block] = block[block_neighbors]
+
+    base = rng.integers(0, len(X_min), n_new)
+    partner = neighbor_idx[base, rng.integers(0, neighbor_idx.shape[1], n_new)]
+    gap = rng.random((n_new, 1), dtype=np.float32)
+    X_new = X_min[base] + gap * (X_min[partner] - X_min[base])
+
+    X_res = pd.concat([X_train, pd.DataFrame(X_new, columns=X_train.columns)], ignore_index=True)
+    y_res = pd.concat([y_train, pd.Series(np.ones(n_new, dtype=y.dtype), name=y_train.name)], ignore_index=True)
+    return X_res, y_res, None
+
+
+BALANCING_STRATEGIES = {
+    "smotetomek": _smotetomek,
+    "downsample": _negative_downsample,
+    "scale_pos_weight": _scale_pos_weight,
+    "approx_smote": _approx_smote,
+}
+
+
+@traced
+def balance_data(X_train: pd.DataFrame, y_train: pd.Series, strategy: str = "smotetomek",
+                 return_weights: bool = False, **kwargs):
+    """
+    Balance the training data with one of ``BALANCING_STRATEGIES``:
+
+    - ``smotetomek``: SMOTETomek over the whole training set (default).
+    - ``downsample``: negative downsampling (``rate``) with weight correction.
+    - ``scale_pos_weight``: no resampling, positives are up-weighted.
+    - ``approx_smote``: SMOTE with blockwise approximate kNN run on ``n_jobs`` cores.
+
+    With ``return_weights=True`` the sample weights to pass to training are returned
+    as a third element (``None`` when every row weighs 1).
+    """
+    if strategy not in BALANCING_STRATEGIES:
+        raise ValueError(f"Unknown balancing strategy {strategy!r}, expected one of {list(BALANCING_STRATEGIES)}")
+    X_res, y_res, sample_weight = BALANCING_STRATEGIES[strategy](X_train, y_train, **kwargs)
+    if return_weights:
+        return X_res, y_res, sample_weight
+    if sample_weight is not None:
+        raise ValueError(f"Strategy {strategy!r} relies on sample weights, call it with return_weights=True")
+    return X_res, y_res
@@ -0,0 +1,251 @@
+# src/profiling.py
+import collections
+import functools
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _rss_mb() -> float:
+    # RSS actual (Linux); en otros sistemas se usa el pico del proceso.
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE / 1e6
+    except OSError:
+        return _max_rss_mb()
+
+
+def _max_rss_mb() -> float:
+    # ru_maxrss está en bytes en macOS y en KiB en Linux.
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss / 1e6 if sys.platform == "darwin" else max_rss * 1024 / 1e6
+
+
+def _hwm_mb():
+    # Pico de RSS desde el último reset (VmHWM); None si el sistema no lo expone.
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024 / 1e6
+    except OSError:
+        pass
+    return None
+
+
+def _reset_hwm() -> bool:
+    # Escribir 5 en clear_refs reinicia VmHWM al RSS actual (Linux >= 4.0).
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+class RssSampler:
+    """
+    Pico de RSS muestreado cada interval segundos en un hilo, para los sistemas en
+    los que no se puede reiniciar VmHWM.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.peak_mb = _rss_mb()
+        self._stop = threading.Event()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak_mb = max(self.peak_mb, _rss_mb())
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_mb = max(self.peak_mb, _rss_mb())
+
+
+def _shapes(value):
+    if hasattr(value, "shape"):
+        return list(value.shape)
+    if isinstance(value, (tuple, list)):
+        shapes = [_shapes(v) for v in value]
+        return shapes if any(s is not None for s in shapes) else None
+    return None
+
+
+class StackSampler:
+    """
+    Profiler por muestreo: cada interval segundos guarda la pila del hilo que lo
+    inició. Las pilas se acumulan en formato "collapsed" (compatible con flamegraph).
+    """
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self._stop = threading.Event()
+
+    def _run(self, thread_id):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(f"{frame.f_code.co_name} ({os.path.basename(frame.f_code.co_filename)})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._run, args=(threading.get_ident(),), daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def top(self, n: int = 10) -> list:
+        return [{"stack": stack, "samples": count} for stack, count in self.stacks.most_common(n)]
+
+
+class Tracer:
+    """
+    Registra por etapa: tiempo de pared, tiempo de CPU, RSS, pico de RSS durante la
+    etapa y shapes de entrada/salida. Desactivado no agrega costo (ver traced).
+
+    El pico por etapa sale de VmHWM, que se reinicia al empezar cada etapa; antes de
+    reiniciarlo se acumula en las etapas abiertas, así las que contienen a otras
+    conservan su propio pico. Sin /proc/self/clear_refs se muestrea con RssSampler.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.sample = False
+        self.records = []
+        self._depth = 0
+        self._open = []  # récords de las etapas en curso, de afuera hacia adentro
+        self._t0 = time.perf_counter()
+
+    def enable(self, sample: bool = False):
+        self.enabled = True
+        self.sample = sample
+        self.records = []
+        self._t0 = time.perf_counter()
+        return self
+
+    def disable(self):
+        self.enabled = False
+
+    @contextmanager
+    def stage(self, name: str, **args):
+        if not self.enabled:
+            yield {}
+            return
+        record = {"name": name, "depth": self._depth, "args": args}
+        rss_start = _rss_mb()
+        self._fold_peak(_hwm_mb())
+        rss_sampler = None if _reset_hwm() else RssSampler()
+        record["peak_rss_mb"] = rss_start
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        sampler = StackSampler() if self.sample else None
+        self._depth += 1
+        self._open.append(record)
+        try:
+            with ExitStack() as stack:
+                for context in (sampler, rss_sampler):
+                    if context is not None:
+                        stack.enter_context(context)
+                yield record
+        finally:
+            self._depth -= 1
+            self._open.remove(record)
+            rss_end = _rss_mb()
+            peak = rss_sampler.peak_mb if rss_sampler is not None else _hwm_mb()
+            record["peak_rss_mb"] = max(record["peak_rss_mb"], rss_end, peak or 0.0)
+            self._fold_peak(record["peak_rss_mb"])
+            record.update(
+                start_s=wall_start - self._t0,
+                wall_s=time.perf_counter() - wall_start,
+                cpu_s=time.process_time() - cpu_start,
+                rss_mb=rss_end,
+                rss_delta_mb=rss_end - rss_start,
+            )
+            if sampler is not None:
+                record["top_stacks"] = sampler.top()
+            self.records.append(record)
+
+    def _fold_peak(self, peak_mb):
+        # Las etapas abiertas se quedan con el pico visto hasta ahora.
+        if peak_mb is None:
+            return
+        for record in self._open:
+            record["peak_rss_mb"] = max(record["peak_rss_mb"], peak_mb)
+
+    def chrome_trace(self) -> dict:
+        events = []
+        for record in self.records:
+            args = {k: v for k, v in record.items() if k not in ("name", "start_s", "wall_s", "depth", "args")}
+            args.update(record["args"])
+            events.append({
+                "name": record["name"], "ph": "X", "pid": os.getpid(), "tid": 0,
+                "ts": record["start_s"] * 1e6, "dur": record["wall_s"] * 1e6, "args": args,
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write(self, path: str):
+        """
+        Guarda la corrida en formato Chrome trace (chrome://tracing o Perfetto).
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.chrome_trace(), f, indent=1, default=str)
+
+    def summary(self) -> str:
+        lines = [f"{'Etapa':<40} {'Pared (s)':>10} {'CPU (s)':>10} {'RSS (MB)':>10} {'Pico (MB)':>10}  Shapes"]
+        for record in sorted(self.records, key=lambda r: r["start_s"]):
+            name = "  " * record["depth"] + record["name"]
+            shapes = f"{record['args'].get('input_shapes')} -> {record['args'].get('output_shape')}"
+            lines.append(
+                f"{name:<40} {record['wall_s']:>10.3f} {record['cpu_s']:>10.3f} "
+                f"{record['rss_mb']:>10.1f} {record['peak_rss_mb']:>10.1f}  {shapes}"
+            )
+        return "\n".join(lines)
+
+    def print_summary(self):
+        print("\n⏱️ Resumen de etapas")
+        print(self.summary())
+
+
+TRACER = Tracer()
+
+
+def traced(func=None, *, name: str = None, tracer: Tracer = TRACER):
+    """
+    Decorador que registra la función como etapa del tracer, con los shapes de los
+    argumentos y del resultado. Si el tracer está desactivado solo llama a la función.
+    """
+    if func is None:
+        return functools.partial(traced, name=name, tracer=tracer)
+    stage_name = name or f"{func.__module__}.{func.__name__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not tracer.enabled:
+            return func(*args, **kwargs)
+        input_shapes = [s for s in (_shapes(a) for a in list(args) + list(kwargs.values())) if s is not None]
+        with tracer.stage(stage_name, input_shapes=input_shapes) as record:
+            output = func(*args, **kwargs)
+            record["args"]["output_shape"] = _shapes(output)
+            return output
+
+    return wrapper
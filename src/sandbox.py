@@ -0,0 +1,276 @@
+# src/sandbox.py
+"""
+Pool de procesos para ejecutar el código que genera el LLM fuera del proceso de la app.
+
+Los workers se arrancan una vez y reciben los datos como Arrow IPC en memoria
+compartida (attach, una vez por carga de datos): cada pregunta solo envía el código,
+los umbrales y los costos. Cada ejecución corre con límites de memoria (RLIMIT_AS) y
+de CPU (RLIMIT_CPU) en el worker y con un timeout de pared en el proceso principal;
+si se pasa, el worker se mata y se reemplaza por uno nuevo.
+"""
+import atexit
+import contextlib
+import io
+import math
+import os
+import queue
+import resource
+import signal
+import threading
+from collections import OrderedDict
+from multiprocessing import get_context, shared_memory
+
+import pandas as pd
+import pyarrow as pa
+
+SANDBOX_WORKERS = int(os.getenv("SANDBOX_WORKERS", "2"))
+SANDBOX_TIMEOUT = float(os.getenv("SANDBOX_TIMEOUT", "10"))
+SANDBOX_MEMORY_MB = int(os.getenv("SANDBOX_MEMORY_MB", "1024"))
+
+
+class SandboxError(RuntimeError):
+    pass
+
+
+class SandboxTimeout(SandboxError):
+    pass
+
+
+def run_snippet(code: str, df: pd.DataFrame) -> str:
+    """
+    Ejecuta code con df y pd y devuelve `result` (como texto) o lo impreso.
+    """
+    # Un solo namespace: con globals y locals separados, las lambdas, funciones y
+    # comprensiones del snippet no ven las variables que define el propio código.
+    namespace = {"df": df, "pd": pd}
+    output_buffer = io.StringIO()
+    with contextlib.redirect_stdout(output_buffer):
+        exec(code, namespace)
+    result = namespace.get("result", output_buffer.getvalue().strip())
+    return result if isinstance(result, str) else str(result)
+
+
+def _to_arrow(df: pd.DataFrame) -> pa.Table:
+    # Las columnas object con tipos mezclados no tienen tipo Arrow: se pasan como texto.
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        mixed = {col: df[col].astype(str) for col in df.columns if df[col].dtype == object}
+        return pa.Table.from_pandas(df.assign(**mixed), preserve_index=False)
+
+
+def _write_stream(table: pa.Table, sink) -> int:
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.tell()
+
+
+# --- lado del worker --------------------------------------------------------
+
+def _open_shared(name: str):
+    # Vista de solo lectura del segmento vía memory-map de Arrow: la tabla no copia
+    # los datos y el worker no toma posesión del segmento (lo borra la app).
+    path = os.path.join("/dev/shm", name.lstrip("/"))
+    if os.path.exists(path):
+        return pa.memory_map(path, "r")
+    shm = shared_memory.SharedMemory(name=name)
+    return pa.BufferReader(pa.py_buffer(bytes(shm.buf)))
+
+
+def _vm_bytes() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[0]) * resource.getpagesize()
+
+
+def _set_limits(memory_mb: int, cpu_seconds: float):
+    # Presupuesto por ejecución: lo que el worker ya usa más memory_mb / cpu_seconds.
+    if memory_mb is not None and os.path.exists("/proc/self/statm"):
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        soft = _vm_bytes() + memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (soft if hard == resource.RLIM_INFINITY else min(soft, hard), hard))
+    if cpu_seconds is not None:
+        _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        soft = math.ceil(usage.ru_utime + usage.ru_stime + cpu_seconds)
+        resource.setrlimit(resource.RLIMIT_CPU, (soft if hard == resource.RLIM_INFINITY else min(soft, hard), hard))
+
+
+def _reset_limits():
+    for limit in (resource.RLIMIT_AS, resource.RLIMIT_CPU):
+        _, hard = resource.getrlimit(limit)
+        resource.setrlimit(limit, (hard, hard))
+
+
+def _on_cpu_limit(signum, frame):
+    raise SandboxTimeout("el código superó el límite de CPU")
+
+
+def _worker_main(conn, memory_mb, cpu_seconds, max_datasets):
+    from src.agent import display_frame
+
+    signal.signal(signal.SIGXCPU, _on_cpu_limit)
+    datasets = OrderedDict()  # key -> (tabla Arrow, DataFrame)
+    frames = {}  # key -> ((edges, costs), frame con las columnas de la app)
+
+    while True:
+        message = conn.recv()
+        kind = message[0]
+        if kind == "stop":
+            break
+        if kind == "attach":
+            _, key, name = message
+            if key not in datasets:
+                table = pa.ipc.open_stream(_open_shared(name)).read_all()
+                # split_blocks evita consolidar columnas: las numéricas sin nulos siguen
+                # apuntando a la memoria compartida.
+                datasets[key] = (table, table.to_pandas(split_blocks=True))
+                while len(datasets) > max_datasets:
+                    old_key, _ = datasets.popitem(last=False)
+                    frames.pop(old_key, None)
+            datasets.move_to_end(key)
+            conn.send(("ok", None))
+        elif kind == "run":
+            _, key, code, bands, package_costs = message
+            if key not in datasets:
+                conn.send(("missing", None))
+                continue
+            df = datasets[key][1]
+            if bands is not None:
+                params = (tuple(bands.edges.tolist()), tuple(sorted(package_costs.items())))
+                if key not in frames or frames[key][0] != params:
+                    frames[key] = (params, display_frame(df, bands, package_costs))
+                df = frames[key][1]
+            try:
+                _set_limits(memory_mb, cpu_seconds)
+                # Copia superficial: con copy-on-write el código no puede alterar los datos.
+                text = run_snippet(code, df.copy(deep=False))
+                reply = ("ok", text)
+            except MemoryError:
+                reply = ("error", "el código superó el límite de memoria")
+            except BaseException as e:
+                reply = ("error", str(e) or type(e).__name__)
+            finally:
+                _reset_limits()
+            conn.send(reply)
+
+
+# --- lado de la app ---------------------------------------------------------
+
+class _Worker:
+    def __init__(self, ctx, memory_mb, cpu_seconds, max_datasets):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main, args=(child_conn, memory_mb, cpu_seconds, max_datasets), daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+
+    def request(self, message, timeout):
+        self.conn.send(message)
+        if not self.conn.poll(timeout):
+            raise SandboxTimeout(f"el código superó el límite de {timeout:g} s")
+        return self.conn.recv()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class SandboxPool:
+    """
+    n_workers procesos pre-arrancados que ejecutan snippets sobre datos compartidos.
+    attach(df, key) publica los datos en memoria compartida (una vez por key) y
+    run(code, key, bands, package_costs) ejecuta el código sobre df con las columnas
+    de display_frame y devuelve `result` o la salida impresa. Es thread-safe.
+    """
+
+    def __init__(self, n_workers: int = SANDBOX_WORKERS, timeout: float = SANDBOX_TIMEOUT,
+                 memory_mb: int = SANDBOX_MEMORY_MB, cpu_seconds: float = None, max_datasets: int = 4):
+        self.timeout = timeout
+        self.memory_mb = memory_mb
+        self.cpu_seconds = timeout if cpu_seconds is None else cpu_seconds
+        self.max_datasets = max_datasets
+        self._ctx = get_context("spawn")
+        self._segments = OrderedDict()  # key -> SharedMemory
+        self._lock = threading.Lock()
+        self._idle = queue.Queue()
+        for _ in range(n_workers):
+            self._idle.put(self._start_worker())
+        atexit.register(self.close)
+
+    def _start_worker(self):
+        return _Worker(self._ctx, self.memory_mb, self.cpu_seconds, self.max_datasets)
+
+    def attach(self, df: pd.DataFrame, key: str) -> str:
+        """
+        Copia df una sola vez a memoria compartida como Arrow IPC. Los workers lo leen
+        cuando lo necesitan; volver a llamar con la misma key no hace nada.
+        """
+        with self._lock:
+            if key in self._segments:
+                self._segments.move_to_end(key)
+                return key
+            table = _to_arrow(df)
+            # Primero se mide el stream y después se escribe directo en el segmento.
+            size = _write_stream(table, pa.MockOutputStream())
+            shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+            buffer = pa.py_buffer(shm.buf)
+            _write_stream(table, pa.FixedSizeBufferWriter(buffer))
+            del buffer
+            self._segments[key] = shm
+            while len(self._segments) > self.max_datasets:
+                _, old = self._segments.popitem(last=False)
+                old.close()
+                old.unlink()
+        return key
+
+    def run(self, code: str, key: str, bands=None, package_costs=None) -> str:
+        """
+        Ejecuta code en un worker libre. Lanza SandboxTimeout si tarda más que timeout
+        (el worker se reemplaza) y SandboxError si el código falla.
+        """
+        worker = self._idle.get()
+        try:
+            reply = worker.request(("run", key, code, bands, package_costs), self.timeout)
+            if reply[0] == "missing":
+                with self._lock:
+                    if key not in self._segments:
+                        raise SandboxError("los datos ya no están disponibles, volvé a cargarlos")
+                    worker.request(("attach", key, self._segments[key].name), self.timeout)
+                reply = worker.request(("run", key, code, bands, package_costs), self.timeout)
+        except SandboxTimeout:
+            worker.kill()
+            worker = self._start_worker()
+            raise
+        except (EOFError, OSError):
+            # El worker murió (por ejemplo, por el límite de CPU): se reemplaza.
+            worker.kill()
+            worker = self._start_worker()
+            raise SandboxError("el proceso que ejecutaba el código terminó de forma inesperada")
+        finally:
+            self._idle.put(worker)
+
+        status, value = reply
+        if status != "ok":
+            raise SandboxError(value)
+        return value
+
+    def close(self):
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                worker.conn.send(("stop",))
+            except (BrokenPipeError, OSError):
+                pass
+            worker.process.join(timeout=1)
+            if worker.process.is_alive():
+                worker.kill()
+        with self._lock:
+            for shm in self._segments.values():
+                shm.close()
+                shm.unlink()
+            self._segments.clear()
@@ -0,0 +1,123 @@
+# src/scoring.py
+import os
+import tempfile
+from collections import deque
+from contextlib import ExitStack
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from src.data import DEFAULT_CHUNKSIZE, USER_ID_COLUMNS, create_user_id, iter_merged_chunks
+from src.feature_store import UserFeatureStore
+from src.features import velocity_feature_names
+from src.model import assign_groups_and_services_from_proba, load_model, load_pipeline, predict
+from src.profiling import traced
+
+
+_WORKER = {}
+
+
+def batch_feature_store(max_users: int = None, db_path: str = None) -> UserFeatureStore:
+    """
+    Feature store para scoring por lotes, con los mismos features que
+    add_velocity_features: sin TTL y sin perder historia. Sin max_users todos los
+    usuarios quedan en memoria; con max_users los desalojados se guardan en db_path.
+    """
+    if max_users is not None and db_path is None:
+        raise ValueError("max_users necesita db_path para no perder la historia de los usuarios desalojados")
+    return UserFeatureStore(ttl=np.inf, max_users=max_users, db_path=db_path)
+
+
+def _init_worker(model_path, nthread):
+    # Cada proceso carga el modelo y el pipeline una sola vez.
+    model = load_model(model_path)
+    model.set_params(n_jobs=nthread)
+    _WORKER.update(model=model, pipeline=load_pipeline(model_path))
+
+
+def _score_chunk(part, df, out_dir, threshold):
+    model, pipeline = _WORKER["model"], _WORKER["pipeline"]
+    X = pipeline.transform(df.reindex(columns=pipeline.feature_names_))
+    X = X.reindex(columns=model.get_booster().feature_names).astype(np.float32)
+    y_pred, y_proba = predict(model, X, threshold=threshold)
+
+    scores = assign_groups_and_services_from_proba(y_proba, user_ids=df.index.to_numpy())
+    scores.insert(0, "TransactionID", df["TransactionID"].to_numpy())
+    scores["prediction"] = y_pred
+    scores.to_parquet(os.path.join(out_dir, f"part-{part:05d}.parquet"), index=False)
+    return len(scores)
+
+
+@traced
+def score_files(identity_path: str, transaction_path: str, out_dir: str, model_path: str,
+                chunksize: int = DEFAULT_CHUNKSIZE, n_jobs: int = None, threshold: float = 0.5,
+                max_pending: int = None, max_users: int = None) -> int:
+    """
+    Puntúa los archivos de identidad y transacciones por chunks de chunksize filas sin
+    cargarlos enteros. Cada chunk se codifica con el FeaturePipeline guardado junto al
+    modelo y se puntúa en un pool de n_jobs procesos (cada uno carga el modelo una vez);
+    el resultado (TransactionID, user_id, prob_fraude, grupo_fraude, paquete_servicio,
+    prediction) se escribe en out_dir/part-NNNNN.parquet en el orden de la entrada.
+    Como mucho hay max_pending chunks en vuelo (2 * n_jobs por defecto), así la memoria
+    no depende del tamaño de los archivos.
+
+    Si el modelo usa features de velocidad, se calculan en el proceso principal con un
+    batch_feature_store que recorre los chunks en orden; con max_users la historia de
+    los usuarios que no entran en memoria va a un SQLite temporal. Devuelve la
+    cantidad de filas.
+    """
+    n_jobs = n_jobs or os.cpu_count() or 1
+    max_pending = max_pending or 2 * n_jobs
+    nthread = max(1, (os.cpu_count() or 1) // n_jobs)
+    os.makedirs(out_dir, exist_ok=True)
+    for name in os.listdir(out_dir):
+        if name.startswith("part-") and name.endswith(".parquet"):
+            os.remove(os.path.join(out_dir, name))
+
+    pipeline = load_pipeline(model_path)
+    velocity = any(col in pipeline.feature_names_ for col in velocity_feature_names())
+    usecols = set(pipeline.feature_names_) | set(USER_ID_COLUMNS) | {"TransactionID"}
+
+    with ExitStack() as stack:
+        store = None
+        if velocity:
+            db_path = None
+            if max_users is not None:
+                db_path = os.path.join(stack.enter_context(tempfile.TemporaryDirectory()), "users.db")
+            store = batch_feature_store(max_users, db_path)
+            stack.callback(store.close)
+
+        def chunks():
+            for df in iter_merged_chunks(identity_path, transaction_path, chunksize, usecols=usecols):
+                if store is not None:
+                    df = store.observe_frame(df)
+                yield create_user_id(df, mode="hash")
+
+        n_rows = 0
+        if n_jobs == 1:
+            _init_worker(model_path, nthread)
+            for part, df in enumerate(chunks()):
+                n_rows += _score_chunk(part, df, out_dir, threshold)
+        else:
+            with ProcessPoolExecutor(
+                max_workers=n_jobs, initializer=_init_worker, initargs=(model_path, nthread)
+            ) as pool:
+                pending = deque()
+                for part, df in enumerate(chunks()):
+                    if len(pending) >= max_pending:
+                        n_rows += pending.popleft().result()
+                    pending.append(pool.submit(_score_chunk, part, df, out_dir, threshold))
+                while pending:
+                    n_rows += pending.popleft().result()
+
+    print(f"✅ {n_rows:,} transacciones puntuadas en {out_dir}")
+    return n_rows
+
+
+def read_scores(out_dir: str) -> pd.DataFrame:
+    """
+    Lee las particiones escritas por score_files en orden.
+    """
+    parts = sorted(f for f in os.listdir(out_dir) if f.startswith("part-") and f.endswith(".parquet"))
+    return pd.concat([pd.read_parquet(os.path.join(out_dir, f)) for f in parts], ignore_index=True)
@@ -0,0 +1,63 @@
+# src/simulator.py
+import numpy as np
+import pandas as pd
+
+
+class CostIndex:
+    """
+    Índice para simular costos por banda de riesgo sin recorrer los datos.
+
+    Ordena los scores una sola vez y guarda sumas prefijas de cantidad, monto y
+    monto * score (pérdida esperada). Los totales de cualquier conjunto de bandas
+    salen de una búsqueda binaria por umbral, en O(k log n) para k umbrales.
+    """
+
+    def __init__(self, scores, amounts):
+        scores = np.asarray(scores, dtype=np.float64)
+        amounts = np.asarray(amounts, dtype=np.float64)
+        order = np.argsort(scores, kind="stable")
+        # Los NaN quedan al final del orden, igual que en "score < umbral" (siempre False).
+        self.scores = scores[order]
+        amounts = amounts[order]
+        self.n = len(scores)
+        self.cum_amount = np.r_[0.0, np.cumsum(np.nan_to_num(amounts))]
+        self.cum_expected_loss = np.r_[0.0, np.cumsum(np.nan_to_num(amounts * self.scores))]
+        self.cum_score = np.r_[0.0, np.cumsum(np.nan_to_num(self.scores))]
+        self.n_valid = int(self.n - np.isnan(self.scores).sum())
+
+    def band_totals(self, edges) -> pd.DataFrame:
+        """
+        Totales por banda para umbrales crecientes edges: la banda i contiene los
+        scores en [edges[i-1], edges[i]); hay len(edges) + 1 bandas.
+        """
+        cuts = np.r_[0, np.searchsorted(self.scores, edges, side="left"), self.n]
+        return pd.DataFrame({
+            "count": np.diff(cuts),
+            "amount": np.diff(self.cum_amount[cuts]),
+            "expected_loss": np.diff(self.cum_expected_loss[cuts]),
+        })
+
+    def band_stats(self, edges) -> pd.DataFrame:
+        """
+        band_totals más media, mínimo y máximo del score por banda (NaN si la banda
+        no tiene scores válidos).
+        """
+        totals = self.band_totals(edges)
+        cuts = np.r_[0, np.searchsorted(self.scores, edges, side="left"), self.n]
+        valid_cuts = np.minimum(cuts, self.n_valid)
+        n_scores = np.diff(valid_cuts)
+        has_scores = n_scores > 0
+        first = np.minimum(valid_cuts[:-1], max(self.n_valid - 1, 0))
+        last = np.maximum(valid_cuts[1:] - 1, 0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            totals["score_mean"] = np.where(has_scores, np.diff(self.cum_score[valid_cuts]) / n_scores, np.nan)
+        totals["score_min"] = np.where(has_scores, self.scores[first] if self.n else np.nan, np.nan)
+        totals["score_max"] = np.where(has_scores, self.scores[last] if self.n else np.nan, np.nan)
+        return totals
+
+    def total_cost(self, edges, rates) -> float:
+        """
+        Costo total sum(rate_banda * monto * score) con una tasa por banda.
+        """
+        return float(np.dot(self.band_totals(edges)["expected_loss"].to_numpy(), rates))
+
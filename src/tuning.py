@@ -0,0 +1,156 @@
+# src/tuning.py
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import optuna
+import xgboost as xgb
+
+from src.model import DEFAULT_PARAMS, _native_params, build_dmatrix
+
+DEFAULT_STORAGE = "sqlite:///cache/optuna.db"
+DEFAULT_STUDY_NAME = "xgb_fraud"
+
+# Estado de cada proceso: las matrices cuantizadas se construyen una vez por worker
+# y las comparten todos los trials que corre ese worker.
+_WORKER = {}
+
+
+class PruningCallback(xgb.callback.TrainingCallback):
+    """
+    Reporta la métrica de validación a Optuna cada report_every rondas y corta el
+    entrenamiento si el pruner decide que el trial no es prometedor.
+    """
+
+    def __init__(self, trial, metric, report_every=10):
+        self.trial = trial
+        self.metric = metric
+        self.report_every = report_every
+        self.pruned = False
+
+    def after_iteration(self, model, epoch, evals_log):
+        if (epoch + 1) % self.report_every:
+            return False
+        self.trial.report(evals_log["val"][self.metric][-1], step=epoch)
+        self.pruned = self.trial.should_prune()
+        return self.pruned
+
+
+def suggest_params(trial) -> dict:
+    """
+    Espacio de búsqueda, con los mismos nombres que acepta train_xgb_model.
+    """
+    return {
+        "max_depth": trial.suggest_int("max_depth", 3, 12),
+        "learning_rate": trial.suggest_float("learning_rate", 0.01, 0.3, log=True),
+        "subsample": trial.suggest_float("subsample", 0.5, 1.0),
+        "colsample_bytree": trial.suggest_float("colsample_bytree", 0.5, 1.0),
+        "gamma": trial.suggest_float("gamma", 0.0, 5.0),
+        "min_child_weight": trial.suggest_float("min_child_weight", 1.0, 20.0, log=True),
+        "reg_lambda": trial.suggest_float("reg_lambda", 1e-3, 10.0, log=True),
+    }
+
+
+def _init_worker(data_dir, max_bin, nthread):
+    # Los arrays se abren con memory-map: todos los procesos leen las mismas páginas.
+    def load(name):
+        path = os.path.join(data_dir, f"{name}.npy")
+        return np.load(path, mmap_mode="r") if os.path.exists(path) else None
+
+    dtrain = build_dmatrix(load("X_train"), load("y_train"), load("sample_weight"), max_bin=max_bin)
+    dval = build_dmatrix(load("X_val"), load("y_val"), ref=dtrain, max_bin=max_bin)
+    _WORKER.update(dtrain=dtrain, dval=dval, nthread=nthread)
+
+
+def _objective(trial, base_params, metric, early_stopping_rounds):
+    params = dict(base_params)
+    params.update(suggest_params(trial))
+    params["eval_metric"] = metric
+    native_params, num_boost_round = _native_params(params)
+    native_params["nthread"] = _WORKER["nthread"]
+
+    pruning = PruningCallback(trial, metric)
+    booster = xgb.train(
+        native_params, _WORKER["dtrain"], num_boost_round=num_boost_round,
+        evals=[(_WORKER["dval"], "val")], early_stopping_rounds=early_stopping_rounds,
+        callbacks=[pruning], verbose_eval=False,
+    )
+    if pruning.pruned:
+        raise optuna.TrialPruned()
+    trial.set_user_attr("best_iteration", booster.best_iteration)
+    return booster.best_score
+
+
+def _run_trials(study_name, storage, n_trials, timeout, base_params, metric, early_stopping_rounds):
+    study = optuna.load_study(study_name=study_name, storage=storage, pruner=optuna.pruners.MedianPruner())
+    study.optimize(
+        lambda trial: _objective(trial, base_params, metric, early_stopping_rounds),
+        n_trials=n_trials, timeout=timeout,
+    )
+
+
+def tune_xgb_model(X_train, y_train, X_val, y_val, sample_weight=None, n_trials=50, n_jobs=None,
+                   timeout=None, storage=DEFAULT_STORAGE, study_name=DEFAULT_STUDY_NAME,
+                   metric="auc", n_estimators=1000, early_stopping_rounds=50, max_bin=256):
+    """
+    Busca hiperparámetros de XGBoost con Optuna corriendo trials en n_jobs procesos.
+
+    Los datos se guardan una vez como arrays float32 con memory-map y cada proceso
+    construye sus QuantileDMatrix una sola vez para todos sus trials. Los trials poco
+    prometedores se podan con MedianPruner a partir de la métrica de validación y el
+    estudio vive en SQLite (storage), así que una búsqueda interrumpida se retoma
+    llamando de nuevo con el mismo study_name; n_trials es el total del estudio.
+    Al retomar solo se corren los trials que faltan (los COMPLETE y PRUNED ya
+    guardados cuentan), repartidos de antemano entre los procesos para no pasarse.
+
+    Devuelve los mejores parámetros listos para train_xgb_model(params=...).
+    """
+    n_jobs = n_jobs or os.cpu_count()
+    if storage.startswith("sqlite:///"):
+        os.makedirs(os.path.dirname(storage[len("sqlite:///"):]) or ".", exist_ok=True)
+        storage = optuna.storages.RDBStorage(storage, engine_kwargs={"connect_args": {"timeout": 60}})
+    direction = "minimize" if metric in ("logloss", "error", "rmse") else "maximize"
+    study = optuna.create_study(
+        study_name=study_name, storage=storage, direction=direction,
+        pruner=optuna.pruners.MedianPruner(), load_if_exists=True,
+    )
+
+    finished = study.get_trials(
+        deepcopy=False, states=(optuna.trial.TrialState.COMPLETE, optuna.trial.TrialState.PRUNED)
+    )
+    remaining = max(n_trials - len(finished), 0)
+    # Cada proceso recibe su parte fija del presupuesto: con un tope global compartido
+    # (MaxTrialsCallback) los procesos arrancan trials antes de ver los de los demás.
+    budgets = [len(part) for part in np.array_split(np.arange(remaining), n_jobs) if len(part)]
+
+    base_params = dict(DEFAULT_PARAMS)
+    base_params["n_estimators"] = n_estimators
+    nthread = max(1, (os.cpu_count() or 1) // max(len(budgets), 1))
+    run_args = (timeout, base_params, metric, early_stopping_rounds)
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        arrays = {"X_train": X_train, "y_train": y_train, "X_val": X_val, "y_val": y_val,
+                  "sample_weight": sample_weight}
+        for name, values in arrays.items():
+            if values is not None:
+                dtype = np.float32 if name.startswith("X") or name == "sample_weight" else None
+                np.save(os.path.join(data_dir, f"{name}.npy"), np.ascontiguousarray(values, dtype=dtype))
+
+        if len(budgets) == 1:
+            _init_worker(data_dir, max_bin, nthread)
+            _run_trials(study_name, storage, budgets[0], *run_args)
+        elif budgets:
+            with ProcessPoolExecutor(
+                max_workers=len(budgets), initializer=_init_worker, initargs=(data_dir, max_bin, nthread)
+            ) as pool:
+                futures = [pool.submit(_run_trials, study_name, storage, budget, *run_args) for budget in budgets]
+                for future in futures:
+                    future.result()
+
+    best = study.best_trial
+    best_params = dict(best.params)
+    best_params["n_estimators"] = best.user_attrs["best_iteration"] + 1
+    pruned = len(study.get_trials(states=(optuna.trial.TrialState.PRUNED,)))
+    print(f"🔎 Mejor {metric}: {best.value:.4f} (trial {best.number}, {pruned} trials podados)")
+    return best_params
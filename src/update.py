@@ -0,0 +1,98 @@
+# src/update.py
+import pandas as pd
+from sklearn.model_selection import train_test_split
+
+from src.data import USER_ID_COLUMNS, load_and_merge_data, create_user_id
+from src.evaluation import evaluate
+from src.features import add_velocity_features, velocity_feature_names
+from src.model import DEFAULT_PARAMS, load_model, load_pipeline, predict, save_model, train_xgb_model
+from src.preprocessing import balance_data, split_data
+from src.profiling import traced
+
+
+UPDATE_METRICS = ("pr_auc", "roc_auc")
+
+
+@traced
+def load_batch(identity_path: str, transaction_path: str, pipeline, user_id_mode: str = "hash") -> pd.DataFrame:
+    """
+    Carga un lote nuevo de transacciones con las mismas columnas con las que se entrenó
+    el pipeline y lo codifica con sus parámetros guardados (sin volver a ajustarlos).
+    Se descartan las filas incompletas en esas columnas, igual que en load_clean_data.
+    Si el modelo usa features de velocidad se calculan con la historia del propio lote.
+    """
+    columns = pipeline.feature_names_ + [pipeline.target_column]
+    velocity = [col for col in velocity_feature_names() if col in columns]
+    base_columns = [col for col in columns if col not in velocity]
+    df = load_and_merge_data(
+        identity_path, transaction_path, usecols=set(base_columns) | set(USER_ID_COLUMNS),
+    )
+    missing = [col for col in base_columns if col not in df.columns]
+    if missing:
+        raise ValueError(f"❌ Faltan columnas del modelo en el lote nuevo: {missing}")
+
+    df = create_user_id(df, mode=user_id_mode)
+    df = df[base_columns].dropna()
+    if velocity:
+        df = add_velocity_features(df)[columns]
+    return pipeline.transform(df)
+
+
+def _model_params(model, n_rounds: int) -> dict:
+    # Mismos hiperparámetros que el modelo publicado, con n_rounds árboles nuevos.
+    current = model.get_params()
+    params = {k: current[k] for k in DEFAULT_PARAMS if current.get(k) is not None}
+    params["n_estimators"] = n_rounds
+    return params
+
+
+def update_model(model_path: str, identity_path: str, transaction_path: str, n_rounds: int = 50,
+                 balance_strategy: str = "scale_pos_weight", metrics=UPDATE_METRICS,
+                 tolerance: float = 0.0, publish_path: str = None, user_id_mode: str = "hash"):
+    """
+    Actualiza el modelo de model_path con un lote nuevo sin reentrenar desde cero:
+    carga el modelo y su FeaturePipeline, codifica el lote y lo parte en entrenamiento,
+    early stopping y evaluación. Continúa el boosting con n_rounds árboles nuevos
+    (deteniéndose con la segunda parte) y compara ambos modelos en la tercera, que la
+    actualización nunca vio. Solo se publica con save_model (en publish_path, por defecto
+    el mismo model_path) si ninguna de las métricas baja más que tolerance.
+    Devuelve (modelo nuevo, métricas anteriores, métricas nuevas, publicado).
+    """
+    # Sin memory-map: al publicar se sobrescriben los mismos archivos.
+    model = load_model(model_path, mmap_mode=None)
+    pipeline = load_pipeline(model_path, mmap_mode=None)
+
+    df_encoded = load_batch(identity_path, transaction_path, pipeline, user_id_mode=user_id_mode)
+    print(f"Lote nuevo cargado y codificado. Shape: {df_encoded.shape}")
+
+    # Train / early stopping / evaluación: el holdout de split_data queda para comparar
+    # los modelos y el early stopping usa una parte del entrenamiento.
+    X_train, X_test, y_train, y_test = split_data(df=df_encoded, target_column=pipeline.target_column)
+    X_train, X_stop, y_train, y_stop = train_test_split(
+        X_train, y_train, test_size=0.2, random_state=42, stratify=y_train
+    )
+    X_train, y_train, sample_weight = balance_data(X_train, y_train, strategy=balance_strategy, return_weights=True)
+
+    updated = train_xgb_model(
+        X_train, y_train, X_stop, y_stop, params=_model_params(model, n_rounds),
+        sample_weight=sample_weight, xgb_model=model,
+    )
+
+    _, proba_before = predict(model, X_test)
+    _, proba_after = predict(updated, X_test)
+    before = evaluate(y_test, proba_before).metrics
+    after = evaluate(y_test, proba_after).metrics
+
+    print("\n📈 Holdout del lote nuevo, no usado en la actualización (actual -> actualizado):")
+    for name in metrics:
+        print(f"{name:<13}: {before[name]:.4f} -> {after[name]:.4f}")
+
+    regressions = [name for name in metrics if after[name] < before[name] - tolerance]
+    if regressions:
+        print(f"⚠️ El modelo actualizado empeora en {regressions}; no se publica.")
+        return updated, before, after, False
+
+    publish_path = publish_path or model_path
+    save_model(updated, publish_path, pipeline=pipeline)
+    print(f"✅ Modelo actualizado publicado en: {publish_path}")
+    return updated, before, after, True
@@ -1,7 +1,6 @@
 import streamlit as st
 import pandas as pd
 import requests
-import io
 import json
 import os
 from dotenv import load_dotenv
@@ -10,6 +9,12 @@ from dotenv import load_dotenv
 # from pandasai.llm.openai import OpenAI
 from openai import OpenAI as openai_client # Importar el cliente general de OpenAI
 import plotly.express as px # Importar Plotly Express
+from src.client import score_frame_with_fallback
+from src.banding import app_bands
+from src.simulator import CostIndex
+from src.cache import SCORE_CACHE_MAX_BYTES, content_key, load_cached_frame, save_cached_frame
+from src.agent import CFOAgent, build_cube, cube_version, frame_fingerprint
+from src.sandbox import SandboxPool
 
 # Cargar variables de entorno al inicio
 load_dotenv()
@@ -23,6 +28,18 @@ else:
     st.error("La variable de entorno OPENAI_API_KEY no está configurada. Por favor, revisa tu archivo .env.")
     openai_client_chat = None
 
+
+@st.cache_resource
+def obtener_agente(_client):
+    # Un solo agente (y una sola caché de preguntas) compartido entre sesiones y reruns.
+    return CFOAgent(_client)
+
+
+@st.cache_resource
+def obtener_sandbox():
+    # Procesos pre-arrancados que ejecutan el código generado por el LLM con límites de tiempo y memoria.
+    return SandboxPool()
+
 # ---------- CONFIGURACIÓN DE PÁGINA Y API ----------
 st.set_page_config(page_title="🚨 Detección de Fraude + Agente IA 🤖", layout="wide")
 
@@ -32,8 +49,26 @@ if 'df_scores' not in st.session_state:
 if 'messages' not in st.session_state:
     st.session_state.messages = []
 
-# URL de tu API de Cloud Run
-API_URL = "https://fraud-detector-api-567985136734.us-central1.run.app"
+# URL de la API de scoring (src/api.py), por defecto la de Cloud Run
+API_URL = os.getenv("API_URL", "https://fraud-detector-api-567985136734.us-central1.run.app")
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def obtener_version_modelo(api_url):
+    """
+    Versión del modelo que sirve la API (para la caché de scores). MODEL_VERSION la
+    fija a mano; None si no se puede consultar o si la API no la informa (versiones
+    viejas sin /health), y entonces no se usa la caché.
+    """
+    if os.getenv("MODEL_VERSION"):
+        return os.getenv("MODEL_VERSION")
+    try:
+        respuesta = requests.get(f"{api_url}/health", timeout=5)
+        respuesta.raise_for_status()
+        health = respuesta.json()
+    except (requests.RequestException, ValueError):
+        return None
+    return health.get("model_version") if isinstance(health, dict) else None
 
 # ---------- CARGA DE DATOS Y LÓGICA DE PREDICCIÓN ----------
 st.title("FRAUD RISK APP")
@@ -44,41 +79,61 @@ uploaded_transaction_file = st.file_uploader("📂 Elige el archivo de Transacci
 uploaded_identity_file = st.file_uploader("📂 Elige el archivo de Identidad (identity.csv)", type="csv")
 
 if uploaded_transaction_file and uploaded_identity_file:
-    if st.session_state.df_scores is None or \
-       (uploaded_transaction_file.name, uploaded_identity_file.name) != \
-       (st.session_state.get('last_trans_file_name'), st.session_state.get('last_id_file_name')):
-        
+    # file_id cambia con cada subida; el contenido solo se hashea cuando cambia.
+    file_ids = (uploaded_transaction_file.file_id, uploaded_identity_file.file_id)
+    if st.session_state.df_scores is None or file_ids != st.session_state.get('last_file_ids'):
+
         try:
-            df_transactions = pd.read_csv(uploaded_transaction_file)
-            df_identity = pd.read_csv(uploaded_identity_file)
-            df_raw_input = pd.merge(df_transactions, df_identity, on='TransactionID', how='left')
-            st.success("✅ Archivos cargados y fusionados correctamente.")
-
-            json_data = df_raw_input.to_json(orient='records')
-            st.info("📡 Enviando datos a la API para predicción...")
-            headers = {'Content-Type': 'application/json'}
-            
-            # --- Añadir logs antes y después de la llamada a la API ---
-            print("DEBUG: Realizando llamada a la API de predicción...")
-            response = requests.post(API_URL, data=json_data, headers=headers)
-            print(f"DEBUG: Llamada a la API finalizada. Código de estado: {response.status_code}")
-
-            if response.status_code == 200:
-                predictions = response.json()
-                st.success("🎯 Predicciones recibidas de la API.")
-                df_predictions = pd.DataFrame(predictions)
-                
-                st.session_state.df_scores = df_raw_input.copy()
-                st.session_state.df_scores['fraud_score'] = df_predictions['prediction']
-
-                st.session_state.last_trans_file_name = uploaded_transaction_file.name
-                st.session_state.last_id_file_name = uploaded_identity_file.name
-                
+            # Caché de scores por contenido de los archivos y versión del modelo
+            version_modelo = obtener_version_modelo(API_URL)
+            clave_scores = None
+            if version_modelo is not None:
+                clave_scores = content_key(
+                    [uploaded_transaction_file, uploaded_identity_file], model_version=version_modelo
+                )
+            df_cacheado = load_cached_frame(clave_scores, "scores") if clave_scores else None
+
+            if df_cacheado is not None:
+                st.success("⚡ Resultados recuperados de la caché (mismos archivos y mismo modelo).")
+                st.session_state.df_scores = df_cacheado
+                st.session_state.last_file_ids = file_ids
             else:
-                st.error(f"❌ Error al conectar con la API. Código de estado: {response.status_code}")
-                st.json(response.json())
-                st.session_state.df_scores = None
-                
+                df_transactions = pd.read_csv(uploaded_transaction_file)
+                df_identity = pd.read_csv(uploaded_identity_file)
+                df_raw_input = pd.merge(df_transactions, df_identity, on='TransactionID', how='left')
+                st.success("✅ Archivos cargados y fusionados correctamente.")
+
+                st.info("📡 Enviando datos a la API para predicción...")
+                progress_bar = st.progress(0.0)
+
+                def actualizar_progreso(hechos, total):
+                    progress_bar.progress(hechos / total, text=f"📦 Chunks procesados: {hechos}/{total}")
+
+                def avisar_fallback():
+                    st.info("📡 La API no soporta envío por chunks; se envía todo en un solo JSON...")
+
+                try:
+                    # Se envía en chunks Arrow comprimidos, varios en paralelo y con reintentos;
+                    # si la API desplegada no tiene /predict/batch se usa el POST JSON anterior.
+                    df_predictions = score_frame_with_fallback(
+                        df_raw_input, API_URL, on_fallback=avisar_fallback, progress=actualizar_progreso
+                    )
+                    progress_bar.progress(1.0)
+                except requests.HTTPError as http_e:
+                    st.error(f"❌ Error al conectar con la API. Código de estado: {http_e.response.status_code}")
+                    st.session_state.df_scores = None
+                else:
+                    st.success("🎯 Predicciones recibidas de la API.")
+
+                    st.session_state.df_scores = df_raw_input
+                    st.session_state.df_scores['fraud_score'] = df_predictions['prediction'].to_numpy()
+                    st.session_state.last_file_ids = file_ids
+
+                    if clave_scores is not None:
+                        save_cached_frame(
+                            st.session_state.df_scores, clave_scores, "scores", max_bytes=SCORE_CACHE_MAX_BYTES
+                        )
+
         except Exception as e:
             st.error(f"⚠️ Ocurrió un error: {e}")
             st.session_state.df_scores = None
@@ -140,23 +195,17 @@ if st.session_state.df_scores is not None:
     st.sidebar.markdown(f"**Paquete Medio** 💳➕🧾")
     st.sidebar.markdown(f"**Paquete Completo** 💳➕🧾➕🏦") 
 
-    def assign_risk_group(score):
-        if score < low_risk_threshold: return "Bajo riesgo"
-        elif score < medium_risk_threshold: return "Riesgo medio"
-        elif score < high_risk_threshold: return "Riesgo alto"
-        else: return "Fraude"
+    risk_bands = app_bands(low_risk_threshold, medium_risk_threshold, high_risk_threshold)
 
     if 'TransactionAmt' in st.session_state.df_scores.columns:
-        st.session_state.df_display = st.session_state.df_scores.copy()
-        st.session_state.df_display["risk_group"] = st.session_state.df_display["fraud_score"].apply(assign_risk_group)
-
-        def asignar_paquete_modelo(score):
-            if score < low_risk_threshold: return "Paquete Completo"
-            elif score < medium_risk_threshold: return "Paquete Medio"
-            elif score < high_risk_threshold: return "Paquete Básico"
-            else: return "Sin Paquete"
-
-        st.session_state.df_display["paquete_servicio"] = st.session_state.df_display["fraud_score"].apply(asignar_paquete_modelo)
+        # El índice y la huella se calculan una vez por carga; cada movimiento de slider solo hace búsquedas binarias.
+        if st.session_state.get('cost_index_source') is not st.session_state.df_scores:
+            st.session_state.cost_index = CostIndex(
+                st.session_state.df_scores["fraud_score"], st.session_state.df_scores["TransactionAmt"]
+            )
+            st.session_state.data_fingerprint = frame_fingerprint(st.session_state.df_scores)
+            st.session_state.cost_index_source = st.session_state.df_scores
+        cost_index = st.session_state.cost_index
 
         paquete_a_costo = {
             "Paquete Básico": costo_simple,
@@ -165,33 +214,27 @@ if st.session_state.df_scores is not None:
             "Sin Paquete": 0.0
         }
 
-        df_display_baseline = st.session_state.df_display.copy()
-        df_display_baseline["paquete_servicio"] = df_display_baseline["fraud_score"].apply(lambda s: "Paquete Completo" if s < 0.9 else "Sin Paquete")
-
-        paquete_a_costo_baseline = {
-            "Paquete Completo": costo_completo,
-            "Sin Paquete": 0.0
-        }
-
-        st.session_state.df_display["estimated_cost_ponderado"] = st.session_state.df_display.apply(
-            lambda row: row["TransactionAmt"] * row["fraud_score"] * paquete_a_costo.get(row["paquete_servicio"], 0.0), axis=1)
+        # Cubo de agregados por grupo/paquete: se reconstruye solo si cambian datos, umbrales o costos.
+        version_cubo = cube_version(st.session_state.data_fingerprint, risk_bands, paquete_a_costo)
+        if st.session_state.get('cube_version') != version_cubo:
+            st.session_state.cube = build_cube(cost_index, risk_bands, paquete_a_costo)
+            st.session_state.cube_version = version_cubo
+        df_bandas = st.session_state.cube
 
-        df_display_baseline["estimated_cost_ponderado"] = df_display_baseline.apply(
-            lambda row: row["TransactionAmt"] * row["fraud_score"] * paquete_a_costo_baseline.get(row["paquete_servicio"], 0.0), axis=1)
-
-
-        Costo_total_fraude_con_modelo = st.session_state.df_display['estimated_cost_ponderado'].sum()
-        Costo_total_fraude_sin_modelo = df_display_baseline['estimated_cost_ponderado'].sum()
+        # Escenario base: Paquete Completo para todo score < 0.9, Sin Paquete para el resto.
+        Costo_total_fraude_con_modelo = df_bandas["estimated_cost_ponderado"].sum()
+        Costo_total_fraude_sin_modelo = cost_index.total_cost([0.9], [costo_completo, 0.0])
         ahorro_total = Costo_total_fraude_sin_modelo - Costo_total_fraude_con_modelo
         porcentaje_ahorro = ahorro_total / Costo_total_fraude_sin_modelo if Costo_total_fraude_sin_modelo > 0 else 0
 
-        Monto_total_movimiento = st.session_state.df_display['TransactionAmt'].sum()
+        Monto_total_movimiento = df_bandas['amount'].sum()
 
         # --- Gráficas y Métricas ---
         st.title("📊 Resultados de la Predicción y Análisis de Costos")
         st.subheader("🧪 Distribución de Riesgo por Modelo")
 
-        risk_counts = st.session_state.df_display["risk_group"].value_counts().reset_index()
+        df_bandas_con_datos = df_bandas[df_bandas["count"] > 0].sort_values(by="count", ascending=False)
+        risk_counts = df_bandas_con_datos[["risk_group", "count"]].reset_index(drop=True)
         risk_counts.columns = ["Riesgo de Grupo", "Cantidad"]
 
         color_map = {
@@ -240,7 +283,12 @@ if st.session_state.df_scores is not None:
             "TransactionID", "TransactionAmt", "fraud_score", "risk_group", "paquete_servicio"
         ]
 
-        df_vista = st.session_state.df_display[cols_a_mostrar].head(20).copy()
+        # Solo la vista previa toca el frame: se asignan grupo y paquete a las primeras 20 filas.
+        df_vista = st.session_state.df_scores[["TransactionID", "TransactionAmt", "fraud_score"]].head(20).copy()
+        codigos_vista = risk_bands.codes(df_vista["fraud_score"])
+        df_vista["risk_group"] = risk_bands.groups(codes=codigos_vista)
+        df_vista["paquete_servicio"] = risk_bands.packages(codes=codigos_vista)
+        df_vista = df_vista[cols_a_mostrar]
 
         df_vista.rename(columns={
             "TransactionID": "ID de Transacción",
@@ -272,13 +320,11 @@ if st.session_state.df_scores is not None:
 
         st.markdown("### 📌 Costos estimados por grupo de riesgo")
 
-        # Filtrar el DataFrame para excluir el grupo 'fraude'
-        df_filtrado = st.session_state.df_display[
-            st.session_state.df_display["risk_group"].str.strip().str.lower() != "fraude"
-        ]
+        # Excluir el grupo 'fraude' y los grupos sin transacciones
+        df_filtrado = df_bandas_con_datos[df_bandas_con_datos["risk_group"] != "Fraude"]
         
-        # Agrupar y calcular los costos
-        df_costos = df_filtrado.groupby("risk_group")["estimated_cost_ponderado"].sum().reset_index()
+        # Costos por grupo
+        df_costos = df_filtrado[["risk_group", "estimated_cost_ponderado"]].copy()
         
         # Ordenar de mayor a menor según el costo
         df_costos = df_costos.sort_values(by="estimated_cost_ponderado", ascending=False)
@@ -299,8 +345,8 @@ if st.session_state.df_scores is not None:
         st.markdown("### 📈 Análisis adicional y métricas clave")
         col1, col2 = st.columns(2)
 
-        risk_pct = st.session_state.df_display["risk_group"].value_counts(normalize=True).reset_index()
-        risk_pct.columns = ["Riesgo de Grupo", "Porcentaje"]
+        risk_pct = risk_counts.rename(columns={"Cantidad": "Porcentaje"})
+        risk_pct["Porcentaje"] = risk_pct["Porcentaje"] / cost_index.n
         risk_pct["Porcentaje"] = (risk_pct["Porcentaje"] * 100).round(2)
 
         fig_pct = px.bar(
@@ -316,8 +362,7 @@ if st.session_state.df_scores is not None:
         fig_pct.update_layout(yaxis_title="Porcentaje (%)", xaxis_title="", showlegend=False, margin=dict(t=40))
         col1.plotly_chart(fig_pct, use_container_width=True)
 
-        monto_group = st.session_state.df_display.groupby("risk_group")["TransactionAmt"].sum().reset_index()
-        monto_group.rename(columns={"TransactionAmt": "Monto Total"}, inplace=True)
+        monto_group = df_bandas_con_datos[["risk_group", "amount"]].rename(columns={"amount": "Monto Total"})
         monto_group = monto_group.sort_values(by="Monto Total", ascending=False)
 
         fig_monto = px.bar(
@@ -334,12 +379,10 @@ if st.session_state.df_scores is not None:
         col2.plotly_chart(fig_monto, use_container_width=True)
 
         # Filtrar para excluir 'sin paquete'
-        df_filtrado = st.session_state.df_display[
-            st.session_state.df_display["paquete_servicio"].str.strip().str.lower() != "sin paquete"
-        ]
+        df_filtrado = df_bandas_con_datos[df_bandas_con_datos["paquete_servicio"] != "Sin Paquete"]
         
-        # Agrupar y calcular el costo estimado
-        paquete_costos = df_filtrado.groupby("paquete_servicio")["estimated_cost_ponderado"].sum().reset_index()
+        # Costo estimado por paquete
+        paquete_costos = df_filtrado[["paquete_servicio", "estimated_cost_ponderado"]].copy()
         
         # Renombrar columnas
         paquete_costos.rename(
@@ -402,81 +445,22 @@ if st.session_state.df_scores is not None:
 
                 with st.chat_message("assistant"):
                     with st.spinner("Pensando..."):
-                        # --- CÓDIGO CORREGIDO Y MEJORADO ---
-                        # Heurística para decidir si la pregunta es sobre los datos
-                        data_keywords = ["cuánto", "promedio", "suma", "total", "monto", "riesgo", "usuarios", "transacciones", "costo", "fraude", "número", "porcentaje", "distribución", "fraudulentos"]
-                        is_data_query = any(keyword in user_query.lower() for keyword in data_keywords)
-
-                        if is_data_query:
-                            # --- Lógica para preguntas de datos (sin PandasAI) ---
-                            # Le pedimos a GPT que genere el código Python
-                            prompt_for_code = f"""
-                            Eres un asistente experto en análisis de datos. Dada la siguiente pregunta del usuario y un DataFrame de pandas llamado `st.session_state.df_display` (que está en st.session_state.df_scores), genera el código Python para responder a la pregunta.
-                            Asegúrate de que el código sea completo y ejecutable. Si la pregunta es sobre "usuarios" o "transacciones", asume que se refiere a filas en el DataFrame.
-
-                            El DataFrame `st.session_state.df_display` tiene las siguientes columnas clave:
-                            - 'risk_group': Contiene las categorías 'Bajo riesgo', 'Riesgo medio', 'Riesgo alto', 'Fraude'.
-                            - 'TransactionAmt': Contiene el monto de la transacción.
-                            - 'fraud_score': Es el score de fraude del modelo.
-                            - 'estimated_cost_ponderado': Es el costo estimado por transacción.
-
-                            Pregunta del usuario: "{user_query}"
-
-                            Si la pregunta se refiere a "fraude", "fraudulentos" o "transacciones fraudulentas", debes filtrar la columna `risk_group` para que sea igual a 'Fraude'.
-                            Por favor, genera solo el código Python. No incluyas explicaciones ni texto adicional.
-                            Ejemplo:
-                            # Código para "cuántas filas hay?"
-                            print(len(df))
-                            """
-                            try:
-                                code_completion = openai_client_chat.chat.completions.create(
-                                    model="gpt-3.5-turbo",
-                                    messages=[
-                                        {"role": "system", "content": prompt_for_code}
-                                    ]
-                                )
-                                python_code = code_completion.choices[0].message.content
-                                
-                                # Ejecutar el código generado
-                                # Creamos un entorno de ejecución seguro
-                                local_vars = {'df': st.session_state.df_scores, 'pd': pd}
-                                output_buffer = io.StringIO()
-                                try:
-                                    # Redirigir la salida estándar para capturar el print
-                                    import sys
-                                    old_stdout = sys.stdout
-                                    sys.stdout = output_buffer
-                                    
-                                    with st.spinner("Ejecutando código..."):
-                                        exec(python_code, globals(), local_vars)
-                                        response = local_vars.get('result', output_buffer.getvalue().strip())
-                                        if not response: # Si el código no hizo print o no asignó 'result'
-                                            response = "No pude obtener una respuesta específica de los datos con ese código."
-                                            st.code(python_code) # Mostrar el código para depuración si no hay respuesta
-                                except Exception as exec_e:
-                                    response = f"Error al ejecutar el código Python generado: {exec_e}. Intenta reformular tu pregunta."
-                                    st.code(python_code) # Mostrar el código para depuración
-                                finally:
-                                    sys.stdout = old_stdout # Restaurar la salida estándar
-                                    
-                            except Exception as e:
-                                response = f"Lo siento, ocurrió un error al generar el código Python para tu pregunta. Error: {e}"
-                        else:
-                            # Usar el cliente general de OpenAI para preguntas conversacionales
-                            messages_for_chat = [
-                                {"role": "system", "content": "You are a helpful CFO assistant for a fraud detection app. You respond in Spanish and your tone is professional. You can't access any data directly. If the user asks for data analysis, tell them you can only answer general questions and suggest they ask a specific data-related question."},
-                                {"role": "user", "content": user_query}
-                            ]
-                            
-                            try:
-                                chat_completion = openai_client_chat.chat.completions.create(
-                                    model="gpt-3.5-turbo",
-                                    messages=messages_for_chat
-                                )
-                                response = chat_completion.choices[0].message.content
-                            except Exception as e:
-                                response = f"Lo siento, no pude procesar tu pregunta con el modelo de chat. Error: {e}"
-                        
+                        # Primero el cubo de agregados, después la caché y solo si hace falta el LLM.
+                        agente = obtener_agente(openai_client_chat)
+                        try:
+                            def ejecutar_en_sandbox(codigo):
+                                # Los datos se copian a memoria compartida una vez por carga (clave = huella).
+                                sandbox = obtener_sandbox()
+                                clave = sandbox.attach(st.session_state.df_scores, st.session_state.data_fingerprint)
+                                return sandbox.run(codigo, clave, risk_bands, paquete_a_costo)
+
+                            respuesta = agente.answer(user_query, df_bandas, version_cubo, ejecutar_en_sandbox)
+                            response = respuesta.text
+                            if respuesta.source == "error":
+                                st.code(respuesta.code) # Mostrar el código para depuración
+                        except Exception as e:
+                            response = f"Lo siento, ocurrió un error al procesar tu pregunta. Error: {e}"
+
                         st.markdown(response)
                         st.session_state.messages.append({"role": "assistant", "content": response})
 
@@ -0,0 +1,145 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.agent import (
+    CFOAgent, QueryCache, answer_from_cube, build_cube, cube_version, display_frame,
+    frame_fingerprint, normalize_question,
+)
+from src.banding import app_bands
+from src.sandbox import run_snippet
+from src.simulator import CostIndex
+
+PACKAGE_COSTS = {"Paquete Básico": 0.001, "Paquete Medio": 0.005, "Paquete Completo": 0.01, "Sin Paquete": 0.0}
+
+
+class StubLLM:
+    """Imita openai.OpenAI: chat.completions.create devuelve siempre `reply`."""
+
+    def __init__(self, reply):
+        self.reply = reply
+        self.calls = []
+        self.chat = self
+        self.completions = self
+
+    def create(self, model, messages):
+        self.calls.append(messages)
+        message = type("Message", (), {"content": self.reply})()
+        choice = type("Choice", (), {"message": message})()
+        return type("Completion", (), {"choices": [choice]})()
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "TransactionID": np.arange(1000),
+        "TransactionAmt": rng.gamma(2, 50, 1000),
+        "fraud_score": rng.random(1000),
+    })
+    bands = app_bands(0.3, 0.6, 0.9)
+    cube = build_cube(CostIndex(df["fraud_score"], df["TransactionAmt"]), bands, PACKAGE_COSTS)
+    version = cube_version(frame_fingerprint(df), bands, PACKAGE_COSTS)
+    return df, bands, cube, version
+
+
+def test_cube_matches_row_level_aggregates(data):
+    df, bands, cube, _ = data
+    display = display_frame(df, bands, PACKAGE_COSTS)
+    expected = display.groupby("risk_group", observed=False).agg(
+        count=("TransactionAmt", "size"),
+        amount=("TransactionAmt", "sum"),
+        estimated_cost_ponderado=("estimated_cost_ponderado", "sum"),
+        score_mean=("fraud_score", "mean"),
+        score_max=("fraud_score", "max"),
+    ).reindex(cube["risk_group"])
+    for column in expected.columns:
+        np.testing.assert_allclose(cube[column].to_numpy(), expected[column].to_numpy())
+
+
+def test_cube_answers_do_not_call_the_llm(data):
+    df, bands, cube, version = data
+    llm = StubLLM("result = 'no debería usarse'")
+    agent = CFOAgent(llm)
+    n_high = int((bands.codes(df["fraud_score"]) == 2).sum())
+
+    answer = agent.answer("¿Cuántas transacciones hay de alto riesgo?", cube, version, None)
+    assert answer.source == "cube"
+    assert f"{n_high:,}" in answer.text
+    assert agent.answer("monto total", cube, version, None).source == "cube"
+    assert llm.calls == []
+
+
+@pytest.mark.parametrize("question", [
+    "¿Cuántas transacciones superan 100 dólares?",
+    "¿Cuántas transacciones no son fraude?",
+    "¿Cuántos usuarios tienen riesgo alto o medio?",
+    "¿Cuántas transacciones fraudulentas hay en el Paquete Completo?",
+    "¿Cuál es el costo total sin el modelo?",
+    "¿Cuál es el riesgo promedio?",
+    "¿Cuántos usuarios únicos hay?",
+    "¿Cuál es el monto máximo?",
+    "¿Cuánto es el monto y el costo total?",
+])
+def test_unsupported_questions_fall_back_to_llm(data, question):
+    _, _, cube, _ = data
+    assert answer_from_cube(question, cube) is None
+
+
+def test_cube_answers_single_metric_and_label(data):
+    df, bands, cube, _ = data
+    display = display_frame(df, bands, PACKAGE_COSTS)
+    n_high = int((display["risk_group"] == "Riesgo alto").sum())
+    assert answer_from_cube("¿Cuántos usuarios tienen riesgo alto?", cube) == f"Hay {n_high:,} transacciones (Riesgo alto)."
+    cost = display.loc[display["paquete_servicio"] == "Paquete Medio", "estimated_cost_ponderado"].sum()
+    assert answer_from_cube("Costo del paquete medio", cube) == f"El costo estimado ponderado (Paquete Medio) es ${cost:,.2f}."
+
+
+def test_llm_answers_are_cached_by_question_and_version(data):
+    df, bands, cube, version = data
+    llm = StubLLM("```python\nresult = str(len(df[df['risk_group'] == 'Fraude']))\n```")
+    agent = CFOAgent(llm)
+    execute = lambda code: run_snippet(code, display_frame(df, bands, PACKAGE_COSTS))
+
+    first = agent.answer("Listá los usuarios de fraude", cube, version, execute)
+    second = agent.answer("  listá los USUARIOS de fraude?", cube, version, execute)
+    assert (first.source, second.source) == ("llm", "cache")
+    assert first.text == second.text == str(int((df["fraud_score"] >= 0.9).sum()))
+    assert len(llm.calls) == 1
+
+    # Otros umbrales (u otros datos) cambian la versión y vuelven a consultar al LLM.
+    other = cube_version(frame_fingerprint(df), app_bands(0.2, 0.5, 0.8), PACKAGE_COSTS)
+    assert agent.answer("Listá los usuarios de fraude", cube, other, execute).source == "llm"
+    assert len(llm.calls) == 2
+
+
+def test_execution_errors_are_not_cached(data):
+    df, _, cube, version = data
+    llm = StubLLM("result = df['no_existe'].sum()")
+    agent = CFOAgent(llm)
+    for _ in range(2):
+        answer = agent.answer("Listá los usuarios de fraude", cube, version, lambda code: run_snippet(code, df))
+        assert answer.source == "error"
+    assert len(llm.calls) == 2
+
+
+def test_general_chat_is_cached():
+    llm = StubLLM("Hola, soy tu asistente.")
+    agent = CFOAgent(llm)
+    assert agent.answer("Hola!", None, None, None).source == "chat"
+    assert agent.answer("hola", None, None, None).source == "cache"
+    assert len(llm.calls) == 1
+
+
+def test_query_cache_evicts_least_recently_used():
+    cache = QueryCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+
+
+def test_normalize_question():
+    assert normalize_question("¿Cuántos  USUARIOS hay?") == "cuantos usuarios hay"
@@ -0,0 +1,106 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+from src.api import create_app
+from src.client import (
+    ARROW_CONTENT_TYPE, PARQUET_CONTENT_TYPE, score_frame_with_fallback, serialize_chunk,
+)
+from src.model import train_xgb_model
+from src.preprocessing import FeaturePipeline
+
+
+@pytest.fixture(scope="module")
+def client():
+    rng = np.random.default_rng(0)
+    n = 2_000
+    df = pd.DataFrame({
+        "TransactionID": np.arange(n),
+        "ProductCD": rng.choice(list("WHCSR"), n),
+        "card4": pd.Series(rng.choice(["visa", "mastercard", "discover"], n)).mask(rng.random(n) < 0.1),
+        "TransactionAmt": rng.lognormal(4, 1, n),
+        "dist1": pd.Series(rng.integers(0, 100, n).astype(float)).mask(rng.random(n) < 0.3),
+    })
+    logit = 0.02 * df["dist1"].fillna(150) - 2 + (df["ProductCD"] == "C")
+    y = (rng.random(n) < 1 / (1 + np.exp(-logit))).astype(int)
+
+    pipeline = FeaturePipeline(["ProductCD", "card4"])
+    X = pipeline.fit_transform(df.drop(columns="TransactionID"))
+    model = train_xgb_model(X[:1_600], y[:1_600], X[1_600:], y[1_600:], params={"n_estimators": 30})
+    with TestClient(create_app(model, pipeline, max_wait_ms=1)) as test_client:
+        yield test_client, df.head(200)
+
+
+@pytest.mark.parametrize("content_type", [ARROW_CONTENT_TYPE, PARQUET_CONTENT_TYPE])
+def test_batch_matches_single_predictions(client, content_type):
+    test_client, df = client
+    records = json.loads(df.to_json(orient="records"))
+    single = [test_client.post("/predict", json=record).json()[0] for record in records]
+
+    fmt = "arrow" if content_type == ARROW_CONTENT_TYPE else "parquet"
+    response = test_client.post(
+        "/predict/batch", content=serialize_chunk(df, fmt), headers={"Content-Type": content_type}
+    )
+    assert response.status_code == 200
+    batch = pd.DataFrame(response.json())
+    np.testing.assert_allclose(batch["prediction"], [item["prediction"] for item in single], rtol=1e-6)
+    assert batch["grupo_fraude"].tolist() == [item["grupo_fraude"] for item in single]
+    assert [item["TransactionID"] for item in single] == df["TransactionID"].tolist()
+
+
+def test_batch_rejects_unknown_content_type(client):
+    test_client, _ = client
+    response = test_client.post("/predict/batch", content=b"{}", headers={"Content-Type": "application/json"})
+    assert response.status_code == 415
+
+
+def test_metrics_report_latency_per_endpoint(client):
+    test_client, df = client
+    before = test_client.get("/metrics").json()["latency"]
+    test_client.post("/predict", json=json.loads(df.head(1).to_json(orient="records")))
+    for _ in range(2):
+        test_client.post("/predict/batch", content=serialize_chunk(df), headers={"Content-Type": ARROW_CONTENT_TYPE})
+    after = test_client.get("/metrics").json()["latency"]
+    assert after["predict"]["count"] - before["predict"]["count"] == 1
+    assert after["predict_batch"]["count"] - before["predict_batch"]["count"] == 2
+
+
+class _LegacyHandler(BaseHTTPRequestHandler):
+    # API anterior a /predict/batch: solo acepta el POST JSON en la raíz.
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        if self.path != "/":
+            self.send_response(404)
+            self.end_headers()
+            return
+        records = json.loads(body)
+        payload = json.dumps([{"prediction": r["TransactionAmt"] / 1000} for r in records]).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_client_falls_back_to_json_post_without_batch_endpoint():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _LegacyHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    df = pd.DataFrame({"TransactionID": np.arange(120), "TransactionAmt": np.arange(120, dtype=float)})
+    fallbacks = []
+    try:
+        result = score_frame_with_fallback(
+            df, f"http://127.0.0.1:{server.server_port}", on_fallback=lambda: fallbacks.append(1), chunk_rows=50
+        )
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert fallbacks == [1]
+    np.testing.assert_allclose(result["prediction"], df["TransactionAmt"] / 1000)
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.banding import MODEL_BANDS, RiskBands, app_bands
+
+
+def _assign_risk_group(score, low, medium, high):
+    # Asignación fila a fila que usaba streamlit_app.py antes de RiskBands.
+    if score < low: return "Bajo riesgo"
+    elif score < medium: return "Riesgo medio"
+    elif score < high: return "Riesgo alto"
+    else: return "Fraude"
+
+
+def _asignar_paquete_modelo(score, low, medium, high):
+    if score < low: return "Paquete Completo"
+    elif score < medium: return "Paquete Medio"
+    elif score < high: return "Paquete Básico"
+    else: return "Sin Paquete"
+
+
+def _scores():
+    rng = np.random.default_rng(0)
+    edges = [0.3, 0.6, 0.9]
+    # Scores exactamente sobre los cortes y a un ulp de ellos, además de NaN y extremos.
+    around = np.r_[edges, np.nextafter(edges, 0), np.nextafter(edges, 1)]
+    return np.r_[rng.random(2_000), np.round(rng.random(500), 1), around, 0.0, 1.0, np.nan]
+
+
+@pytest.mark.parametrize("thresholds", [(0.3, 0.6, 0.9), (0.2, 0.2, 0.7), (0.0, 0.5, 1.0)])
+def test_app_bands_match_row_wise_assignment(thresholds):
+    scores = pd.Series(_scores())
+    bands = app_bands(*thresholds)
+
+    expected_groups = scores.apply(_assign_risk_group, args=thresholds)
+    expected_packages = scores.apply(_asignar_paquete_modelo, args=thresholds)
+    assert np.asarray(bands.groups(scores)).tolist() == expected_groups.tolist()
+    assert np.asarray(bands.packages(scores)).tolist() == expected_packages.tolist()
+
+
+def test_scores_on_edges_go_to_the_upper_band():
+    codes = MODEL_BANDS.codes([0.3, 0.6, 0.9, np.nextafter(0.3, 0), np.nan])
+    assert codes.tolist() == [1, 2, 3, 0, 3]
+
+
+def test_searchsorted_path_matches_comparisons():
+    # Con más de 8 cortes codes() pasa a np.searchsorted; tiene que dar lo mismo.
+    edges = np.round(np.linspace(0.1, 0.9, 9), 1)
+    labels = [f"b{i}" for i in range(len(edges) + 1)]
+    bands = RiskBands(edges, labels, labels)
+    scores = _scores()
+    expected = [labels[int(np.sum(s >= edges)) if not np.isnan(s) else -1] for s in scores]
+    assert np.asarray(bands.groups(scores)).tolist() == expected
+
+
+def test_summarize_matches_groupby():
+    scores = _scores()
+    amounts = np.random.default_rng(1).gamma(2, 50, len(scores))
+    bands = app_bands(0.3, 0.6, 0.9)
+    summary = bands.summarize(bands.codes(scores), amounts)
+
+    groups = pd.Series(scores).apply(_assign_risk_group, args=(0.3, 0.6, 0.9))
+    expected = pd.Series(amounts).groupby(groups).agg(["count", "sum"]).reindex(bands.group_labels)
+    assert summary["count"].tolist() == expected["count"].tolist()
+    np.testing.assert_allclose(summary["amount"], expected["sum"])
@@ -0,0 +1,83 @@
+import os
+
+import fsspec
+from fsspec.implementations.memory import MemoryFileSystem
+
+from src.cache import evict_lru, fetch_artifact
+
+
+class _VersionedMemoryFileSystem(MemoryFileSystem):
+    # Como GCS: cada escritura cambia la generation del objeto, aunque no cambie el tamaño.
+    protocol = "versioned"
+    generations = {}
+
+    def info(self, path, **kwargs):
+        info = super().info(path, **kwargs)
+        info["generation"] = self.generations.get(self._strip_protocol(path), 0)
+        return info
+
+
+fsspec.register_implementation("versioned", _VersionedMemoryFileSystem, clobber=True)
+
+
+def _write(path, data, generation):
+    fs = fsspec.filesystem("versioned")
+    fs.pipe(path, data)
+    _VersionedMemoryFileSystem.generations[fs._strip_protocol(path)] = generation
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_fetch_artifact_refetches_new_generation(tmp_path):
+    source = "versioned://models/model.joblib"
+    _write(source, b"version-1", generation=1)
+    first = fetch_artifact(source, str(tmp_path), max_bytes=1024)
+    assert fetch_artifact(source, str(tmp_path), max_bytes=1024) == first
+
+    # Mismo tamaño, otra generation: se descarga de nuevo.
+    _write(source, b"version-2", generation=2)
+    second = fetch_artifact(source, str(tmp_path), max_bytes=1024)
+    assert second != first
+    assert _read(second) == b"version-2"
+
+
+def test_fetch_artifact_refetches_modified_local_file(tmp_path):
+    source = tmp_path / "model.joblib"
+    source.write_bytes(b"version-1")
+    os.utime(source, (1_000, 1_000))
+    cache_dir = str(tmp_path / "cache")
+    first = fetch_artifact(str(source), cache_dir, max_bytes=1024)
+
+    source.write_bytes(b"version-2")
+    os.utime(source, (2_000, 2_000))
+    second = fetch_artifact(str(source), cache_dir, max_bytes=1024)
+    assert second != first
+    assert _read(second) == b"version-2"
+
+
+def test_fetch_artifact_evicts_least_recently_used(tmp_path):
+    cache_dir = str(tmp_path)
+    paths = []
+    for i in range(3):
+        source = f"versioned://models/model_{i}.joblib"
+        _write(source, bytes(400), generation=1)
+        paths.append(fetch_artifact(source, cache_dir, max_bytes=1_000))
+        os.utime(paths[-1], (1_000 + i, 1_000 + i))
+    # 3 x 400 bytes superan el límite: se borra el menos usado, no el recién descargado.
+    assert not os.path.exists(paths[0])
+    assert os.path.exists(paths[1]) and os.path.exists(paths[2])
+    assert sum(os.path.getsize(p) for p in paths[1:]) <= 1_000
+
+
+def test_evict_lru_keeps_listed_files(tmp_path):
+    for i in range(4):
+        path = tmp_path / f"{i}.parquet"
+        path.write_bytes(bytes(100))
+        os.utime(path, (1_000 + i, 1_000 + i))
+    (tmp_path / "partial.tmp").write_bytes(bytes(1_000))
+
+    evict_lru(str(tmp_path), max_bytes=200, keep=[str(tmp_path / "0.parquet")])
+    assert sorted(os.listdir(tmp_path)) == ["0.parquet", "3.parquet", "partial.tmp"]
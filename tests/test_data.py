@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import generate_identity, generate_transactions
+from src.data import clean_data, load_and_merge_data, load_clean_data
+
+
+@pytest.fixture
+def ieee_csvs(tmp_path):
+    transactions = generate_transactions(600, n_v=6, seed=3)
+    identity = generate_identity(transactions["TransactionID"].to_numpy(), identity_fraction=0.5, seed=4)
+    # Filas de identidad sin transacción: el left join las deja con NaN.
+    orphans = identity.head(20).assign(TransactionID=np.arange(20) + 10_000_000)
+    identity = pd.concat([identity, orphans], ignore_index=True).sample(frac=1, random_state=0)
+    identity_path, transaction_path = tmp_path / "identity.csv", tmp_path / "transaction.csv"
+    identity.to_csv(identity_path, index=False)
+    transactions.to_csv(transaction_path, index=False)
+    return str(identity_path), str(transaction_path)
+
+
+def baseline_merge(identity_path, transaction_path):
+    return pd.merge(pd.read_csv(identity_path), pd.read_csv(transaction_path), on="TransactionID", how="left")
+
+
+def assert_same_values(result, expected):
+    assert list(result.columns) == list(expected.columns)
+    assert len(result) == len(expected)
+    for col in expected.columns:
+        if pd.api.types.is_numeric_dtype(expected[col]):
+            np.testing.assert_allclose(
+                pd.to_numeric(result[col].astype(object)).astype(float), expected[col].astype(float),
+                rtol=1e-6, equal_nan=True, err_msg=col,
+            )
+        else:
+            assert result[col].astype(object).where(result[col].notna(), None).tolist() == \
+                expected[col].astype(object).where(expected[col].notna(), None).tolist(), col
+
+
+def test_load_and_merge_data_matches_pd_merge(ieee_csvs):
+    expected = baseline_merge(*ieee_csvs)
+    result = load_and_merge_data(*ieee_csvs, chunksize=70, verbose=False)
+    assert result["TransactionDT"].isna().sum() == 20
+    assert_same_values(result, expected)
+
+
+def test_load_clean_data_matches_clean_data(ieee_csvs):
+    expected = clean_data(baseline_merge(*ieee_csvs)).reset_index(drop=True)
+    result = load_clean_data(*ieee_csvs, chunksize=70, verbose=False)
+    assert len(expected) > 0
+    assert_same_values(result, expected)
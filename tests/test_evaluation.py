@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+from sklearn.metrics import (
+    accuracy_score, average_precision_score, confusion_matrix, f1_score, precision_score, recall_score,
+    roc_auc_score,
+)
+
+from src.evaluation import evaluate
+
+
+def _sklearn_metrics(y, proba, threshold=0.5):
+    y_pred = proba >= threshold
+    return {
+        "accuracy": accuracy_score(y, y_pred),
+        "f1": f1_score(y, y_pred, zero_division=0),
+        "recall": recall_score(y, y_pred, zero_division=0),
+        "precision": precision_score(y, y_pred, zero_division=0),
+    }, confusion_matrix(y, y_pred, labels=[0, 1])
+
+
+def test_matches_sklearn_on_tied_scores():
+    rng = np.random.default_rng(0)
+    y = (rng.random(3_000) < 0.1).astype(int)
+    # Scores redondeados: muchos empates, incluso entre clases.
+    proba = np.round(np.clip(rng.normal(0.3 + 0.3 * y, 0.2), 0, 1), 2)
+    result = evaluate(y, proba)
+
+    expected, confusion = _sklearn_metrics(y, proba)
+    for name, value in expected.items():
+        assert result.metrics[name] == pytest.approx(value), name
+    assert result.metrics["roc_auc"] == pytest.approx(roc_auc_score(y, proba))
+    assert result.metrics["pr_auc"] == pytest.approx(average_precision_score(y, proba))
+    np.testing.assert_array_equal(result.confusion_matrix, confusion)
+
+
+@pytest.mark.filterwarnings("ignore::UserWarning")
+@pytest.mark.parametrize("label", [0, 1])
+def test_single_class(label):
+    y = np.full(200, label)
+    proba = np.round(np.random.default_rng(1).random(200), 1)
+    result = evaluate(y, proba)
+
+    expected, confusion = _sklearn_metrics(y, proba)
+    for name, value in expected.items():
+        assert result.metrics[name] == pytest.approx(value), name
+    np.testing.assert_array_equal(result.confusion_matrix, confusion)
+    assert result.metrics["pr_auc"] == pytest.approx(average_precision_score(y, proba))
+    # sklearn no define ROC AUC con una sola clase; evaluate devuelve NaN.
+    assert np.isnan(result.metrics["roc_auc"])
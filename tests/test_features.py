@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import write_ieee_csvs
+from src.data import MODEL_CATEGORICAL_COLUMNS, load_preprocess_data
+from src.feature_store import UserFeatureStore
+from src.features import FIRST_TRANSACTION_GAP, add_velocity_features, velocity_feature_names
+from src.preprocessing import balance_data, encode_and_scale, split_data
+
+
+def test_velocity_features_run_through_default_balancing(tmp_path):
+    identity_path, transaction_path = write_ieee_csvs(str(tmp_path), n_rows=3_000, n_v=12)
+    df = load_preprocess_data(identity_path, transaction_path, cache_dir=None, user_id_mode="hash")
+    df = add_velocity_features(df)
+    assert not df[velocity_feature_names()].isna().any().any()
+
+    df_encoded = encode_and_scale(df, categorical_columns=MODEL_CATEGORICAL_COLUMNS, target_column="isFraud")
+    X_train, _, y_train, _ = split_data(df_encoded, target_column="isFraud")
+    X_res, y_res = balance_data(X_train, y_train)
+    assert len(X_res) == len(y_res) > 0
+
+
+def test_feature_store_matches_offline_features():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "user_id": rng.integers(0, 20, 500),
+        "TransactionDT": np.sort(rng.integers(0, 20 * 86_400, 500)),
+        "TransactionAmt": rng.gamma(2, 50, 500),
+    })
+    offline = add_velocity_features(df)[velocity_feature_names()]
+
+    store = UserFeatureStore()
+    online = pd.DataFrame.from_records(
+        [store.observe(u, t, a) for u, t, a in df.itertuples(index=False)], columns=velocity_feature_names()
+    )
+    np.testing.assert_allclose(online.to_numpy(), offline.to_numpy(), rtol=1e-4, atol=1e-2)
+    first = ~df["user_id"].duplicated()
+    assert (offline.loc[first, "user_secs_since_prev"] == FIRST_TRANSACTION_GAP).all()
+
+
+def test_feature_store_ignores_replayed_and_out_of_order_events():
+    store = UserFeatureStore()
+    first = store.observe("u", 100_000, 10.0, transaction_id=1)
+    assert store.observe("u", 100_000, 10.0, transaction_id=1) == first
+
+    late = store.observe("u", 50_000, 5.0, transaction_id=2)
+    assert late["user_txn_count_1h"] == 1
+    assert late["user_secs_since_prev"] == FIRST_TRANSACTION_GAP
+
+    after = store.observe("u", 100_100, 1.0, transaction_id=3)
+    assert after["user_txn_count_1h"] == 2
+    assert after["user_secs_since_prev"] == 100
+
+
+def test_feature_store_peek_does_not_change_state():
+    store = UserFeatureStore()
+    store.observe("u", 100, 10.0)
+    assert store.peek("u", 1e7)["user_txn_count_1h"] == 0
+    assert store.peek("u", 150, 5.0)["user_txn_count_1h"] == 2
+    after = store.observe("u", 200, 1.0)
+    assert after["user_txn_count_1h"] == 2
+    assert after["user_secs_since_prev"] == 100
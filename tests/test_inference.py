@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.inference import CompiledPredictor
+from src.model import train_xgb_model
+from src.preprocessing import FeaturePipeline
+
+
+@pytest.fixture(scope="module")
+def trained():
+    rng = np.random.default_rng(0)
+    n = 3_000
+    df = pd.DataFrame({
+        "ProductCD": rng.choice(list("WHCSR"), n),
+        "card4": pd.Series(rng.choice(["visa", "mastercard", "discover"], n)).mask(rng.random(n) < 0.1),
+        "TransactionAmt": rng.lognormal(4, 1, n),
+        "dist1": pd.Series(rng.integers(0, 100, n).astype(float)).mask(rng.random(n) < 0.3),
+        "C1": rng.poisson(2, n).astype(float),
+    })
+    logit = 0.02 * df["dist1"].fillna(150) - 2 + (df["ProductCD"] == "C") + np.log(df["TransactionAmt"]) / 4
+    df["isFraud"] = (rng.random(n) < 1 / (1 + np.exp(-logit))).astype(int)
+
+    pipeline = FeaturePipeline(["ProductCD", "card4"])
+    X = pipeline.fit_transform(df).drop(columns="isFraud")
+    model = train_xgb_model(X[:2_400], df["isFraud"][:2_400], X[2_400:], df["isFraud"][2_400:],
+                            params={"n_estimators": 60, "max_depth": 5})
+    return df, pipeline, model, X
+
+
+@pytest.mark.parametrize("method", ["compiled", "inplace"])
+def test_matches_predict_proba(trained, method):
+    df, _, model, X = trained
+    X = X.copy()
+    X.iloc[::7, X.columns.get_loc("TransactionAmt")] = np.nan
+    expected = model.predict_proba(X)[:, 1]
+    predictor = CompiledPredictor(model, method=method)
+    np.testing.assert_allclose(predictor.predict_proba(X.to_numpy()), expected, rtol=1e-5, atol=1e-6)
+
+
+def test_predict_record_handles_nulls_and_unseen_categories(trained):
+    df, pipeline, model, _ = trained
+    predictor = CompiledPredictor(model, pipeline)
+    records = df.drop(columns="isFraud").head(50).to_dict("records")
+    records[0].update(ProductCD="Z", card4="maestro")  # categorías no vistas
+    records[1].update(dist1=None, TransactionAmt=None)  # nulos -> rama por defecto
+    expected = model.predict_proba(pipeline.transform(pd.DataFrame.from_records(records)))[:, 1]
+    scores = [predictor.predict_record(record) for record in records]
+    np.testing.assert_allclose(scores, expected, rtol=1e-5, atol=1e-6)
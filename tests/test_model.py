@@ -0,0 +1,34 @@
+import numpy as np
+from sklearn.metrics import f1_score, precision_recall_curve
+
+from src.model import find_best_threshold, threshold_curve
+
+
+def _scores(n=2_000, seed=0):
+    rng = np.random.default_rng(seed)
+    y = rng.random(n) < 0.05
+    # float32 con empates, como predict_proba de XGBoost.
+    proba = np.round(np.clip(rng.normal(0.3 + 0.3 * y, 0.15), 0, 1), 3).astype(np.float32)
+    return y.astype(int), proba
+
+
+def test_threshold_curve_matches_sklearn():
+    y, proba = _scores()
+    curve = threshold_curve(y, proba)
+    for row in curve.itertuples():
+        y_pred = (proba >= row.threshold).astype(int)
+        assert y_pred.sum() == row.tp + row.fp
+        assert np.isclose(f1_score(y, y_pred, zero_division=0), row.f1)
+
+    precision, recall, thresholds = precision_recall_curve(y, proba)
+    expected = dict(zip(thresholds.astype(np.float64), zip(precision[:-1], recall[:-1])))
+    for row in curve.iloc[1:].itertuples():
+        if row.threshold in expected:
+            np.testing.assert_allclose((row.precision, row.recall), expected[row.threshold])
+
+
+def test_unreachable_min_precision_flags_nothing():
+    y, proba = _scores()
+    threshold = find_best_threshold(y, proba, objective="recall_at_precision", min_precision=1.01)
+    assert not (proba >= threshold).any()
+    assert f1_score(y, (proba >= threshold).astype(int), zero_division=0) == 0.0
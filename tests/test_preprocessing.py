@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.preprocessing import LabelEncoder
+
+from src.preprocessing import UNSEEN_CODE, FeaturePipeline
+
+CATEGORICAL = ["ProductCD", "card1", "card4"]
+
+
+@pytest.fixture
+def frames():
+    rng = np.random.default_rng(0)
+    n = 500
+    train = pd.DataFrame({
+        "ProductCD": pd.Series(rng.choice(list("WHCSR"), n)).astype("category"),
+        "card1": rng.integers(1_000, 1_050, n),
+        "card4": pd.Series(rng.choice(["visa", "mastercard"], n)).mask(rng.random(n) < 0.1),
+        "TransactionAmt": rng.lognormal(4, 1, n),
+        "dist1": pd.Series(rng.random(n)).mask(rng.random(n) < 0.2),
+        "isFraud": rng.integers(0, 2, n),
+    })
+    test = train.drop(columns="isFraud").head(40).copy()
+    test["ProductCD"] = test["ProductCD"].cat.add_categories("Z")
+    test.loc[test.index[:5], "ProductCD"] = "Z"
+    test.loc[test.index[5:10], "card1"] = 99_999
+    test.loc[test.index[10:15], "card4"] = "maestro"
+    return train, test
+
+
+def test_codes_match_label_encoder(frames):
+    train, _ = frames
+    encoded = FeaturePipeline(CATEGORICAL).fit_transform(train)
+    for col in CATEGORICAL:
+        # El encoder anterior: LabelEncoder sobre astype(str), con los nulos como "nan".
+        expected = LabelEncoder().fit_transform(train[col].map(str))
+        np.testing.assert_array_equal(encoded[col].to_numpy(), expected)
+
+
+def test_unseen_values_map_to_unseen_code(frames):
+    train, test = frames
+    encoded = FeaturePipeline(CATEGORICAL).fit(train).transform(test)
+    assert (encoded["ProductCD"].iloc[:5] == UNSEEN_CODE).all()
+    assert (encoded["card1"].iloc[5:10] == UNSEEN_CODE).all()
+    assert (encoded["card4"].iloc[10:15] == UNSEEN_CODE).all()
+    assert (encoded[CATEGORICAL].iloc[15:] != UNSEEN_CODE).all().all()
+
+
+def test_transform_record_matches_transform(frames):
+    train, test = frames
+    pipeline = FeaturePipeline(CATEGORICAL).fit(train)
+    expected = pipeline.transform(test)[pipeline.feature_names_].to_numpy(dtype=np.float32)
+    records = test.astype(object).where(test.notna(), None).to_dict("records")
+    rows = np.vstack([pipeline.transform_record(record) for record in records])
+    np.testing.assert_allclose(rows, expected, rtol=1e-6, equal_nan=True)
+
+
+def test_save_load_round_trip(frames, tmp_path):
+    train, test = frames
+    pipeline = FeaturePipeline(CATEGORICAL).fit(train)
+    pipeline.transform_record(test.iloc[0].to_dict())  # llena la caché de mapas, que no se guarda
+    path = str(tmp_path / "pipeline.joblib")
+    pipeline.save(path)
+    loaded = FeaturePipeline.load(path)
+    pd.testing.assert_frame_equal(loaded.transform(test), pipeline.transform(test))
+    np.testing.assert_array_equal(
+        loaded.transform_record(test.iloc[0].to_dict()), pipeline.transform_record(test.iloc[0].to_dict())
+    )
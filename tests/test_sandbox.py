@@ -0,0 +1,54 @@
+import pandas as pd
+import pytest
+
+from src.sandbox import SandboxError, SandboxPool, SandboxTimeout, run_snippet
+
+
+def test_run_snippet_lambdas_see_snippet_variables():
+    df = pd.DataFrame({"fraud_score": [0.1, 0.5, 0.95], "TransactionAmt": [10.0, 20.0, 30.0]})
+    code = (
+        "limite = 0.9\n"
+        "altos = df[df['fraud_score'].apply(lambda s: s >= limite)]\n"
+        "result = [round(m * 2) for m in altos['TransactionAmt'] if m > limite]"
+    )
+    assert run_snippet(code, df) == "[60]"
+
+
+def test_run_snippet_returns_printed_output():
+    assert run_snippet("print(len(df))", pd.DataFrame({"a": range(4)})) == "4"
+
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = SandboxPool(n_workers=1, timeout=2, memory_mb=256, cpu_seconds=30)
+    pool.attach(pd.DataFrame({"fraud_score": [0.1, 0.5, 0.95]}), "datos")
+    yield pool
+    pool.close()
+
+
+def test_pool_runs_snippets(pool):
+    assert pool.run("result = len(df)", "datos") == "3"
+
+
+def test_infinite_loop_times_out_and_worker_is_replaced(pool):
+    with pytest.raises(SandboxTimeout):
+        pool.run("while True:\n    pass", "datos")
+    # El worker nuevo no tiene los datos: run los vuelve a adjuntar desde memoria compartida.
+    assert pool.run("result = len(df)", "datos") == "3"
+
+
+def test_oversized_allocation_hits_memory_limit(pool):
+    with pytest.raises(SandboxError, match="memoria"):
+        pool.run("x = bytearray(4 * 1024 ** 3)", "datos")
+    assert pool.run("result = len(df)", "datos") == "3"
+
+
+def test_cpu_limit_stops_busy_loop():
+    pool = SandboxPool(n_workers=1, timeout=30, memory_mb=256, cpu_seconds=1)
+    try:
+        pool.attach(pd.DataFrame({"a": [1]}), "datos")
+        with pytest.raises(SandboxError, match="CPU"):
+            pool.run("while True:\n    pass", "datos")
+        assert pool.run("result = int(df['a'].sum())", "datos") == "1"
+    finally:
+        pool.close()
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import generate_identity, generate_transactions
+from src.data import USER_ID_COLUMNS, create_user_id, iter_merged_chunks, load_and_merge_data
+from src.features import add_velocity_features, velocity_feature_names
+from src.scoring import batch_feature_store
+
+
+@pytest.fixture
+def few_users_csvs(tmp_path):
+    # Pocos usuarios que vuelven a aparecer: todas las columnas de la clave fijas salvo card1.
+    transactions = generate_transactions(2_000, n_v=3, seed=1)
+    transactions["TransactionDT"] = 86_400 + np.arange(len(transactions)) * 30
+    identity = generate_identity(transactions["TransactionID"].to_numpy(), identity_fraction=1.0, seed=2)
+    for frame in (transactions, identity):
+        for col in USER_ID_COLUMNS:
+            if col in frame.columns and col != "card1":
+                frame[col] = frame[col].dropna().iloc[0]
+    transactions["card1"] = np.random.default_rng(0).integers(0, 20, len(transactions))
+    identity_path, transaction_path = tmp_path / "identity.csv", tmp_path / "transaction.csv"
+    identity.to_csv(identity_path, index=False)
+    transactions.to_csv(transaction_path, index=False)
+    return str(identity_path), str(transaction_path)
+
+
+@pytest.mark.parametrize("max_users", [None, 2])
+def test_batch_store_matches_training_features(few_users_csvs, tmp_path, max_users):
+    identity_path, transaction_path = few_users_csvs
+    offline = add_velocity_features(
+        create_user_id(load_and_merge_data(identity_path, transaction_path, verbose=False), mode="hash")
+    )
+
+    db_path = str(tmp_path / "users.db") if max_users else None
+    store = batch_feature_store(max_users=max_users, db_path=db_path)
+    online = pd.concat(
+        [store.observe_frame(df) for df in iter_merged_chunks(identity_path, transaction_path, chunksize=300)],
+        ignore_index=True,
+    )
+    store.close()
+
+    names = velocity_feature_names()
+    offline = offline.set_index("TransactionID")[names].sort_index()
+    online = online.set_index("TransactionID")[names].sort_index()
+    assert (offline["user_txn_count_1h"] > 1).mean() > 0.5
+    np.testing.assert_allclose(online.to_numpy(), offline.to_numpy(), rtol=1e-4, atol=1e-2)
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.simulator import CostIndex
+
+COSTS = {"Paquete Completo": 0.0061, "Paquete Medio": 0.0035, "Paquete Básico": 0.0017, "Sin Paquete": 0.0}
+PACKAGES = list(COSTS)
+
+
+def _frame():
+    rng = np.random.default_rng(0)
+    edges = [0.3, 0.6, 0.9]
+    # Scores exactamente sobre los cortes y a un ulp de ellos, además de NaN.
+    scores = np.r_[
+        rng.random(2_000), np.round(rng.random(500), 1), edges, np.nextafter(edges, 0), np.nan, np.nan,
+    ]
+    amounts = rng.gamma(2, 50, len(scores))
+    amounts[:5] = np.nan
+    return pd.DataFrame({"fraud_score": scores, "TransactionAmt": amounts})
+
+
+def _row_wise_cost(df, low, medium, high):
+    # Costo fila a fila como lo calculaba streamlit_app.py antes de CostIndex.
+    def asignar_paquete_modelo(score):
+        if score < low: return "Paquete Completo"
+        elif score < medium: return "Paquete Medio"
+        elif score < high: return "Paquete Básico"
+        else: return "Sin Paquete"
+
+    df = df.copy()
+    df["paquete_servicio"] = df["fraud_score"].apply(asignar_paquete_modelo)
+    df["estimated_cost_ponderado"] = df.apply(
+        lambda row: row["TransactionAmt"] * row["fraud_score"] * COSTS.get(row["paquete_servicio"], 0.0), axis=1)
+    return df
+
+
+@pytest.mark.parametrize("thresholds", [(0.3, 0.6, 0.9), (0.2, 0.2, 0.7), (0.0, 0.5, 1.0)])
+def test_total_cost_matches_row_wise_apply(thresholds):
+    df = _frame()
+    index = CostIndex(df["fraud_score"], df["TransactionAmt"])
+    expected = _row_wise_cost(df, *thresholds)["estimated_cost_ponderado"].sum()
+    assert index.total_cost(list(thresholds), [COSTS[p] for p in PACKAGES]) == pytest.approx(expected)
+
+
+def test_baseline_cost_matches_row_wise_apply():
+    df = _frame()
+    index = CostIndex(df["fraud_score"], df["TransactionAmt"])
+    paquete = df["fraud_score"].apply(lambda s: "Paquete Completo" if s < 0.9 else "Sin Paquete")
+    expected = (df["TransactionAmt"] * df["fraud_score"] * paquete.map(COSTS)).sum()
+    assert index.total_cost([0.9], [COSTS["Paquete Completo"], 0.0]) == pytest.approx(expected)
+
+
+def test_band_totals_match_groupby():
+    df = _row_wise_cost(_frame(), 0.3, 0.6, 0.9)
+    totals = CostIndex(df["fraud_score"], df["TransactionAmt"]).band_totals([0.3, 0.6, 0.9])
+
+    df["expected_loss"] = df["TransactionAmt"] * df["fraud_score"]
+    expected = df.groupby("paquete_servicio").agg(
+        count=("fraud_score", "size"), amount=("TransactionAmt", "sum"), expected_loss=("expected_loss", "sum"),
+    ).reindex(PACKAGES)
+    assert totals["count"].tolist() == expected["count"].tolist()
+    np.testing.assert_allclose(totals["amount"], expected["amount"])
+    np.testing.assert_allclose(totals["expected_loss"], expected["expected_loss"])
+
+
+def test_band_stats_score_range():
+    df = _frame()
+    stats = CostIndex(df["fraud_score"], df["TransactionAmt"]).band_stats([0.3, 0.6, 0.9])
+    scores = df["fraud_score"]
+    for i, (low, high) in enumerate([(-np.inf, 0.3), (0.3, 0.6), (0.6, 0.9), (0.9, np.inf)]):
+        band = scores[(scores >= low) & (scores < high)]
+        assert stats.loc[i, "score_min"] == band.min()
+        assert stats.loc[i, "score_max"] == band.max()
+        assert stats.loc[i, "score_mean"] == pytest.approx(band.mean())
+    # Los scores sobre el corte abren la banda siguiente.
+    assert stats.loc[1, "score_min"] == 0.3 and stats.loc[3, "score_min"] == 0.9
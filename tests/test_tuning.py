@@ -0,0 +1,25 @@
+import numpy as np
+import optuna
+
+from src.tuning import tune_xgb_model
+
+FINISHED = (optuna.trial.TrialState.COMPLETE, optuna.trial.TrialState.PRUNED)
+
+
+def test_resume_runs_exactly_the_remaining_trials(tmp_path):
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(600, 5)).astype(np.float32)
+    y = (X[:, 0] + rng.normal(size=600) > 1).astype(int)
+    storage = f"sqlite:///{tmp_path / 'optuna.db'}"
+    kwargs = dict(storage=storage, study_name="resume", n_jobs=2, n_estimators=20, early_stopping_rounds=5)
+
+    tune_xgb_model(X[:400], y[:400], X[400:], y[400:], n_trials=5, **kwargs)
+    # Retomar con un total mayor corre solo la diferencia, repartida entre los procesos.
+    best_params = tune_xgb_model(X[:400], y[:400], X[400:], y[400:], n_trials=12, **kwargs)
+    study = optuna.load_study(study_name="resume", storage=storage)
+    assert len(study.get_trials(states=FINISHED)) == 12
+    assert 1 <= best_params["n_estimators"] <= 20
+
+    # Con el estudio completo no se corre ningún trial más.
+    tune_xgb_model(X[:400], y[:400], X[400:], y[400:], n_trials=12, **kwargs)
+    assert len(optuna.load_study(study_name="resume", storage=storage).trials) == 12
@@ -1,52 +1,59 @@
 # train.py
 
-from src.data import load_preprocess_data
+from src.data import MODEL_CATEGORICAL_COLUMNS, load_preprocess_data
+from src.features import add_velocity_features
 from src.preprocessing import encode_and_scale, split_data, balance_data
-from src.model import train_xgb_model, predict, evaluate_model, save_model, assign_groups_and_services_from_proba
+from src.model import (
+    train_xgb_model, predict, find_best_threshold, evaluate_model, save_model, assign_groups_and_services_from_proba
+)
 from imblearn.combine import SMOTETomek
+from src.profiling import TRACER
+import datetime
+import os
 
 
 def main():
+    # Trazas por etapa; TRACE_SAMPLE=1 activa además el profiler por muestreo
+    TRACER.enable(sample=os.getenv("TRACE_SAMPLE") == "1")
+
     # 1. Cargar datos
     df = load_preprocess_data(
         identity_path="gs://fraud-detection-lewagon/train_identity.csv",
         transaction_path="gs://fraud-detection-lewagon/train_transaction.csv",
-        null_threshold=0.4
+        null_threshold=0.4,
+        user_id_mode="hash"
     )
     print(f"Datos cargados y preprocesados. Shape: {df.shape}")
 
-    categorical_columns = [
-    'DeviceType', 'DeviceInfo', 'ProductCD', 'card1', 'card2', 'card3', 'card4', 'card5', 'card6',
-    'addr1', 'addr2', 'P_emaildomain', 'R_emaildomain',
-    'id_12', 'id_13', 'id_14', 'id_15', 'id_16', 'id_17', 'id_18', 'id_19', 'id_20',
-    'id_21', 'id_22', 'id_23', 'id_24', 'id_25', 'id_26', 'id_27', 'id_28', 'id_29', 'id_30',
-    'id_31', 'id_32', 'id_33', 'id_34', 'id_35', 'id_36', 'id_37', 'id_38',
-    'M1', 'M2', 'M3', 'M4', 'M5', 'M6', 'M7', 'M8', 'M9'
-    ]
+    # Features de velocidad por usuario (ventanas de 1h/24h/7d sobre TransactionDT)
+    df = add_velocity_features(df)
 
     # 2. Preprocesamiento (encoding y escalado)
-    X, y = encode_and_scale(df, categorical_columns=categorical_columns, target_column='isFraud')
-    print(f"Preprocesamiento completo. X shape: {X.shape}, y shape: {y.shape}")
+    df_encoded, pipeline = encode_and_scale(
+        df, categorical_columns=MODEL_CATEGORICAL_COLUMNS, target_column='isFraud', return_pipeline=True
+    )
+    print(f"Preprocesamiento completo. Shape: {df_encoded.shape}")
 
     # 3. División en train/val
-    X_train, X_val, y_train, y_val = split_data(df=df, target_column='isFraud')
+    X_train, X_val, y_train, y_val = split_data(df=df_encoded, target_column='isFraud')
 
     # 4. Balanceo de clases
-    X_train_resampled, y_train_resampled = balance_data(X_train, y_train)
+    X_train_resampled, y_train_resampled, sample_weight = balance_data(X_train, y_train, return_weights=True)
     print(f"Balanceo completo. X_train shape: {X_train_resampled.shape}")
 
-    # 5. Entrenar modelo y buscar mejor threshold
-    model, threshold = train_xgb_model(X_train_resampled, y_train_resampled, X_val, y_val)
-    print(f"Modelo entrenado. Threshold óptimo: {threshold:.2f}")
+    # 5. Entrenar modelo con early stopping y buscar mejor threshold
+    model = train_xgb_model(X_train_resampled, y_train_resampled, X_val, y_val, sample_weight=sample_weight)
+    _, y_proba = predict(model, X_val)
+    threshold = find_best_threshold(y_val, y_proba)
+    print(f"Modelo entrenado. Mejor iteración: {model.best_iteration}. Threshold óptimo: {threshold:.2f}")
 
     # 6. Predecir con threshold ajustado
-    y_pred = predict(model, X_val, threshold)
+    y_pred = (y_proba >= threshold).astype(int)
 
     # 7. Evaluar modelo
-    evaluate_model(y_val, y_pred, model.predict_proba(X_val)[:, 1])
+    evaluate_model(y_val, y_pred, y_proba, n_bootstrap=200)
 
     # 8. Asignar grupos de fraude y paquetes financieros
-    y_proba = model.predict_proba(X_val)[:, 1]
     user_ids = X_val.index  # Si tu index es el user_id
     grupos_df = assign_groups_and_services_from_proba(y_proba, user_ids=user_ids)
 
@@ -54,7 +61,13 @@ def main():
 
     # 8. Guardar modelo
     # Guardar en GCS
-    save_model(model, "gs://fraud-detection-lewagon/models/xgb_model.joblib")
+    save_model(model, "gs://fraud-detection-lewagon/models/xgb_model.joblib", pipeline=pipeline)
+
+    # 9. Resumen de tiempos y memoria por etapa
+    TRACER.print_summary()
+    trace_path = f"traces/train_{datetime.datetime.now():%Y%m%d_%H%M%S}.json"
+    TRACER.write(trace_path)
+    print(f"Traza guardada en {trace_path} (abrir con chrome://tracing)")
 
 
 if __name__ == "__main__":
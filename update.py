@@ -0,0 +1,26 @@
+# update.py
+
+from src.update import update_model
+import os
+
+
+def main():
+    # Lote nuevo de transacciones (por defecto, el último export diario)
+    model_path = os.getenv("MODEL_PATH", "gs://fraud-detection-lewagon/models/xgb_model.joblib")
+    identity_path = os.getenv("BATCH_IDENTITY_PATH", "gs://fraud-detection-lewagon/batches/latest/identity.csv")
+    transaction_path = os.getenv("BATCH_TRANSACTION_PATH", "gs://fraud-detection-lewagon/batches/latest/transaction.csv")
+
+    # Continuar el boosting y publicar solo si el holdout no empeora
+    _, _, _, published = update_model(
+        model_path=model_path,
+        identity_path=identity_path,
+        transaction_path=transaction_path,
+        n_rounds=int(os.getenv("UPDATE_ROUNDS", "50")),
+        tolerance=float(os.getenv("UPDATE_TOLERANCE", "0.0")),
+    )
+    if not published:
+        print("El modelo publicado no se modificó.")
+
+
+if __name__ == "__main__":
+    main()